@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+
+class AdaptiveChunkController:
+    """自适应分块控制器 - 根据实测实时率在分块配置之间切换
+
+    实时率(RTF) = 单块推理耗时 / 分块时长。持续高于上限说明推理跟不上，换更大的分块；
+    持续低于下限说明有余量，换更小的分块以降低延迟。切换只在段落边界（缓存重置时）生效。
+    record在识别线程、select在开启会话的线程中调用，内部加锁。
+    """
+
+    def __init__(self, profiles: List[List[int]], initial: List[int], enabled: bool = True,
+                 high_rtf: float = 0.8, low_rtf: float = 0.4, min_samples: int = 8,
+                 smoothing: float = 0.2, retry_cooldown: float = 600.0):
+        # 按分块时长从小到大排列
+        self.profiles = sorted((list(p) for p in profiles), key=lambda p: p[1])
+        if list(initial) not in self.profiles:
+            self.profiles.append(list(initial))
+            self.profiles.sort(key=lambda p: p[1])
+        self.index = self.profiles.index(list(initial))
+        self.enabled = enabled and len(self.profiles) > 1
+        self.high_rtf = high_rtf
+        self.low_rtf = low_rtf
+        self.min_samples = min_samples
+        self.smoothing = smoothing
+        self.retry_cooldown = retry_cooldown
+        # 被判定跟不上的配置在冷却期内不再尝试，避免来回切换
+        self.blocked_until = {}
+
+        self.rtf: Optional[float] = None
+        self.samples = 0
+        self.decisions = deque(maxlen=50)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def chunk_seconds(chunk_size: List[int]) -> float:
+        """分块时长: chunk_size[1] * 60ms"""
+        return chunk_size[1] * 0.06
+
+    @property
+    def current(self) -> List[int]:
+        return self.profiles[self.index]
+
+    def record(self, inference_seconds: float, chunk_size: List[int]):
+        """记录一次推理耗时（只含模型计算，不含等锁和恢复模型）"""
+        rtf = inference_seconds / self.chunk_seconds(chunk_size)
+        with self._lock:
+            if self.rtf is None:
+                self.rtf = rtf
+            else:
+                self.rtf += self.smoothing * (rtf - self.rtf)
+            self.samples += 1
+
+    def select(self) -> List[int]:
+        """在段落边界调用，必要时切换分块配置并返回当前配置"""
+        with self._lock:
+            return self._select()
+
+    def _select(self) -> List[int]:
+        if not self.enabled or self.rtf is None or self.samples < self.min_samples:
+            return self.current
+
+        previous = self.current
+        now = time.monotonic()
+        if self.rtf > self.high_rtf and self.index < len(self.profiles) - 1:
+            self.blocked_until[self.index] = now + self.retry_cooldown
+            self.index += 1
+            reason = "推理跟不上"
+        elif (self.rtf < self.low_rtf and self.index > 0 and
+              self.blocked_until.get(self.index - 1, 0.0) <= now):
+            self.index -= 1
+            reason = "有余量"
+        else:
+            return self.current
+
+        decision = {
+            "time": time.time(),
+            "rtf": round(self.rtf, 3),
+            "from": previous,
+            "to": self.current,
+            "reason": reason,
+        }
+        self.decisions.append(decision)
+        print(f"分块配置切换: {previous} -> {self.current} (RTF={self.rtf:.2f}, {reason})")
+
+        # 新配置重新积累样本，形成迟滞
+        self.rtf = None
+        self.samples = 0
+        return self.current
@@ -0,0 +1,272 @@
+import threading
+import time
+import numpy as np
+import sounddevice as sd
+from typing import Callable, Optional
+
+
+# 上次重新初始化PortAudio时终止成功而初始化失败，PortAudio处于未初始化状态
+_portaudio_down = False
+
+
+def _reinitialize_portaudio() -> bool:
+    """重新初始化PortAudio，使其重新枚举设备并识别新的默认设备
+
+    sounddevice没有公开的重新枚举接口，只能调用私有的_terminate/_initialize，
+    不同版本可能不存在或行为不同。不可用或失败时返回False，调用方按现有设备列表重开；
+    终止后初始化失败时记下状态，下次只重试初始化。
+    """
+    global _portaudio_down
+    terminate = getattr(sd, "_terminate", None)
+    initialize = getattr(sd, "_initialize", None)
+    if not callable(terminate) or not callable(initialize):
+        return False
+    if not _portaudio_down:
+        try:
+            terminate()
+        except Exception as e:
+            print(f"刷新音频设备列表失败: {e}")
+            return False
+    try:
+        initialize()
+    except Exception as e:
+        _portaudio_down = True
+        print(f"重新初始化音频系统失败: {e}")
+        return False
+    _portaudio_down = False
+    return True
+
+
+class AudioRingBuffer:
+    """定长环形音频缓冲区 - 预分配内存，只保留最近的音频"""
+
+    def __init__(self, capacity: int, dtype=np.int16):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=dtype)
+        self.write_pos = 0
+        self.size = 0
+
+    def write(self, data: np.ndarray):
+        """写入音频，超出容量时覆盖最旧的数据"""
+        if self.capacity == 0:
+            return
+        n = len(data)
+        if n >= self.capacity:
+            self.buffer[:] = data[-self.capacity:]
+            self.write_pos = 0
+            self.size = self.capacity
+            return
+        first = min(n, self.capacity - self.write_pos)
+        self.buffer[self.write_pos:self.write_pos + first] = data[:first]
+        if first < n:
+            self.buffer[:n - first] = data[first:]
+        self.write_pos = (self.write_pos + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def read(self) -> np.ndarray:
+        """按时间顺序读出缓冲区内全部音频（拷贝）"""
+        if self.size < self.capacity:
+            return self.buffer[self.write_pos - self.size:self.write_pos].copy()
+        return np.concatenate([self.buffer[self.write_pos:], self.buffer[:self.write_pos]])
+
+    def clear(self):
+        self.write_pos = 0
+        self.size = 0
+
+
+class AudioCapture:
+    """音频采集 - 管理麦克风输入流，空闲时把最近的音频保留在预录缓冲区
+
+    输入流打开期间由监视线程检查回调是否停止（设备拔出、默认设备切换等），
+    停止时在当前选定的设备上重新打开；转发目标不变，进行中的识别会话不受影响。
+    """
+
+    def __init__(self, sample_rate: int, preroll_seconds: float = 0.0, keep_open: bool = False,
+                 device: Optional[str] = None, stall_seconds: float = 1.0):
+        self.sample_rate = sample_rate
+        self.keep_open = keep_open
+        self.device = device or None  # 设备名（部分匹配），为空时使用系统默认输入设备
+        self.stall_seconds = stall_seconds
+        self.preroll = AudioRingBuffer(int(sample_rate * preroll_seconds)) if keep_open else None
+        self.stream = None
+        self.device_name: Optional[str] = None
+        self.reopen_count = 0
+        self._sink: Optional[Callable[[np.ndarray], None]] = None
+        # 旁路监听（如免按键唤醒），无论是否在转发都收到每块音频，须足够轻量
+        self.listener: Optional[Callable[[np.ndarray], None]] = None
+        self._lock = threading.Lock()
+        self._stream_lock = threading.RLock()
+        self._want_open = False
+        self._last_callback = 0.0
+        self._monitor_thread: Optional[threading.Thread] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.stream is not None
+
+    def open(self):
+        """打开输入流（已打开时不做任何事）"""
+        with self._stream_lock:
+            self._want_open = True
+            # 先启动监视线程，当前没有可用设备时由它稍后重试
+            if self._monitor_thread is None or not self._monitor_thread.is_alive():
+                self._monitor_thread = threading.Thread(target=self._monitor_worker, daemon=True)
+                self._monitor_thread.start()
+            if self.stream is None:
+                self._open_stream()
+
+    def close(self):
+        """关闭输入流"""
+        with self._stream_lock:
+            self._want_open = False
+            self._close_stream()
+
+    def set_device(self, device: Optional[str]):
+        """切换输入设备，输入流已打开时立即在新设备上重新打开"""
+        with self._stream_lock:
+            device = device or None
+            if device == self.device:
+                return
+            self.device = device
+            if self.stream is not None:
+                self._close_stream()
+                try:
+                    self._open_stream()
+                except Exception as e:
+                    # 由监视线程稍后重试
+                    print(f"切换音频设备失败: {e}")
+
+    def set_preroll_seconds(self, preroll_seconds: float):
+        """调整预录缓冲区时长，保留其中最近的音频；未启用常开模式时没有预录缓冲区"""
+        with self._lock:
+            if self.preroll is None:
+                return
+            capacity = int(self.sample_rate * preroll_seconds)
+            if capacity == self.preroll.capacity:
+                return
+            preroll = AudioRingBuffer(capacity)
+            if self.preroll.size:
+                preroll.write(self.preroll.read())
+            self.preroll = preroll
+
+    def _open_stream(self):
+        device = self._resolve_device()
+        stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            device=device,
+            channels=1,
+            dtype=np.int16,
+            callback=self._audio_callback
+        )
+        self._last_callback = time.monotonic()
+        stream.start()
+        self.stream = stream
+        self.device_name = self._device_label(device)
+
+    def _close_stream(self):
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            try:
+                stream.stop()
+                stream.close()
+            except Exception as e:
+                print(f"关闭音频流出错: {e}")
+
+    def _resolve_device(self) -> Optional[int]:
+        """按名称查找输入设备，找不到时退回系统默认设备"""
+        if not self.device:
+            return None
+        try:
+            for index, info in enumerate(sd.query_devices()):
+                if info.get("max_input_channels", 0) > 0 and self.device.lower() in info.get("name", "").lower():
+                    return index
+        except Exception as e:
+            print(f"查询音频设备失败: {e}")
+        print(f"未找到音频设备 \"{self.device}\"，使用系统默认输入设备")
+        return None
+
+    @staticmethod
+    def _device_label(device: Optional[int]) -> Optional[str]:
+        try:
+            return sd.query_devices(device, kind="input").get("name")
+        except Exception:
+            return None
+
+    def _stream_stalled(self) -> bool:
+        stream = self.stream
+        if stream is None:
+            return True
+        if not getattr(stream, "active", True):
+            return True
+        return time.monotonic() - self._last_callback > self.stall_seconds
+
+    def _monitor_worker(self):
+        """监视输入流，停止回调时在新设备上重新打开"""
+        interval = max(0.1, self.stall_seconds / 2)
+        while True:
+            time.sleep(interval)
+            with self._stream_lock:
+                if not self._want_open:
+                    return
+                if not self._stream_stalled():
+                    continue
+                print(f"音频输入中断（设备: {self.device_name}），尝试重新打开")
+                self._close_stream()
+                if not _reinitialize_portaudio() and _portaudio_down:
+                    # 音频系统未能恢复初始化，下个周期重试
+                    continue
+                try:
+                    self._open_stream()
+                    self.reopen_count += 1
+                    print(f"音频输入已恢复，设备: {self.device_name}")
+                except Exception as e:
+                    # 暂无可用设备，下个周期重试
+                    print(f"重新打开音频流失败: {e}")
+
+    def begin(self, sink: Callable[[np.ndarray], None], preroll_samples: Optional[int] = None):
+        """开始把音频转发给sink，先送入预录缓冲区中的音频（指定preroll_samples时只送最近的这么多）"""
+        try:
+            self.open()
+        except Exception:
+            if not self.keep_open:
+                self.close()
+            raise
+        with self._lock:
+            if self.preroll is not None and self.preroll.size:
+                audio = self.preroll.read()
+                if preroll_samples is not None:
+                    audio = audio[len(audio) - min(preroll_samples, len(audio)):]
+                if len(audio):
+                    sink(audio)
+                self.preroll.clear()
+            self._sink = sink
+
+    def end(self):
+        """停止转发；未启用常开模式时关闭输入流"""
+        with self._lock:
+            self._sink = None
+        if not self.keep_open:
+            self.close()
+
+    def _audio_callback(self, indata, frames, time_info, status):
+        """音频数据回调函数"""
+        self._last_callback = time.monotonic()
+        if status:
+            print(f"音频录制状态: {status}")
+
+        audio_data = indata[:, 0].copy()
+        listener = self.listener
+        if listener is not None:
+            try:
+                listener(audio_data)
+            except Exception as e:
+                print(f"音频监听出错: {e}")
+        # 回调中抛出的异常会使PortAudio中止输入流，这里全部拦下
+        with self._lock:
+            try:
+                if self._sink is not None:
+                    self._sink(audio_data)
+                elif self.preroll is not None:
+                    self.preroll.write(audio_data)
+            except Exception as e:
+                print(f"音频转发出错: {e}")
@@ -0,0 +1,177 @@
+from typing import Any, Dict, Optional
+import numpy as np
+
+
+# 采集、缓冲和前端处理都使用16位整数采样，只在送入模型时转换为浮点
+PCM16_SCALE = 32768.0
+
+
+def to_pcm16(audio: np.ndarray) -> np.ndarray:
+    """转换为int16采样；浮点音频（-1~1）按比例缩放并限幅，已是int16时原样返回"""
+    if audio.dtype == np.int16:
+        return audio
+    if np.issubdtype(audio.dtype, np.integer):
+        return audio.astype(np.int16)
+    return np.clip(audio * PCM16_SCALE, -32768, 32767).astype(np.int16)
+
+
+def pcm16_to_float(audio: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """int16采样转换为-1~1的float32，指定out时直接写入其中，不另分配"""
+    if out is None:
+        out = np.empty(len(audio), dtype=np.float32)
+    np.multiply(audio, np.float32(1.0 / PCM16_SCALE), out=out)
+    return out
+
+
+class AudioFrontEnd:
+    """音频前端 - 高通滤波、谱减降噪和自动增益，按块向量化处理
+
+    短时傅里叶变换使用50%重叠的平方根汉宁窗，一个块内的所有帧一次性变换和重建；
+    高通在频域置零低频，噪声谱按块做最小值跟踪。固定引入一个帧移（16ms）的延迟。
+    输入输出都是int16，只在块内变换时转换为float32。
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_size: int = 512,
+                 highpass_hz: float = 80.0, noise_suppression: bool = True,
+                 over_subtraction: float = 2.0, spectral_floor: float = 0.05,
+                 agc: bool = True, target_dbfs: float = -20.0, max_gain_db: float = 20.0,
+                 limiter_ceiling: float = 0.95, noise_profile: Optional[np.ndarray] = None):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.hop = frame_size // 2
+        self.noise_suppression = noise_suppression
+        self.over_subtraction = over_subtraction
+        self.spectral_floor = spectral_floor
+        self.noise_threshold = 3.0
+        self.noise_smoothing = 0.2
+        self.agc = agc
+        self.target_rms = 10 ** (target_dbfs / 20)
+        self.max_gain = 10 ** (max_gain_db / 20)
+        self.limiter_ceiling = limiter_ceiling
+
+        # 预分配的固定状态
+        self.window = np.sqrt(np.hanning(frame_size + 1)[:frame_size]).astype(np.float32)
+        bins = frame_size // 2 + 1
+        freqs = np.fft.rfftfreq(frame_size, 1.0 / sample_rate)
+        self.band_mask = (freqs >= highpass_hz).astype(np.float32)
+        self.noise = (noise_profile.copy() if noise_profile is not None and len(noise_profile) == bins
+                      else None)
+        self.pending = np.zeros(self.hop, dtype=np.float32)  # 尚未凑满一个帧移的输入
+        self.pending_len = 0
+        self.prev_input = np.zeros(self.hop, dtype=np.float32)  # 上一帧后半段输入
+        self.overlap = np.zeros(self.hop, dtype=np.float32)  # 待叠加的上一帧输出尾部
+        self.gain = 1.0
+        # 累计输入、输出采样数，收尾时据此截取输出（含补零）
+        self.input_samples = 0
+        self.output_samples = 0
+
+    @classmethod
+    def from_config(cls, dsp_config: Dict[str, Any], sample_rate: int,
+                    noise_profile: Optional[np.ndarray] = None) -> "AudioFrontEnd":
+        return cls(
+            sample_rate=sample_rate,
+            highpass_hz=dsp_config.get("highpass_hz", 80.0),
+            noise_suppression=dsp_config.get("noise_suppression", True),
+            agc=dsp_config.get("agc", True),
+            target_dbfs=dsp_config.get("target_dbfs", -20.0),
+            max_gain_db=dsp_config.get("max_gain_db", 20.0),
+            noise_profile=noise_profile
+        )
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """处理一块int16音频，返回已完成重建的int16输出（长度为帧移的整数倍）"""
+        audio = pcm16_to_float(audio)
+        self.input_samples += len(audio)
+        total = self.pending_len + len(audio)
+        hops = total // self.hop
+        if hops == 0:
+            self.pending[self.pending_len:total] = audio
+            self.pending_len = total
+            return np.zeros(0, dtype=np.int16)
+
+        # 上一帧后半段 + 本块可用的整帧移输入
+        used = hops * self.hop - self.pending_len
+        signal = np.concatenate([self.prev_input, self.pending[:self.pending_len], audio[:used]])
+        leftover = audio[used:]
+        self.pending[:len(leftover)] = leftover
+        self.pending_len = len(leftover)
+        self.prev_input = signal[-self.hop:].copy()
+
+        # 所有帧一次性分帧、变换
+        frames = np.lib.stride_tricks.sliding_window_view(signal, self.frame_size)[::self.hop]
+        spectrum = np.fft.rfft(frames * self.window, axis=1)
+        gains = self._spectral_gains(spectrum)
+        output_frames = np.fft.irfft(spectrum * gains, n=self.frame_size, axis=1).astype(np.float32)
+        output_frames *= self.window
+
+        # 50%重叠相加：每帧前半段与上一帧后半段相加
+        output = output_frames[:, :self.hop].copy()
+        output[0] += self.overlap
+        output[1:] += output_frames[:-1, self.hop:]
+        self.overlap = output_frames[-1, self.hop:].copy()
+        output = output.reshape(-1)
+
+        if self.agc:
+            output = self._apply_agc(output, gains)
+        self.output_samples += len(output)
+        return to_pcm16(output)
+
+    def flush(self) -> np.ndarray:
+        """输出内部缓冲的剩余音频：补零把未满帧移的输入和最后一帧的重叠尾部都推出，
+        再截掉只含补零的部分，使总输出 = 总输入 + 一个帧移的固定延迟"""
+        real_end = self.input_samples + self.hop
+        output = self.process(np.zeros(self.frame_size - self.pending_len, dtype=np.int16))
+        emitted_before = self.output_samples - len(output)
+        return output[:max(0, real_end - emitted_before)]
+
+    def _spectral_gains(self, spectrum: np.ndarray) -> np.ndarray:
+        """计算每帧每频点的增益：高通掩码 x 谱减增益"""
+        if not self.noise_suppression:
+            return self.band_mask
+
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        # 噪声谱估计：只用低于当前估计若干倍（判为无语音）的帧做递归平均，
+        # 长时间没有这样的帧时缓慢上升，以跟上变大的背景噪声
+        if self.noise is None:
+            # 首块是预录音频，可能已有语音：只用能量最低的四分之一帧做初始估计
+            frame_energy = power.sum(axis=1)
+            quietest = np.argsort(frame_energy)[:max(1, len(frame_energy) // 4)]
+            self.noise = power[quietest].mean(axis=0)
+        quiet = power < self.noise_threshold * self.noise
+        quiet_count = quiet.sum(axis=0)
+        quiet_mean = np.where(quiet, power, 0.0).sum(axis=0) / np.maximum(quiet_count, 1)
+        self.noise = np.where(quiet_count > 0,
+                              (1 - self.noise_smoothing) * self.noise + self.noise_smoothing * quiet_mean,
+                              self.noise * 1.05)
+
+        gains = 1.0 - self.over_subtraction * self.noise / np.maximum(power, 1e-12)
+        np.maximum(gains, self.spectral_floor ** 2, out=gains)
+        np.sqrt(gains, out=gains)
+        gains *= self.band_mask
+        return gains
+
+    def _apply_agc(self, output: np.ndarray, gains: np.ndarray) -> np.ndarray:
+        """自动增益：只在有语音的块上调整增益，块内线性过渡，并做峰值限幅"""
+        rms = float(np.sqrt(np.mean(output ** 2))) if len(output) else 0.0
+        speech_present = self.noise_suppression is False or float(gains.mean()) > 0.3
+        target_gain = self.gain
+        if speech_present and rms > 1e-5:
+            target_gain = min(self.target_rms / rms, self.max_gain)
+        # 增益下降快、上升慢
+        rate = 0.5 if target_gain < self.gain else 0.1
+        new_gain = self.gain + rate * (target_gain - self.gain)
+
+        peak = float(np.max(np.abs(output))) if len(output) else 0.0
+        if peak * new_gain > self.limiter_ceiling:
+            new_gain = self.limiter_ceiling / peak
+
+        ramp = np.linspace(self.gain, new_gain, len(output), dtype=np.float32)
+        self.gain = new_gain
+        output *= ramp
+        np.clip(output, -self.limiter_ceiling, self.limiter_ceiling, out=output)
+        return output
+
+    @property
+    def noise_profile(self) -> Optional[np.ndarray]:
+        """当前噪声谱估计，可用于初始化下一个会话"""
+        return self.noise
@@ -0,0 +1,269 @@
+"""
+批量转写音频目录
+
+用法:
+    python batch_transcribe.py <音频目录> -o results.jsonl [--srt srt目录] [--workers 4]
+
+先用VAD把每个文件切分成语音段，再把语音段分发到进程池（每个进程加载一份非流式模型）识别。
+每个文件完成后立即追加写入JSONL，中断后重新运行会跳过已完成的文件；
+有语音段识别失败的文件不写入结果，下次运行时重试。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from config_loader import ConfigLoader
+
+AUDIO_EXTENSIONS = {".wav", ".flac", ".mp3", ".m4a", ".ogg"}
+SAMPLE_RATE = 16000
+_RICH_TAG_PATTERN = re.compile(r"<\|[^|]*\|>")
+
+
+class FileSplit(NamedTuple):
+    """VAD切分结果"""
+    path: str
+    duration: float
+    segments: List[Tuple[float, float]]
+
+
+class SegmentResult(NamedTuple):
+    """单个语音段的识别结果，失败时error非空"""
+    path: str
+    start: float
+    end: float
+    text: str
+    error: str = ""
+
+
+# 工作进程内的模型，由初始化函数加载
+_worker_model = None
+_worker_vad_model = None
+
+
+def _init_worker(model_path: str, vad_path: Optional[str], threads: int):
+    """进程池初始化：每个工作进程加载一份模型"""
+    global _worker_model, _worker_vad_model
+    import torch
+    from funasr import AutoModel
+    torch.set_num_threads(threads)
+    _worker_model = AutoModel(model=model_path)
+    if vad_path:
+        _worker_vad_model = AutoModel(model=vad_path)
+
+
+def _read_audio(path: str, start: float = 0.0, end: Optional[float] = None) -> np.ndarray:
+    """读取单声道16kHz音频，可只读取指定时间范围"""
+    import soundfile
+    info = soundfile.info(path)
+    frames_start = int(start * info.samplerate)
+    frames_stop = int(end * info.samplerate) if end is not None else None
+    audio, sample_rate = soundfile.read(path, start=frames_start, stop=frames_stop, dtype="float32")
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    if sample_rate != SAMPLE_RATE:
+        from scipy.signal import resample_poly
+        divisor = np.gcd(sample_rate, SAMPLE_RATE)
+        audio = resample_poly(audio, SAMPLE_RATE // divisor, sample_rate // divisor).astype(np.float32)
+    return audio
+
+
+def _split_file(path: str, max_segment: float) -> FileSplit:
+    """VAD切分，语音段为 [(开始秒, 结束秒), ...]"""
+    audio = _read_audio(path)
+    duration = len(audio) / SAMPLE_RATE
+    if _worker_vad_model is None:
+        spans = [(0.0, duration)]
+    else:
+        result = _worker_vad_model.generate(input=audio)
+        spans = [(beg / 1000.0, end / 1000.0) for beg, end in result[0].get("value", [])]
+
+    # 过长的语音段再按固定时长切开
+    segments = []
+    for beg, end in spans:
+        while end - beg > max_segment:
+            segments.append((beg, beg + max_segment))
+            beg += max_segment
+        if end > beg:
+            segments.append((beg, end))
+    return FileSplit(path, duration, segments)
+
+
+def _transcribe_segment(path: str, start: float, end: float) -> SegmentResult:
+    """识别单个语音段，出错时返回错误信息而不抛出，以免整个文件卡住"""
+    text = ""
+    try:
+        audio = _read_audio(path, start, end)
+        result = _worker_model.generate(input=audio, language="auto", use_itn=True)
+        if isinstance(result, list) and result and isinstance(result[0], dict):
+            text = _RICH_TAG_PATTERN.sub("", result[0].get("text", "")).strip()
+    except Exception as e:
+        print(f"语音段识别失败 {path} [{start:.1f}-{end:.1f}]: {e}")
+        return SegmentResult(path, start, end, "", str(e) or type(e).__name__)
+    return SegmentResult(path, start, end, text)
+
+
+def _format_srt_time(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def write_srt(path: str, segments: List[Dict]):
+    """写出SRT字幕"""
+    with open(path, "w", encoding="utf-8") as f:
+        index = 1
+        for segment in segments:
+            if not segment["text"]:
+                continue
+            f.write(f"{index}\n{_format_srt_time(segment['start'])} --> {_format_srt_time(segment['end'])}\n"
+                    f"{segment['text']}\n\n")
+            index += 1
+
+
+def find_audio_files(root: str) -> List[str]:
+    files = []
+    for directory, _, names in os.walk(root):
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                files.append(os.path.join(directory, name))
+    return sorted(files)
+
+
+def load_completed(output_path: str) -> set:
+    """读取已完成的文件，支持中断后续跑"""
+    completed = set()
+    if os.path.exists(output_path):
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    completed.add(json.loads(line)["file"])
+                except (ValueError, KeyError):
+                    continue  # 中断时写了一半的行
+    return completed
+
+
+def run_batch(args) -> int:
+    config_loader = ConfigLoader(args.config)
+    model_config = config_loader.get_model_config()
+    model_path = args.model or model_config.get("sense_voice_path")
+    model_path = config_loader.resolve_model_path(model_path) or model_path
+    vad_path = config_loader.resolve_model_path(model_config.get("vad_model_path")) if not args.no_vad else None
+
+    files = find_audio_files(args.input)
+    completed = load_completed(args.output)
+    pending_files = [f for f in files if os.path.relpath(f, args.input) not in completed]
+    print(f"共 {len(files)} 个文件，已完成 {len(files) - len(pending_files)} 个，待处理 {len(pending_files)} 个")
+    if not pending_files:
+        return 0
+    if args.srt:
+        os.makedirs(args.srt, exist_ok=True)
+    # 上次中断可能留下不完整的末行，先补换行再追加
+    if os.path.exists(args.output) and os.path.getsize(args.output) > 0:
+        with open(args.output, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    start_time = time.perf_counter()
+    total_audio = 0.0
+    # 每个文件的待完成语音段数及已识别结果
+    remaining: Dict[str, int] = {}
+    durations: Dict[str, float] = {}
+    results: Dict[str, List[Dict]] = {}
+    # 有语音段失败的文件及首个错误
+    errors: Dict[str, str] = {}
+    failed_files = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(model_path, vad_path, args.threads)) as pool, \
+            open(args.output, "a", encoding="utf-8") as output:
+
+        def finish_file(path: str):
+            nonlocal total_audio, failed_files
+            segments = sorted(results.pop(path), key=lambda s: s["start"])
+            relative = os.path.relpath(path, args.input)
+            if path in errors:
+                # 不写入结果文件，续跑时重新处理
+                failed_files += 1
+                print(f"失败 {relative}: {errors.pop(path)}")
+                return
+            record = {
+                "file": relative,
+                "duration": round(durations[path], 3),
+                "text": "".join(s["text"] for s in segments),
+                "segments": segments,
+            }
+            # 逐文件追加并立即落盘
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            if args.srt:
+                write_srt(os.path.join(args.srt, os.path.splitext(relative.replace(os.sep, "_"))[0] + ".srt"),
+                          segments)
+            total_audio += durations[path]
+            elapsed = time.perf_counter() - start_time
+            print(f"完成 {relative} ({durations[path]:.1f} s)，累计 {total_audio / 3600:.2f} 小时音频 / "
+                  f"{elapsed / 3600:.3f} 小时")
+
+        futures = {pool.submit(_split_file, path, args.max_segment) for path in pending_files}
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    value = future.result()
+                except Exception as e:
+                    failed_files += 1
+                    print(f"处理失败: {e}")
+                    continue
+                if isinstance(value, FileSplit):
+                    # VAD切分完成，分发语音段
+                    path, duration, segments = value
+                    durations[path] = duration
+                    results[path] = []
+                    remaining[path] = len(segments)
+                    if not segments:
+                        finish_file(path)
+                    for beg, end in segments:
+                        futures.add(pool.submit(_transcribe_segment, path, beg, end))
+                else:
+                    path, beg, end, text, error = value
+                    if error:
+                        errors.setdefault(path, f"[{beg:.1f}-{end:.1f}] {error}")
+                    results[path].append({"start": round(beg, 3), "end": round(end, 3), "text": text})
+                    remaining[path] -= 1
+                    if remaining[path] == 0:
+                        finish_file(path)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"转写完成: {total_audio / 3600:.2f} 小时音频，用时 {elapsed / 3600:.3f} 小时，"
+          f"速度 {total_audio / max(elapsed, 1e-9):.1f} 音频小时/墙钟小时")
+    if failed_files:
+        print(f"{failed_files} 个文件失败，重新运行将重试")
+        return 1
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="批量转写音频目录")
+    parser.add_argument("input", help="音频目录")
+    parser.add_argument("-o", "--output", default="transcripts.jsonl", help="JSONL结果文件（追加写入）")
+    parser.add_argument("--srt", help="SRT字幕输出目录")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--model", help="非流式识别模型路径，默认使用配置中的SenseVoice")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threads", type=int, default=2, help="每个工作进程的torch线程数")
+    parser.add_argument("--max-segment", type=float, default=30.0, help="语音段最长秒数")
+    parser.add_argument("--no-vad", action="store_true", help="不做VAD切分")
+    return run_batch(parser.parse_args())
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
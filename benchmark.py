@@ -0,0 +1,958 @@
+"""
+性能基准与压力测试脚本
+
+用法:
+    python benchmark.py soak --hours 1
+    python benchmark.py hotkey-replay [timeline.json] [--realtime]
+    python benchmark.py idle-reload
+    python benchmark.py server-load --sessions 4 --seconds 30
+    python benchmark.py dsp --seconds 60 [--corpus 带噪语料目录]
+    python benchmark.py device-failover [--mode stall|error|both]
+    python benchmark.py ui-latency --seconds 10 [--model]
+    python benchmark.py startup [--no-load]
+    python benchmark.py handsfree --seconds 30 [--model]
+    python benchmark.py audio-path --minutes 10
+    python benchmark.py scheduler --seconds 12
+    python benchmark.py itn
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+from audio_dsp import pcm16_to_float, to_pcm16
+from config_loader import ConfigLoader
+from memory_monitor import process_memory_available, process_memory_bytes
+
+
+def synthetic_audio(seconds: float, sample_rate: int = 16000, seed: int = 0) -> np.ndarray:
+    """生成带噪声的合成语音信号（调幅谐波+白噪声）"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate), dtype=np.float32) / sample_rate
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 3 * t))
+    voiced = np.sin(2 * np.pi * 180 * t) + 0.5 * np.sin(2 * np.pi * 360 * t)
+    noise = rng.normal(0, 0.02, len(t))
+    return (0.1 * envelope * voiced + noise).astype(np.float32)
+
+
+def run_soak(args) -> int:
+    """长时间会话内存平稳性测试：持续送入合成音频，检查内存是否随时长增长"""
+    from voice_recognizer import VoiceRecognizer
+
+    if not process_memory_available():
+        # 没有真实测量时不能判定内存平稳
+        print("未安装psutil，无法测量进程内存，浸泡测试失败")
+        return 1
+
+    recognizer = VoiceRecognizer(ConfigLoader(args.config))
+    if not recognizer.is_model_loaded():
+        print("模型加载失败")
+        return 1
+
+    block_seconds = 0.1
+    block = to_pcm16(synthetic_audio(block_seconds, recognizer.sample_rate))
+    total_blocks = int(args.hours * 3600 / block_seconds)
+    sample_every = int(60 / block_seconds)  # 每分钟音频采样一次内存
+
+    session = recognizer.open_session()
+
+    samples = []
+    max_feed_times = 0
+    start = time.perf_counter()
+    for i in range(total_blocks):
+        recognizer.feed_audio(session, block)
+        # 控制积压，避免队列本身占用内存干扰测量
+        while recognizer.audio_queue.qsize() > 50:
+            time.sleep(0.01)
+        if i % sample_every == 0:
+            samples.append(process_memory_bytes() / 1024 / 1024)
+            max_feed_times = max(max_feed_times, len(session.feed_times))
+            print(f"音频 {i * block_seconds / 60:.0f} min, RSS {samples[-1]:.1f} MB, "
+                  f"送入记录 {len(session.feed_times)}")
+
+    recognizer.close_session(session)
+    recognizer.shutdown()
+    elapsed = time.perf_counter() - start
+    print(f"处理 {args.hours:.2f} 小时音频用时 {elapsed:.0f} s")
+    print(f"会话内存统计: {recognizer.last_memory_stats}")
+
+    # 送入记录只应覆盖尚未解码的音频（积压上限50块加一个分块）
+    if max_feed_times > 100:
+        print(f"送入记录未及时清理: 最多 {max_feed_times} 条")
+        return 1
+
+    # 跳过预热阶段后比较首尾内存
+    warm = samples[len(samples) // 10:]
+    if len(warm) >= 2:
+        growth = warm[-1] - warm[0]
+        print(f"预热后内存增长: {growth:.1f} MB (上限 {args.max_growth_mb} MB)")
+        if growth > args.max_growth_mb:
+            print("内存未保持平稳")
+            return 1
+    return 0
+
+
+def _auto_repeat(start: float, stop: float, delay: float = 0.25, rate: float = 0.05) -> list:
+    """按住期间系统自动重复的按下事件"""
+    events = []
+    t = start + delay
+    while t < stop:
+        events.append([round(t, 3), "press"])
+        t += rate
+    return events
+
+
+# 内置的按键时间线样例：含自动重复的长按、短按、短按后长按、判定时刻前松开
+HOTKEY_TIMELINES = {
+    "hold-auto-repeat": {
+        "events": [[0.0, "press"]] + _auto_repeat(0.0, 1.0) + [[1.0, "release"]],
+        "expected": ["long_press_start", "long_press_end"],
+    },
+    "short-tap": {
+        "events": [[0.0, "press"], [0.12, "release"]],
+        "expected": [],
+    },
+    "tap-then-hold": {
+        "events": [[0.0, "press"], [0.1, "release"], [0.3, "press"]] + _auto_repeat(0.3, 1.2) +
+                  [[1.2, "release"]],
+        "expected": ["long_press_start", "long_press_end"],
+    },
+    "release-before-deadline": {
+        "events": [[0.0, "press"]] + _auto_repeat(0.0, 0.49) + [[0.49, "release"]],
+        "expected": [],
+    },
+    "two-holds": {
+        "events": [[0.0, "press"]] + _auto_repeat(0.0, 0.8) + [[0.8, "release"], [1.0, "press"]] +
+                  _auto_repeat(1.0, 1.7) + [[1.7, "release"]],
+        "expected": ["long_press_start", "long_press_end", "long_press_start", "long_press_end"],
+    },
+}
+
+
+def _replay_timeline_case(timeline: dict, args) -> bool:
+    """回放一条时间线，检查动作序列和长按触发延迟"""
+    from input_controller import InputController, replay_timeline
+
+    duration = timeline.get("long_press_duration", 0.5)
+    events = [(float(t), kind) for t, kind in timeline["events"]]
+
+    if args.realtime:
+        # 绕过键盘钩子，按真实时间把事件送入调度线程
+        config_loader = ConfigLoader(args.config)
+        controller = InputController(config_loader)
+        controller.enable_caps_toggle = False
+        controller.state_machine.long_press_duration = duration
+        actions = []
+        lock = threading.Lock()
+        origin = time.monotonic()
+
+        def record(action):
+            # 回调在调度线程中执行，此时状态机记录的按下时刻即被接受的那次按下
+            with lock:
+                actions.append((time.monotonic() - origin, action,
+                                controller.state_machine.press_time - origin))
+
+        controller.set_callbacks(lambda: record("long_press_start"), lambda: record("long_press_end"))
+        worker = threading.Thread(target=controller._scheduler_worker, daemon=True)
+        worker.start()
+        for timestamp, kind in sorted(events):
+            time.sleep(max(0.0, origin + timestamp - time.monotonic()))
+            controller._events.put((kind, origin + timestamp))
+        time.sleep(duration + 0.1)
+        controller._events.put(None)
+        worker.join()
+    else:
+        actions = [item for item in replay_timeline(events, duration) if item[1] != "short_press"]
+
+    # 长按触发延迟: 触发时刻 - (被接受的按下时刻 + 判定时长)
+    ok = True
+    for timestamp, action, pressed in actions:
+        line = f"{timestamp * 1000:9.1f} ms  {action}"
+        if action == "long_press_start":
+            latency_ms = (timestamp - pressed - duration) * 1000
+            line += f"  (触发延迟 {latency_ms:.2f} ms)"
+            # 离线回放时延迟理论为0，留出浮点误差
+            if not -1e-6 <= latency_ms <= args.max_latency_ms:
+                line += f"  超出 [0, {args.max_latency_ms:.1f}] ms"
+                ok = False
+        print(line)
+
+    expected = timeline.get("expected")
+    if expected is not None and [a for _, a, _ in actions] != expected:
+        print(f"动作序列不符，期望: {expected}")
+        ok = False
+    return ok
+
+
+def run_hotkey_replay(args) -> int:
+    """回放按键时间线，检查动作序列和长按触发延迟；不指定文件时回放内置样例
+
+    时间线文件格式:
+        {"long_press_duration": 0.5,
+         "events": [[0.0, "press"], [0.9, "release"]],
+         "expected": ["long_press_start", "long_press_end"]}
+    """
+    if args.timeline:
+        with open(args.timeline, "r", encoding="utf-8") as f:
+            timelines = {os.path.basename(args.timeline): json.load(f)}
+    else:
+        timelines = HOTKEY_TIMELINES
+
+    failures = 0
+    for name, timeline in timelines.items():
+        print(f"[{name}]")
+        if not _replay_timeline_case(timeline, args):
+            failures += 1
+    print(f"{len(timelines)} 条时间线, {failures} 条失败")
+    return 1 if failures else 0
+
+
+def run_idle_reload(args) -> int:
+    """空闲卸载收益：比较卸载释放的常驻内存与快照恢复、磁盘重载的耗时"""
+    from voice_recognizer import VoiceRecognizer
+
+    if not process_memory_available():
+        print("未安装psutil，以下常驻内存数值无效，只比较耗时")
+
+    recognizer = VoiceRecognizer(ConfigLoader(args.config))
+    if not recognizer.is_model_loaded():
+        print("模型加载失败")
+        return 1
+    mb = 1024 * 1024
+
+    for round_index in range(args.rounds):
+        loaded_rss = process_memory_bytes()
+        recognizer.unload_models()
+        unloaded_rss = process_memory_bytes()
+
+        start = time.perf_counter()
+        recognizer.restore_models()
+        restore_seconds = time.perf_counter() - start
+
+        print(f"第{round_index + 1}轮: 常驻 {loaded_rss / mb:.0f} MB -> 卸载后 {unloaded_rss / mb:.0f} MB "
+              f"(节省 {(loaded_rss - unloaded_rss) / mb:.0f} MB), 快照恢复 {restore_seconds * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    recognizer._load_models()
+    print(f"从磁盘完整加载: {(time.perf_counter() - start) * 1000:.0f} ms")
+    recognizer.shutdown()
+    return 0
+
+
+async def _server_client(host: str, port: int, audio: np.ndarray, sample_rate: int,
+                         realtime: bool) -> dict:
+    """单个压测客户端：按帧推送音频，收集结果延迟"""
+    from recognition_server import FRAME_AUDIO, FRAME_END, encode_frame
+
+    reader, writer = await asyncio.open_connection(host, port)
+    pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+    frame = int(sample_rate * 0.1)
+    latencies = []
+    final = {}
+
+    async def receive():
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            message = json.loads(line)
+            if message["type"] == "error":
+                final["error"] = message["message"]
+                return
+            latencies.append(message["latency_ms"])
+            if message["type"] == "final":
+                final.update(message)
+                return
+
+    receiver = asyncio.create_task(receive())
+    start = time.perf_counter()
+    for offset in range(0, len(pcm), frame):
+        writer.write(encode_frame(FRAME_AUDIO, pcm[offset:offset + frame].tobytes()))
+        await writer.drain()
+        if realtime:
+            await asyncio.sleep(max(0.0, start + (offset + frame) / sample_rate - time.perf_counter()))
+    writer.write(encode_frame(FRAME_END))
+    await writer.drain()
+    await receiver
+    writer.close()
+    return {"latencies": latencies, "wall": time.perf_counter() - start, "final": final}
+
+
+def run_server_load(args) -> int:
+    """本地识别服务压测：并发会话的单会话延迟与总吞吐"""
+    sample_rate = 16000
+    audio = synthetic_audio(args.seconds, sample_rate)
+
+    async def run_all():
+        return await asyncio.gather(*[
+            _server_client(args.host, args.port, audio, sample_rate, not args.fast)
+            for _ in range(args.sessions)
+        ])
+
+    start = time.perf_counter()
+    results = asyncio.run(run_all())
+    wall = time.perf_counter() - start
+
+    accepted = 0
+    for index, result in enumerate(results):
+        latencies = np.array(result["latencies"] or [0.0])
+        if "error" in result["final"]:
+            print(f"会话{index + 1}: 被拒绝 ({result['final']['error']})")
+            continue
+        accepted += 1
+        print(f"会话{index + 1}: 结果 {len(result['latencies'])} 条, 延迟 p50 {np.percentile(latencies, 50):.0f} ms, "
+              f"p95 {np.percentile(latencies, 95):.0f} ms, 用时 {result['wall']:.1f} s")
+    total_audio = args.seconds * accepted
+    print(f"总吞吐: {total_audio:.0f} s 音频 / {wall:.1f} s = {total_audio / wall:.2f}x 实时")
+    return 0
+
+
+def run_dsp(args) -> int:
+    """音频前端开销与降噪效果：每秒音频的处理耗时（占单核比例）及信噪比提升"""
+    from audio_dsp import AudioFrontEnd
+
+    sample_rate = 16000
+    dsp_config = ConfigLoader(args.config).get_dsp_config()
+    rng = np.random.default_rng(0)
+    # 干净信号：音高缓变的谐波叠加，按音节包络调制并带停顿
+    t = np.arange(int(args.seconds * sample_rate)) / sample_rate
+    phase = 2 * np.pi * np.cumsum(150 + 30 * np.sin(2 * np.pi * 0.7 * t)) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 15))
+    envelope = np.clip(np.sin(2 * np.pi * 3 * t), 0, None) * (np.sin(2 * np.pi * 0.4 * t) > -0.3)
+    clean = (0.05 * envelope * voiced).astype(np.float32)
+    noisy = clean + rng.normal(0, args.noise, len(t)).astype(np.float32)
+
+    def snr(reference: np.ndarray, signal: np.ndarray) -> float:
+        return float(10 * np.log10(np.sum(reference ** 2) / np.sum((signal - reference) ** 2)))
+
+    # 与采集回调相同的100ms分块；只比较降噪，关闭增益以免影响信噪比计算
+    frontend = AudioFrontEnd.from_config(dict(dsp_config, agc=False), sample_rate)
+    block = sample_rate // 10
+    start = time.perf_counter()
+    pcm = to_pcm16(noisy)
+    output = np.concatenate([frontend.process(pcm[i:i + block]) for i in range(0, len(pcm), block)]
+                            + [frontend.flush()])
+    elapsed = time.perf_counter() - start
+    output = pcm16_to_float(output)
+
+    delay = frontend.hop
+    aligned = output[delay:delay + len(clean)]
+    print(f"处理 {args.seconds:.0f} s 音频耗时 {elapsed * 1000:.1f} ms，"
+          f"每秒音频 {elapsed / args.seconds * 1000:.2f} ms（单核占用 {elapsed / args.seconds:.2%}）")
+    print(f"信噪比: 处理前 {snr(clean, noisy):.1f} dB，处理后 {snr(clean[:len(aligned)], aligned):.1f} dB")
+    if args.corpus:
+        return _dsp_corpus_cer(args)
+    return 0
+
+
+def _dsp_corpus_cer(args) -> int:
+    """在带噪语料上分别关闭和开启音频前端识别，比较字错误率（与evaluate.py相同的流式会话路径）"""
+    from evaluate import evaluate_config, load_corpus
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print("语料目录中没有带参考文本的音频")
+        return 1
+    eval_args = argparse.Namespace(config=args.config, workers=args.workers, threads=1,
+                                   realtime=False, details=False)
+    results = {}
+    for enabled in (False, True):
+        summary = evaluate_config(f"dsp={enabled}", {"dsp.enabled": enabled}, corpus, eval_args)
+        results[enabled] = summary
+        print(f"音频前端{'开启' if enabled else '关闭'}: CER {summary['cer']:.2%}"
+              f"（{summary['files']} 个文件，超时 {summary['timeouts']} 个），RTF {summary['rtf']:.3f}")
+    increase = results[True]["cer"] - results[False]["cer"]
+    if increase > args.max_cer_increase:
+        print(f"开启音频前端后CER上升 {increase:.2%}，超过允许的 {args.max_cer_increase:.2%}")
+        return 1
+    return 0
+
+
+def run_device_failover(args) -> int:
+    """设备故障恢复：用模拟输入流在会话中途中断，检查自动重开后音频继续送入同一会话
+
+    stall模式：输入流像设备拔出一样静默停止回调；
+    error模式：输入流报错中止，stop/close抛出PortAudio错误，且第一次重新初始化音频系统失败。
+    """
+    modes = ["stall", "error"] if args.mode == "both" else [args.mode]
+    failed = False
+    for mode in modes:
+        failed |= _device_failover_case(args, mode) != 0
+    return 1 if failed else 0
+
+
+def _device_failover_case(args, mode: str) -> int:
+    import audio_capture
+
+    sample_rate = 16000
+    block = sample_rate // 100
+    streams = []
+    portaudio = {"initialized": True, "init_failures": 1 if mode == "error" else 0, "reinit": 0}
+
+    class FakePortAudioError(Exception):
+        pass
+
+    class FakeStream:
+        """模拟输入流：按实时节奏回调，到达指定时刻后中断"""
+
+        def __init__(self, samplerate, device, channels, dtype, callback):
+            if not portaudio["initialized"]:
+                raise FakePortAudioError("PortAudio not initialized")
+            self.callback = callback
+            self.active = False
+            self.broken = False
+            self.fail_after = args.fail_after if not streams else None
+            streams.append(self)
+
+        def start(self):
+            self.active = True
+            threading.Thread(target=self._run, daemon=True).start()
+
+        def _run(self):
+            started = time.monotonic()
+            while self.active:
+                if self.fail_after is not None and time.monotonic() - started > self.fail_after:
+                    # 报错中止时流变为非活动状态，之后的stop/close也会报错
+                    self.broken = mode == "error"
+                    self.active = False
+                    return
+                self.callback(np.zeros((block, 1), dtype=np.int16), block, None, None)
+                time.sleep(block / sample_rate)
+
+        def stop(self):
+            self.active = False
+            if self.broken:
+                raise FakePortAudioError("Unanticipated host error")
+
+        def close(self):
+            if self.broken:
+                raise FakePortAudioError("Unanticipated host error")
+
+    class FakeDevices:
+        InputStream = FakeStream
+
+        @staticmethod
+        def query_devices(device=None, kind=None):
+            info = {"name": f"模拟设备 {len(streams)}", "max_input_channels": 1}
+            return info if kind else [info]
+
+        @staticmethod
+        def _terminate():
+            portaudio["initialized"] = False
+
+        @staticmethod
+        def _initialize():
+            portaudio["reinit"] += 1
+            if portaudio["init_failures"]:
+                portaudio["init_failures"] -= 1
+                raise FakePortAudioError("Error initializing PortAudio")
+            portaudio["initialized"] = True
+
+    audio_capture.sd = FakeDevices
+    capture = audio_capture.AudioCapture(sample_rate, stall_seconds=args.stall)
+    received = []
+    capture.begin(lambda audio: received.append((time.monotonic(), len(audio))))
+    time.sleep(args.seconds)
+    capture.end()
+
+    # 最长的无音频间隔即为中断恢复耗时
+    times = [t for t, _ in received]
+    gap = max((b - a for a, b in zip(times, times[1:])), default=0.0)
+    total = sum(n for _, n in received) / sample_rate
+    print(f"[{mode}] 重开次数 {capture.reopen_count}，重新初始化 {portaudio['reinit']} 次，"
+          f"当前设备 {capture.device_name}，收到 {total:.2f} s 音频，最长中断 {gap * 1000:.0f} ms")
+    if capture.reopen_count < 1 or not times or times[-1] - times[0] < args.fail_after + args.stall:
+        print(f"[{mode}] 未能在中断后恢复音频输入")
+        return 1
+    return 0
+
+
+def run_ui_latency(args) -> int:
+    """界面响应：识别负载下从其他线程频繁更新托盘状态，测量事件循环延迟和状态刷新延迟"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+    from tray_ui import TrayUI
+
+    app = QApplication(sys.argv[:1])
+    config_loader = ConfigLoader(args.config)
+    tray = TrayUI(config_loader)
+    stop = threading.Event()
+
+    # 识别负载：真实模型或同等占用GIL的合成计算
+    if args.model:
+        from voice_recognizer import VoiceRecognizer
+        recognizer = VoiceRecognizer(config_loader)
+        audio = to_pcm16(synthetic_audio(args.seconds + 1))
+
+        def load_worker():
+            session = recognizer.open_session(callback=lambda *_: None)
+            block = recognizer.sample_rate // 10
+            for i in range(0, len(audio), block):
+                if stop.is_set():
+                    break
+                recognizer.feed_audio(session, audio[i:i + block])
+                time.sleep(0.1)
+            recognizer.close_session(session)
+    else:
+        from audio_dsp import AudioFrontEnd
+        frontend = AudioFrontEnd()
+        audio = to_pcm16(synthetic_audio(1.0))
+
+        def load_worker():
+            while not stop.is_set():
+                frontend.process(audio)
+                sum(i * i for i in range(20000))
+
+    # 模拟按键线程和识别线程的状态更新突发
+    def status_worker():
+        statuses = [("正在识别", True), ("就绪", False)]
+        i = 0
+        while not stop.is_set():
+            for _ in range(args.burst):
+                tray.update_status(*statuses[i % 2])
+                i += 1
+            time.sleep(0.05)
+
+    lateness = []
+    interval = 0.01
+    last_tick = [time.perf_counter()]
+
+    def on_tick():
+        now = time.perf_counter()
+        lateness.append(max(0.0, now - last_tick[0] - interval))
+        last_tick[0] = now
+
+    ticker = QTimer()
+    ticker.timeout.connect(on_tick)
+    ticker.start(int(interval * 1000))
+    QTimer.singleShot(int(args.seconds * 1000), app.quit)
+
+    threads = [threading.Thread(target=load_worker, daemon=True) for _ in range(args.load_threads)]
+    threads.append(threading.Thread(target=status_worker, daemon=True))
+    for thread in threads:
+        thread.start()
+    app.exec_()
+    stop.set()
+
+    def percentile(values, q):
+        return sorted(values)[int(q * (len(values) - 1))] * 1000 if values else 0.0
+
+    latencies = list(tray.status_latencies)
+    print(f"事件循环延迟: p50 {percentile(lateness, 0.5):.1f} ms, p99 {percentile(lateness, 0.99):.1f} ms, "
+          f"最大 {max(lateness, default=0) * 1000:.1f} ms")
+    print(f"状态刷新延迟: p50 {percentile(latencies, 0.5):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms")
+    print(f"状态更新请求 {tray.status_requests} 次，实际刷新 {tray.status_applied} 次")
+    return 0
+
+
+def run_handsfree(args) -> int:
+    """免按键唤醒的空闲开销：模拟常开输入流按实时节奏回调，测量监听期间的进程CPU占用"""
+    from audio_capture import AudioCapture
+    from wake_word import EnergyVAD, HandsFreeListener
+
+    sample_rate = 16000
+    block = sample_rate // 100
+    rng = np.random.default_rng(0)
+    # 背景噪声（约-50 dBFS），每隔speech_every秒插入1秒合成语音
+    source = rng.normal(0, 0.003, int(args.speech_every * sample_rate)).astype(np.float32)
+    source[:sample_rate] += synthetic_audio(1.0, sample_rate)
+    source = to_pcm16(source)
+
+    class CountingSpotter:
+        """不加载模型时的占位检测器，只统计被调用的次数和音频时长"""
+
+        def __init__(self):
+            self.calls = 0
+            self.seconds = 0.0
+
+        def detect(self, audio):
+            self.calls += 1
+            self.seconds += len(audio) / sample_rate
+            return False
+
+    listener = None
+    if args.model:
+        config_loader = ConfigLoader(args.config)
+        config_loader.config.setdefault("handsfree", {})["enabled"] = True
+        listener = HandsFreeListener.from_config(config_loader, sample_rate)
+        if listener is None:
+            return 1
+    else:
+        listener = HandsFreeListener(sample_rate, CountingSpotter(), EnergyVAD(sample_rate))
+    listener.start()
+
+    def measure(with_listener: bool) -> float:
+        capture = AudioCapture(sample_rate, preroll_seconds=0.8, keep_open=True)
+        capture.listener = listener.feed if with_listener else None
+        start_wall, start_cpu = time.monotonic(), time.process_time()
+        fed = 0
+        while time.monotonic() - start_wall < args.seconds:
+            chunk = source[fed % len(source):fed % len(source) + block]
+            capture._audio_callback(chunk.reshape(-1, 1), len(chunk), None, None)
+            fed += len(chunk)
+            # 与声卡回调相同的节奏
+            time.sleep(max(0.0, start_wall + fed / sample_rate - time.monotonic()))
+        return (time.process_time() - start_cpu) / (time.monotonic() - start_wall)
+
+    baseline = measure(False)
+    idle = measure(True)
+    listener.stop()
+    print(f"模拟输入流本身: {baseline:.2%} 单核")
+    print(f"加上唤醒监听: {idle:.2%} 单核（监听增加 {idle - baseline:.2%}）")
+    print(f"送检语音段 {listener.stats['segments']} 个，丢弃 {listener.stats['dropped']} 个，"
+          f"检出 {listener.stats['detections']} 次")
+    failed = False
+    if idle > args.max_cpu / 100:
+        print(f"空闲CPU占用超过 {args.max_cpu:.1f}%")
+        failed = True
+    if listener.stats["segments"] == 0:
+        # 模拟音频中有语音，能量VAD应至少截出一段送检
+        print("没有语音段送到唤醒词检测")
+        failed = True
+    return 1 if failed else 0
+
+
+def run_audio_path(args) -> int:
+    """采样格式对数据搬运量和内存的影响
+
+    按 采集回调拷贝 -> 预录环形缓冲 -> 识别队列 -> 会话缓冲拼接 -> 模型输入 的路径回放同一段音频：
+    原路径为float32且每来一块都拼接整个会话缓冲；现路径为int16，凑够一个分块才拼接，
+    在模型边界转换到复用的float32缓冲区。统计每小时音频的拷贝字节数和峰值内存（tracemalloc）。
+    """
+    import queue
+    import tracemalloc
+    from audio_capture import AudioRingBuffer
+
+    sample_rate = 16000
+    block = sample_rate // 100
+    stride = 10 * 960
+    total = int(args.minutes * 60 * sample_rate)
+    source = synthetic_audio(60.0, sample_rate)
+
+    def replay(dtype, batched: bool) -> dict:
+        pcm = source if dtype == np.float32 else to_pcm16(source)
+        moved = {"capture": 0, "preroll": 0, "session": 0, "model": 0}
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+
+        # 长按前的空闲音频进入预录缓冲，开始时整体送出
+        ring = AudioRingBuffer(int(0.8 * sample_rate), dtype)
+        for offset in range(0, len(ring.buffer), block):
+            ring.write(pcm[offset:offset + block])
+            moved["preroll"] += block * pcm.itemsize
+        items = queue.Queue()
+        preroll = ring.read()
+        moved["preroll"] += preroll.nbytes
+        items.put(preroll)
+
+        buffer = np.zeros(0, dtype=dtype)
+        pending = []
+        model_input = np.zeros(0, dtype=np.float32)
+        backlog_blocks = int(args.backlog * 100)
+        fed = 0
+        while fed < total:
+            offset = fed % len(pcm)
+            indata = pcm[offset:offset + block].reshape(-1, 1)
+            audio = indata[:, 0].copy()
+            moved["capture"] += audio.nbytes
+            items.put(audio)
+            fed += block
+            # 识别线程每个分块（0.6秒）处理一次；开始时积压backlog秒（如模型恢复中）
+            if fed // block < backlog_blocks or (fed // block) % 60:
+                continue
+            while not items.empty():
+                pending.append(items.get())
+                if batched and len(buffer) + sum(len(p) for p in pending) < stride:
+                    continue
+                buffer = np.concatenate([buffer] + pending)
+                pending = []
+                moved["session"] += buffer.nbytes
+                while len(buffer) >= stride:
+                    chunk = buffer[:stride]
+                    buffer = buffer[stride:]
+                    if dtype == np.int16:
+                        if len(model_input) < stride:
+                            model_input = np.empty(stride, dtype=np.float32)
+                        pcm16_to_float(chunk, model_input[:stride])
+                        moved["model"] += stride * 4
+
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        scale = 3600 * sample_rate / total
+        return {"moved": {k: v * scale for k, v in moved.items()}, "peak": peak}
+
+    mb = 1024 * 1024
+    results = {"float32": replay(np.float32, False), "int16": replay(np.int16, True)}
+    print(f"回放 {args.minutes:.0f} 分钟音频，开始时积压 {args.backlog:.1f} s，按每小时音频折算")
+    print(f"{'格式':<10}{'采集':>10}{'预录':>10}{'会话缓冲':>10}{'模型输入':>10}{'合计MB':>10}{'峰值MB':>10}")
+    for name, result in results.items():
+        moved = result["moved"]
+        print(f"{name:<10}" + "".join(f"{moved[k] / mb:>10.1f}" for k in ("capture", "preroll", "session", "model"))
+              + f"{sum(moved.values()) / mb:>10.1f}{result['peak'] / mb:>10.2f}")
+    before = sum(results["float32"]["moved"].values())
+    after = sum(results["int16"]["moved"].values())
+    print(f"拷贝量 {after / before:.0%}，峰值内存 {results['int16']['peak'] / results['float32']['peak']:.0%}（int16/float32）")
+    return 0
+
+
+def run_scheduler(args) -> int:
+    """后台任务调度：重负载后台任务运行时，实时分块的处理延迟是否保持平稳
+
+    实时部分按分块节奏到达、每块做固定量的计算（模拟流式推理），会话之间留有间隔；
+    后台部分是持续占用GIL的纯Python计算，分三种情况比较：无后台任务、直接开线程、经调度器执行。
+    """
+    from work_scheduler import WorkScheduler
+
+    chunk_interval = 0.1
+    rng = np.random.default_rng(0)
+    frame = rng.normal(size=4096).astype(np.float32)
+
+    def live_work():
+        # 约数毫秒的混合计算：向量运算加少量Python逻辑
+        total = 0.0
+        for _ in range(20):
+            total += float(np.abs(np.fft.rfft(frame)).sum())
+        return total
+
+    def background_unit():
+        total = 0
+        for i in range(20000):
+            total += i * i
+        return total
+
+    def measure(mode: str) -> dict:
+        scheduler = WorkScheduler(max_background_threads=args.threads)
+        stop = threading.Event()
+        units = [0]
+
+        def background_job():
+            while not stop.is_set():
+                if mode == "scheduled":
+                    scheduler.checkpoint()
+                background_unit()
+                units[0] += 1
+
+        workers = []
+        if mode == "thread":
+            workers = [threading.Thread(target=background_job, daemon=True) for _ in range(args.threads)]
+            for worker in workers:
+                worker.start()
+        elif mode == "scheduled":
+            workers = [scheduler.submit(background_job, name="bench") for _ in range(args.threads)]
+
+        latencies = []
+        start = time.perf_counter()
+        while time.perf_counter() - start < args.seconds:
+            # 一个会话，之后间隔一段时间
+            scheduler.live_started()
+            session_start = time.perf_counter()
+            arrival = session_start
+            while arrival - session_start < args.session_seconds:
+                time.sleep(max(0.0, arrival - time.perf_counter()))
+                live_work()
+                latencies.append((time.perf_counter() - arrival) * 1000)
+                arrival += chunk_interval
+            scheduler.live_finished()
+            time.sleep(args.gap)
+        stop.set()
+        for worker in workers:
+            if isinstance(worker, threading.Thread):
+                worker.join(timeout=1.0)
+            else:
+                worker.result(timeout=5.0)
+
+        latencies.sort()
+        return {
+            "p50": latencies[len(latencies) // 2],
+            "p95": latencies[int(0.95 * (len(latencies) - 1))],
+            "max": latencies[-1],
+            "units": units[0],
+            "stats": scheduler.stats(),
+        }
+
+    results = {mode: measure(mode) for mode in ("none", "thread", "scheduled")}
+    labels = {"none": "无后台任务", "thread": "直接开线程", "scheduled": "经调度器"}
+    print(f"{'情况':<12}{'p50 ms':>10}{'p95 ms':>10}{'最大 ms':>10}{'后台完成':>10}")
+    for mode, result in results.items():
+        print(f"{labels[mode]:<12}{result['p50']:>10.1f}{result['p95']:>10.1f}{result['max']:>10.1f}"
+              f"{result['units']:>10}")
+    print(f"调度统计: {results['scheduled']['stats']}")
+
+    # 经调度器时实时延迟应与无后台任务时相当
+    baseline, scheduled = results["none"]["p95"], results["scheduled"]["p95"]
+    if scheduled > baseline * args.tolerance + 1.0:
+        print(f"经调度器的p95延迟 {scheduled:.1f} ms 超过无后台任务时的 {args.tolerance:.1f} 倍")
+        return 1
+    return 0
+
+
+# 逆文本正则化回归用例：(输入, 期望输出)，成语和副词不应被改成数字
+ITN_CASES = [
+    ("十分感谢", "十分感谢"),
+    ("乱七八糟", "乱七八糟"),
+    ("一点一点", "一点一点"),
+    ("三点一刻", "三点一刻"),
+    ("千万不要", "千万不要"),
+    ("万一下雨", "万一下雨"),
+    ("一个人", "一个人"),
+    ("十分钟", "10分钟"),
+    ("二十分钟", "20分钟"),
+    ("三千万元", "30000000元"),
+    ("这是一万一千元", "这是11000元"),
+    ("百分之五十", "50%"),
+    ("三点五公里", "3.5公里"),
+    ("二零二五年一月三号", "2025年1月3号"),
+    ("电话幺三八零零一一零零", "电话138001100"),
+]
+
+
+def run_itn(args) -> int:
+    """逆文本正则化回归检查：逐条比较输出，并测量单段处理耗时"""
+    from text_postprocessor import InverseTextNormalizer
+
+    normalizer = InverseTextNormalizer()
+    failures = 0
+    for text, expected in ITN_CASES:
+        output = normalizer.process(text)
+        if output != expected:
+            failures += 1
+            print(f"不符: {text} -> {output} (期望 {expected})")
+
+    texts = [text for text, _ in ITN_CASES] * 100
+    start = time.perf_counter()
+    normalizer.process_batch(texts)
+    per_segment_us = (time.perf_counter() - start) * 1e6 / len(texts)
+    print(f"{len(ITN_CASES)} 条用例, {failures} 条不符, 单段耗时 {per_segment_us:.1f} us")
+    return 1 if failures else 0
+
+
+def run_startup(args) -> int:
+    """启动耗时：直接使用模型目录，与经模型仓库首次导入、再次启动（命中索引）对比"""
+    import shutil
+    import tempfile
+    from model_store import ModelStore
+
+    model_config = ConfigLoader(args.config).get_model_config()
+    paths = [p for p in (model_config.get("local_path"), model_config.get("vad_model_path")) if p]
+    paths = [p for p in paths if os.path.isdir(p)]
+    if not paths:
+        print("没有可用的本地模型目录")
+        return 1
+
+    def load(resolved_paths):
+        if args.no_load:
+            return 0.0
+        from funasr import AutoModel
+        start = time.perf_counter()
+        for path in resolved_paths:
+            AutoModel(model=path)
+        return time.perf_counter() - start
+
+    store_dir = tempfile.mkdtemp(prefix="model_store_")
+    try:
+        start = time.perf_counter()
+        resolved = [p for p in paths if os.path.exists(p)]
+        resolve_seconds = time.perf_counter() - start
+        print(f"直接加载: 解析 {resolve_seconds * 1000:.1f} ms, 加载 {load(resolved) * 1000:.0f} ms")
+
+        for label in ("仓库首次导入", "仓库再次启动"):
+            # 每次新建仓库对象，模拟新进程只读取索引
+            start = time.perf_counter()
+            store = ModelStore(store_dir)
+            resolved = [store.resolve(p) for p in paths]
+            resolve_seconds = time.perf_counter() - start
+            print(f"{label}: 解析 {resolve_seconds * 1000:.1f} ms, 加载 {load(resolved) * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="语音识别性能基准")
+    parser.add_argument("--config", default="config.json")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    soak = subparsers.add_parser("soak", help="长时间会话内存测试")
+    soak.add_argument("--hours", type=float, default=1.0)
+    soak.add_argument("--max-growth-mb", type=float, default=50.0)
+    soak.set_defaults(func=run_soak)
+
+    replay = subparsers.add_parser("hotkey-replay", help="回放按键时间线")
+    replay.add_argument("timeline", nargs="?", help="时间线文件，默认回放内置样例")
+    replay.add_argument("--realtime", action="store_true", help="经由真实调度线程回放")
+    replay.add_argument("--max-latency-ms", type=float, default=20.0,
+                        help="允许的长按触发延迟（Windows计时器精度约15.6ms）")
+    replay.set_defaults(func=run_hotkey_replay)
+
+    idle = subparsers.add_parser("idle-reload", help="空闲卸载与恢复耗时")
+    idle.add_argument("--rounds", type=int, default=3)
+    idle.set_defaults(func=run_idle_reload)
+
+    load = subparsers.add_parser("server-load", help="本地识别服务压测")
+    load.add_argument("--host", default="127.0.0.1")
+    load.add_argument("--port", type=int, default=10095)
+    load.add_argument("--sessions", type=int, default=4)
+    load.add_argument("--seconds", type=float, default=30.0)
+    load.add_argument("--fast", action="store_true", help="不按实时速度推送")
+    load.set_defaults(func=run_server_load)
+
+    dsp = subparsers.add_parser("dsp", help="音频前端开销与降噪效果")
+    dsp.add_argument("--seconds", type=float, default=60.0)
+    dsp.add_argument("--noise", type=float, default=0.02, help="白噪声标准差")
+    dsp.add_argument("--corpus", help="带噪语料目录（音频+同名.txt参考文本），比较开关音频前端的CER")
+    dsp.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    dsp.add_argument("--max-cer-increase", type=float, default=0.0, help="允许开启前端后CER上升的绝对值")
+    dsp.set_defaults(func=run_dsp)
+
+    failover = subparsers.add_parser("device-failover", help="模拟设备中断，检查输入流自动恢复")
+    failover.add_argument("--seconds", type=float, default=3.0)
+    failover.add_argument("--fail-after", type=float, default=1.0, help="首个输入流在该时刻停止")
+    failover.add_argument("--stall", type=float, default=0.5, help="判定中断的无回调时长")
+    failover.add_argument("--mode", choices=["stall", "error", "both"], default="both",
+                          help="中断方式：静默停止回调或报错中止")
+    failover.set_defaults(func=run_device_failover)
+
+    ui = subparsers.add_parser("ui-latency", help="识别负载下的界面事件循环延迟（无界面运行）")
+    ui.add_argument("--seconds", type=float, default=10.0)
+    ui.add_argument("--burst", type=int, default=20, help="每50ms突发的状态更新次数")
+    ui.add_argument("--load-threads", type=int, default=2)
+    ui.add_argument("--model", action="store_true", help="使用真实识别模型作为负载")
+    ui.set_defaults(func=run_ui_latency)
+
+    handsfree = subparsers.add_parser("handsfree", help="免按键唤醒监听的空闲CPU占用")
+    handsfree.add_argument("--seconds", type=float, default=30.0)
+    handsfree.add_argument("--speech-every", type=float, default=10.0, help="每隔多少秒出现1秒语音")
+    handsfree.add_argument("--max-cpu", type=float, default=3.0, help="允许的空闲CPU占用（单核百分比）")
+    handsfree.add_argument("--model", action="store_true", help="使用配置中的唤醒词模型")
+    handsfree.set_defaults(func=run_handsfree)
+
+    audio_path = subparsers.add_parser("audio-path", help="int16与float32音频路径的拷贝量和峰值内存")
+    audio_path.add_argument("--minutes", type=float, default=10.0)
+    audio_path.add_argument("--backlog", type=float, default=5.0, help="开始时识别线程积压的秒数")
+    audio_path.set_defaults(func=run_audio_path)
+
+    scheduler = subparsers.add_parser("scheduler", help="重负载后台任务下实时分块延迟是否平稳")
+    scheduler.add_argument("--seconds", type=float, default=12.0)
+    scheduler.add_argument("--session-seconds", type=float, default=3.0)
+    scheduler.add_argument("--gap", type=float, default=1.0, help="会话之间的间隔")
+    scheduler.add_argument("--threads", type=int, default=1, help="后台任务线程数")
+    scheduler.add_argument("--tolerance", type=float, default=1.5, help="允许的p95延迟倍数")
+    scheduler.set_defaults(func=run_scheduler)
+
+    itn = subparsers.add_parser("itn", help="逆文本正则化回归检查")
+    itn.set_defaults(func=run_itn)
+
+    startup = subparsers.add_parser("startup", help="模型仓库对启动耗时的影响")
+    startup.add_argument("--no-load", action="store_true", help="只测路径解析，不加载模型")
+    startup.set_defaults(func=run_startup)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
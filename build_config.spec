@@ -7,10 +7,7 @@ a = Analysis(
     binaries=[],
     datas=[
         ('config.json', '.'),
-        ('iic', 'iic'),
-        ('iic/SenseVoiceSmall/model.pt', 'iic/SenseVoiceSmall/'),
-        ('iic/fsmn-vad/model.pt', 'iic/fsmn-vad/'),
-        ('iic/paraformer-zh-streaming/model.pt', 'iic/paraformer-zh-streaming/'),
+        # 模型不再打包进程序，首次运行时从程序旁的 iic 目录导入本地模型仓库
     ],
     hiddenimports=[
         'PyQt5.QtCore',
@@ -1,14 +1,29 @@
+import copy
 import json
 import os
-from typing import Dict, Any, Optional
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, List, Set
 from pathlib import Path
+from model_store import ModelStore
 
 class ConfigLoader:
-    """配置加载器 - 处理配置文件读取和本地模型加载逻辑"""
+    """配置加载器 - 处理配置文件读取和本地模型加载逻辑
+    
+    修改在事务中批量进行，提交时原子写入一次文件并通知订阅者变化的配置项（如 "input.hotkey"）；
+    启用文件监视后，外部编辑也会被重新加载并通知。
+    """
     
     def __init__(self, config_path: str = "config.json"):
         self.config_path = config_path
         self.config = {}
+        self._lock = threading.RLock()
+        self._transaction_depth = 0
+        self._changed_keys: Set[str] = set()
+        self._subscribers: List[Callable[[Set[str]], None]] = []
+        self._file_signature = None
+        self._watch_stop: Optional[threading.Event] = None
+        self._model_store: Optional[ModelStore] = None
         self.load_config()
     
     def load_config(self) -> Dict[str, Any]:
@@ -17,6 +32,7 @@ class ConfigLoader:
             if os.path.exists(self.config_path):
                 with open(self.config_path, 'r', encoding='utf-8') as f:
                     self.config = json.load(f)
+                self._file_signature = self._read_signature()
             else:
                 # 创建默认配置
                 self.config = self._get_default_config()
@@ -34,33 +50,224 @@ class ConfigLoader:
                 "name": "paraformer-zh-streaming",
                 "local_path": "./iic/paraformer-zh-streaming",
                 "vad_model_path": "./iic/fsmn-vad",
-                "sense_voice_path": "./iic/SenseVoiceSmall"
+                "sense_voice_path": "./iic/SenseVoiceSmall",
+                "idle_unload_minutes": 30,
+                "snapshot_dir": "",
+                "use_store": True,
+                "store_dir": "",
+                "pool_budget_mb": 2048,
+                "max_segment_seconds": 30,
+                "choices": [
+                    {"name": "Paraformer 中文流式", "path": "./iic/paraformer-zh-streaming", "streaming": True},
+                    {"name": "SenseVoice 多语种", "path": "./iic/SenseVoiceSmall", "streaming": False}
+                ]
             },
             "audio": {
                 "sample_rate": 16000,
                 "chunk_size": [0, 10, 5],
+                "adaptive_chunk": True,
+                "chunk_profiles": [[0, 8, 4], [0, 10, 5]],
                 "encoder_chunk_look_back": 4,
-                "decoder_chunk_look_back": 1
+                "decoder_chunk_look_back": 1,
+                "keep_stream_open": True,
+                "preroll_ms": 300,
+                "device": "",
+                "device_stall_seconds": 1.0
             },
             "input": {
+                "hotkey": "caps lock",
                 "caps_long_press_duration": 0.5,
                 "enable_caps_toggle": True
             },
             "output": {
                 "incremental_mode": True,
-                "cross_app_input": True
+                "cross_app_input": True,
+                "replace_segments": False
+            },
+            "hotword": {
+                "enabled": False,
+                "words": [],
+                "word_files": [],
+                "model_biasing": False,
+                "pinyin_match": True,
+                "fuzzy_pinyin": True,
+                "cache_path": "./hotword_index.pkl"
+            },
+            "postprocess": {
+                "enabled": True,
+                "itn": True,
+                "punc_model_path": "./iic/ct-punc",
+                "batch_size": 8,
+                "lm_path": "",
+                "lm_hotword_bonus": 1.0
+            },
+            "memory": {
+                "max_cache_mb": 64
+            },
+            "server": {
+                "enabled": False,
+                "host": "127.0.0.1",
+                "port": 10095,
+                "max_sessions": 8,
+                "max_pending_seconds": 5.0
+            },
+            "dsp": {
+                "enabled": False,
+                "highpass_hz": 80,
+                "noise_suppression": True,
+                "agc": True,
+                "target_dbfs": -20,
+                "max_gain_db": 20
+            },
+            "profiling": {
+                "enabled": False,
+                "sessions": 3,
+                "interval_ms": 5,
+                "output_dir": ""
+            },
+            "handsfree": {
+                "enabled": False,
+                "kws_model_path": "./iic/speech_charctc_kws_phone-xiaoyun",
+                "keywords": "小云小云",
+                "vad_threshold_db": 10,
+                "max_keyword_seconds": 2.0,
+                "keyword_seconds": 1.0,
+                "silence_seconds": 1.5,
+                "max_session_seconds": 60
+            },
+            "scheduler": {
+                "max_background_threads": 1,
+                "pause_background_during_sessions": True,
+                "max_pause_seconds": 2.0
             }
         }
     
     def save_config(self) -> bool:
-        """保存配置文件"""
+        """保存配置文件：先写临时文件再替换，中途失败不会损坏原文件"""
+        with self._lock:
+            tmp_path = f"{self.config_path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.config, f, indent=4, ensure_ascii=False)
+                os.replace(tmp_path, self.config_path)
+                self._file_signature = self._read_signature()
+                return True
+            except Exception as e:
+                print(f"配置文件保存失败: {e}")
+                return False
+    
+    @contextmanager
+    def transaction(self):
+        """配置事务：其中的多次update_config只在最外层结束时写一次文件并通知一次；
+        块内抛出异常时回滚到进入时的状态（嵌套时只回滚本层），不写文件也不通知"""
+        changed: Set[str] = set()
         try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=4, ensure_ascii=False)
-            return True
-        except Exception as e:
-            print(f"配置文件保存失败: {e}")
-            return False
+            with self._lock:
+                saved_config = copy.deepcopy(self.config)
+                saved_keys = set(self._changed_keys)
+                self._transaction_depth += 1
+                try:
+                    yield self
+                except BaseException:
+                    # 原地恢复，已取走子配置字典的模块看到的也是回滚后的值
+                    self._restore(self.config, saved_config)
+                    self._changed_keys = saved_keys
+                    raise
+                finally:
+                    self._transaction_depth -= 1
+                    if self._transaction_depth == 0:
+                        changed, self._changed_keys = self._changed_keys, set()
+                        if changed:
+                            self.save_config()
+        finally:
+            # 在锁外通知，订阅者可以安全地再次修改配置
+            if changed:
+                self._notify(changed)
+    
+    @staticmethod
+    def _restore(target: Dict[str, Any], source: Dict[str, Any]):
+        for key in list(target):
+            if key not in source:
+                del target[key]
+        for key, value in source.items():
+            if isinstance(value, dict) and isinstance(target.get(key), dict):
+                ConfigLoader._restore(target[key], value)
+            else:
+                target[key] = value
+    
+    def subscribe(self, callback: Callable[[Set[str]], None]):
+        """订阅配置变化，回调参数为变化的配置项集合"""
+        self._subscribers.append(callback)
+    
+    def _notify(self, changed: Set[str]):
+        for callback in list(self._subscribers):
+            try:
+                callback(changed)
+            except Exception as e:
+                print(f"配置变化处理出错: {e}")
+    
+    @staticmethod
+    def _flatten(config: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+        """展开为 "节.键" 形式的扁平字典，列表作为整体比较"""
+        items = {}
+        for key, value in config.items():
+            path = f"{prefix}{key}"
+            if isinstance(value, dict):
+                items.update(ConfigLoader._flatten(value, path + "."))
+            else:
+                items[path] = value
+        return items
+    
+    def _read_signature(self):
+        try:
+            stat = os.stat(self.config_path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+    
+    def start_watching(self, interval: float = 1.0):
+        """启动文件监视线程，外部修改配置文件后自动重新加载"""
+        if self._watch_stop is not None:
+            return
+        self._watch_stop = threading.Event()
+        threading.Thread(target=self._watch_worker, args=(self._watch_stop, interval), daemon=True).start()
+    
+    def stop_watching(self):
+        """停止文件监视"""
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+            self._watch_stop = None
+    
+    def _watch_worker(self, stop: threading.Event, interval: float):
+        while not stop.wait(interval):
+            signature = self._read_signature()
+            if signature is None or signature == self._file_signature:
+                continue
+            self.reload_config()
+    
+    def reload_config(self) -> Set[str]:
+        """从文件重新加载配置，通知变化的配置项；文件内容无效时保留当前配置"""
+        with self._lock:
+            signature = self._read_signature()
+            try:
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    new_config = json.load(f)
+            except Exception as e:
+                # 可能是编辑器写了一半，记下签名，等下次修改再试
+                self._file_signature = signature
+                print(f"配置文件重新加载失败: {e}")
+                return set()
+            
+            old_items = self._flatten(self.config)
+            new_items = self._flatten(new_config)
+            changed = {key for key in old_items.keys() | new_items.keys()
+                       if old_items.get(key) != new_items.get(key)}
+            self.config = new_config
+            self._file_signature = signature
+        if changed:
+            print(f"配置文件已重新加载，变化项: {sorted(changed)}")
+            self._notify(changed)
+        return changed
     
     def get_model_config(self) -> Dict[str, Any]:
         """获取模型配置"""
@@ -78,6 +285,38 @@ class ConfigLoader:
         """获取输出配置"""
         return self.config.get("output", {})
     
+    def get_hotword_config(self) -> Dict[str, Any]:
+        """获取热词配置"""
+        return self.config.get("hotword", {})
+    
+    def get_postprocess_config(self) -> Dict[str, Any]:
+        """获取文本后处理配置"""
+        return self.config.get("postprocess", {})
+    
+    def get_memory_config(self) -> Dict[str, Any]:
+        """获取内存限制配置"""
+        return self.config.get("memory", {})
+    
+    def get_server_config(self) -> Dict[str, Any]:
+        """获取本地识别服务配置"""
+        return self.config.get("server", {})
+    
+    def get_dsp_config(self) -> Dict[str, Any]:
+        """获取音频前端处理配置"""
+        return self.config.get("dsp", {})
+    
+    def get_profiling_config(self) -> Dict[str, Any]:
+        """获取性能分析配置"""
+        return self.config.get("profiling", {})
+    
+    def get_handsfree_config(self) -> Dict[str, Any]:
+        """获取免按键唤醒配置"""
+        return self.config.get("handsfree", {})
+    
+    def get_scheduler_config(self) -> Dict[str, Any]:
+        """获取后台任务调度配置"""
+        return self.config.get("scheduler", {})
+    
     def validate_model_paths(self) -> bool:
         """验证模型路径是否存在"""
         model_config = self.get_model_config()
@@ -88,38 +327,57 @@ class ConfigLoader:
         ]
         
         for path in paths_to_check:
-            if path and not os.path.exists(path):
+            if path and self.resolve_model_path(path) is None:
                 print(f"模型路径不存在: {path}")
                 return False
         return True
     
+    def resolve_model_path(self, path: Optional[str]) -> Optional[str]:
+        """把配置中的本地模型路径解析为实际加载的目录：启用模型仓库时经仓库解析，否则原样返回；不可用时返回None"""
+        if not path:
+            return None
+        model_config = self.get_model_config()
+        if model_config.get("use_store", True):
+            if self._model_store is None:
+                self._model_store = ModelStore(model_config.get("store_dir") or None)
+            try:
+                resolved = self._model_store.resolve(path)
+                if resolved:
+                    return resolved
+            except Exception as e:
+                print(f"模型仓库解析失败，直接使用原路径: {e}")
+        return path if os.path.exists(path) else None
+    
     def get_model_path(self, prefer_local: bool = True) -> str:
-        """获取模型路径 - 实现本地优先策略"""
+        """获取模型路径 - 实现本地优先策略，返回配置中的路径（实际目录由resolve_model_path解析）"""
         model_config = self.get_model_config()
         
         if prefer_local:
             local_path = model_config.get("local_path")
-            if local_path and os.path.exists(local_path):
+            if local_path and self.resolve_model_path(local_path):
                 return local_path
         
         # 回退到默认模型名称
         return model_config.get("name", "paraformer-zh-streaming")
     
     def update_config(self, key: str, value: Any) -> bool:
-        """更新配置项"""
+        """更新配置项；不在事务中时立即保存"""
         try:
-            keys = key.split('.')
-            config_ref = self.config
-            
-            # 导航到目标位置
-            for k in keys[:-1]:
-                if k not in config_ref:
-                    config_ref[k] = {}
-                config_ref = config_ref[k]
-            
-            # 设置值
-            config_ref[keys[-1]] = value
-            return self.save_config()
+            with self.transaction():
+                keys = key.split('.')
+                config_ref = self.config
+                
+                # 导航到目标位置
+                for k in keys[:-1]:
+                    if k not in config_ref:
+                        config_ref[k] = {}
+                    config_ref = config_ref[k]
+                
+                # 设置值，未变化时不写文件
+                if config_ref.get(keys[-1]) != value:
+                    config_ref[keys[-1]] = copy.deepcopy(value)
+                    self._changed_keys.add(key)
+            return True
         except Exception as e:
             print(f"配置更新失败: {e}")
             return False
\ No newline at end of file
@@ -0,0 +1,259 @@
+"""
+识别准确率与速度回归评测
+
+用法:
+    python evaluate.py <语料目录> [--set audio.chunk_size=[0,8,4]] [--name 配置名] [--workers 4]
+    python evaluate.py <语料目录> --matrix configs.json
+
+语料目录中每个音频文件旁放同名 .txt 作为参考文本。每个配置都把全部语料以流式会话
+（与长按输入相同的 open_session/feed_audio/close_session 路径）送入 VoiceRecognizer，
+多进程并行，统计字错误率（CER）、实时率（RTF）和松键到最终结果的延迟，
+每个配置追加一行到结果文件，便于比较配置修改在准确率和速度两方面的影响。
+
+configs.json 格式: [{"name": "chunk8", "set": {"audio.chunk_size": [0, 8, 4]}}, ...]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from audio_dsp import to_pcm16
+from batch_transcribe import _read_audio, find_audio_files
+
+SAMPLE_RATE = 16000
+
+# 工作进程内的识别器，由初始化函数创建
+_worker_recognizer = None
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein距离，位并行算法（Myers/Hyyrö），较短的串作为位向量"""
+    if len(a) < len(b):
+        a, b = b, a
+    m = len(b)
+    if m == 0:
+        return len(a)
+
+    # 每个字符在模式串中出现位置的位掩码
+    peq: Dict[str, int] = {}
+    for i, char in enumerate(b):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    for char in a:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv & full
+    return score
+
+
+def normalize_text(text: str) -> str:
+    """计算CER前的归一化：全角转半角、转小写，去掉标点和空白"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(c for c in text if not unicodedata.category(c).startswith(("P", "Z", "S", "C")))
+
+
+def apply_overrides(config: Dict[str, Any], overrides: Dict[str, Any]):
+    """按 "节.键" 覆盖内存中的配置，不写回文件"""
+    for key, value in overrides.items():
+        node = config
+        parts = key.split(".")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+
+
+def _init_worker(config_path: str, overrides: Dict[str, Any], threads: int):
+    """进程池初始化：按配置创建识别器"""
+    global _worker_recognizer
+    import torch
+    from config_loader import ConfigLoader
+    from voice_recognizer import VoiceRecognizer
+    torch.set_num_threads(threads)
+
+    config_loader = ConfigLoader(config_path)
+    # 评测不需要麦克风、免按键监听、空闲卸载和性能分析；自适应分块会中途切换配置，
+    # 回调会话也不做后处理，不加载标点和语言模型
+    apply_overrides(config_loader.config, {
+        "audio.keep_stream_open": False,
+        "audio.adaptive_chunk": False,
+        "handsfree.enabled": False,
+        "postprocess.enabled": False,
+        "model.idle_unload_minutes": 0,
+        "profiling.enabled": False,
+    })
+    apply_overrides(config_loader.config, overrides)
+    _worker_recognizer = VoiceRecognizer(config_loader)
+
+
+def _evaluate_file(path: str, reference: str, realtime: bool) -> Dict[str, Any]:
+    """以流式会话识别一个文件并与参考文本比较"""
+    recognizer = _worker_recognizer
+    audio = to_pcm16(_read_audio(path))
+    finished = threading.Event()
+    final: List[Any] = []
+    first_partial: List[float] = []
+
+    def on_result(result):
+        if result.is_final:
+            final.append(result)
+            finished.set()
+        elif not first_partial:
+            first_partial.append(time.perf_counter())
+
+    block = recognizer.sample_rate // 10
+    start = time.perf_counter()
+    session = recognizer.open_session(callback=on_result)
+    for i in range(0, len(audio), block):
+        recognizer.feed_audio(session, audio[i:i + block])
+        if realtime:
+            # 按实际说话速度送入，延迟数据才有意义
+            time.sleep(max(0.0, start + (i + block) / recognizer.sample_rate - time.perf_counter()))
+    recognizer.close_session(session)
+    timed_out = not finished.wait(timeout=max(60.0, len(audio) / recognizer.sample_rate * 5))
+    elapsed = time.perf_counter() - start
+
+    # 超时的文件单独计数，不当作空结果计入CER
+    hypothesis = final[0].text if final else ""
+    ref, hyp = normalize_text(reference), normalize_text(hypothesis)
+    audio_seconds = len(audio) / recognizer.sample_rate
+    return {
+        "file": path,
+        "reference": reference,
+        "hypothesis": hypothesis,
+        "timed_out": timed_out,
+        "edits": 0 if timed_out else edit_distance(ref, hyp),
+        "ref_chars": 0 if timed_out else len(ref),
+        "audio_s": round(audio_seconds, 3),
+        "wall_s": round(elapsed, 3),
+        "finalize_ms": round(final[0].latency_ms, 1) if final else None,
+        "first_partial_ms": round((first_partial[0] - start) * 1000, 1) if first_partial else None,
+    }
+
+
+def load_corpus(root: str) -> List[Tuple[str, str]]:
+    """找出有同名参考文本的音频文件"""
+    corpus = []
+    for path in find_audio_files(root):
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(reference_path):
+            with open(reference_path, "r", encoding="utf-8") as f:
+                corpus.append((path, f.read().strip()))
+    return corpus
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    values = sorted(v for v in values if v is not None)
+    return round(values[int(q * (len(values) - 1))], 1) if values else None
+
+
+def evaluate_config(name: str, overrides: Dict[str, Any], corpus: List[Tuple[str, str]], args) -> Dict[str, Any]:
+    """用一个配置评测整个语料"""
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args.config, overrides, args.threads)) as pool:
+        futures = [pool.submit(_evaluate_file, path, reference, args.realtime) for path, reference in corpus]
+        details = [future.result() for future in futures]
+    wall = time.perf_counter() - start
+
+    timeouts = [d["file"] for d in details if d["timed_out"]]
+    scored = [d for d in details if not d["timed_out"]]
+    edits = sum(d["edits"] for d in scored)
+    ref_chars = sum(d["ref_chars"] for d in scored)
+    audio_seconds = sum(d["audio_s"] for d in scored)
+    processing = sum(d["wall_s"] for d in scored)
+    summary = {
+        "name": name,
+        "set": overrides,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "files": len(details),
+        "timeouts": len(timeouts),
+        "cer": round(edits / max(ref_chars, 1), 4),
+        "edits": edits,
+        "ref_chars": ref_chars,
+        "audio_s": round(audio_seconds, 1),
+        # 单个会话的处理耗时/音频时长，不受并行度影响
+        "rtf": round(processing / max(audio_seconds, 1e-9), 3),
+        "throughput_x": round(audio_seconds / max(wall, 1e-9), 2),
+        "finalize_p50_ms": _percentile([d["finalize_ms"] for d in details], 0.5),
+        "finalize_p95_ms": _percentile([d["finalize_ms"] for d in details], 0.95),
+        "first_partial_p50_ms": _percentile([d["first_partial_ms"] for d in details], 0.5),
+        "realtime": args.realtime,
+    }
+    if timeouts:
+        summary["timeout_files"] = timeouts
+    if args.details:
+        summary["details"] = details
+    return summary
+
+
+def parse_overrides(items: List[str]) -> Dict[str, Any]:
+    """解析 --set 键=值，值按JSON解析，失败时作为字符串"""
+    overrides = {}
+    for item in items or []:
+        key, _, value = item.partition("=")
+        try:
+            overrides[key.strip()] = json.loads(value)
+        except ValueError:
+            overrides[key.strip()] = value
+    return overrides
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="识别准确率与速度回归评测")
+    parser.add_argument("corpus", help="语料目录（音频+同名.txt参考文本）")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--set", action="append", metavar="键=值", help="覆盖配置项，可重复")
+    parser.add_argument("--name", default="baseline", help="配置名，写入结果文件")
+    parser.add_argument("--matrix", help="多配置JSON文件，逐个评测")
+    parser.add_argument("-o", "--output", default="eval_results.jsonl", help="结果文件（每个配置追加一行）")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threads", type=int, default=1, help="每个工作进程的torch线程数")
+    parser.add_argument("--realtime", action="store_true", help="按实时速度送入音频以测量延迟")
+    parser.add_argument("--details", action="store_true", help="结果中包含逐文件明细")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print("语料目录中没有带参考文本的音频")
+        return 1
+
+    if args.matrix:
+        with open(args.matrix, "r", encoding="utf-8") as f:
+            configs = [(c["name"], c.get("set", {})) for c in json.load(f)]
+    else:
+        configs = [(args.name, parse_overrides(args.set))]
+
+    print(f"语料 {len(corpus)} 个文件，{len(configs)} 个配置")
+    print(f"{'配置':<16}{'CER':>8}{'RTF':>8}{'吞吐':>8}{'收尾p50':>10}{'收尾p95':>10}")
+    for name, overrides in configs:
+        summary = evaluate_config(name, overrides, corpus, args)
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        print(f"{name:<16}{summary['cer']:>8.2%}{summary['rtf']:>8.3f}{summary['throughput_x']:>7.1f}x"
+              f"{summary['finalize_p50_ms'] or 0:>8.0f}ms{summary['finalize_p95_ms'] or 0:>8.0f}ms")
+        if summary["timeouts"]:
+            print(f"  {summary['timeouts']} 个文件等待最终结果超时，未计入CER: {', '.join(summary['timeout_files'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,307 @@
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+from config_loader import ConfigLoader
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # 拼音匹配为可选功能
+    lazy_pinyin = None
+
+# 索引结构变化时递增，使旧的磁盘缓存失效
+INDEX_VERSION = 1
+
+# 常见模糊音：平翘舌、前后鼻音
+_FUZZY_INITIALS = (("zh", "z"), ("ch", "c"), ("sh", "s"))
+_FUZZY_FINALS = (("ing", "in"), ("eng", "en"), ("ang", "an"))
+
+
+class AhoCorasickIndex:
+    """Aho-Corasick多模式匹配索引 - 模式为任意可哈希符号序列（字符或拼音音节）"""
+
+    def __init__(self):
+        self.goto: List[Dict[Hashable, int]] = [{}]
+        self.fail: List[int] = [0]
+        # 每个状态命中的模式: (模式长度, 值)，按长度降序
+        self.output: List[List[Tuple[int, Any]]] = [[]]
+
+    def add(self, tokens: Sequence[Hashable], value: Any):
+        """添加一个模式"""
+        state = 0
+        for token in tokens:
+            next_state = self.goto[state].get(token)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][token] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state] = [(len(tokens), value)]
+
+    def build(self):
+        """按广度优先计算失败指针并合并输出"""
+        frontier = list(self.goto[0].values())
+        while frontier:
+            next_frontier = []
+            for state in frontier:
+                for token, child in self.goto[state].items():
+                    fallback = self.fail[state]
+                    while fallback and token not in self.goto[fallback]:
+                        fallback = self.fail[fallback]
+                    target = self.goto[fallback].get(token, 0)
+                    self.fail[child] = target if target != child else 0
+                    self.output[child] = self.output[child] + self.output[self.fail[child]]
+                    next_frontier.append(child)
+            frontier = next_frontier
+
+    def search(self, tokens: Sequence[Hashable]) -> List[Tuple[int, int, Any]]:
+        """返回互不重叠的匹配 (起点, 终点, 值)，优先最左最长"""
+        matches = []
+        state = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for end, token in enumerate(tokens, 1):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for length, value in output[state]:
+                matches.append((end - length, end, value))
+
+        if not matches:
+            return matches
+
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        selected = []
+        last_end = 0
+        for start, end, value in matches:
+            if start >= last_end:
+                selected.append((start, end, value))
+                last_end = end
+        return selected
+
+
+class HotwordCorrector:
+    """热词纠正器 - 基于预编译的字符/拼音索引对识别结果做热词替换"""
+
+    def __init__(self, entries: List[str], fuzzy_pinyin: bool = True,
+                 pinyin_match: bool = True, cache_path: Optional[str] = None):
+        # 词条格式: "正确词" 或 "正确词|误识别1|误识别2"
+        self.words: List[str] = []
+        self.aliases: Dict[str, str] = {}
+        for entry in entries:
+            parts = [p.strip() for p in entry.split("|") if p.strip()]
+            if not parts:
+                continue
+            self.words.append(parts[0])
+            for alias in parts[1:]:
+                self.aliases[alias] = parts[0]
+
+        self._bias_string = " ".join(self.words)
+        self.fuzzy_pinyin = fuzzy_pinyin
+        self.pinyin_match = pinyin_match and lazy_pinyin is not None
+        self.cache_path = cache_path
+        self._pinyin_cache: Dict[str, str] = {}
+
+        self.char_index: Optional[AhoCorasickIndex] = None
+        self.pinyin_index: Optional[AhoCorasickIndex] = None
+        if self.words:
+            self._load_or_build_index()
+
+    @classmethod
+    def from_config(cls, config_loader: ConfigLoader) -> "HotwordCorrector":
+        """根据配置创建纠正器，合并配置中的词表和词表文件"""
+        hotword_config = config_loader.get_hotword_config()
+        entries: List[str] = []
+        if hotword_config.get("enabled", False):
+            entries.extend(hotword_config.get("words", []))
+            for word_file in hotword_config.get("word_files", []):
+                word_file = os.path.expanduser(word_file)
+                if not os.path.exists(word_file):
+                    print(f"热词文件不存在: {word_file}")
+                    continue
+                with open(word_file, "r", encoding="utf-8") as f:
+                    entries.extend(line.strip() for line in f
+                                   if line.strip() and not line.startswith("#"))
+
+        return cls(
+            entries,
+            fuzzy_pinyin=hotword_config.get("fuzzy_pinyin", True),
+            pinyin_match=hotword_config.get("pinyin_match", True),
+            cache_path=hotword_config.get("cache_path")
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.words)
+
+    def bias_string(self) -> str:
+        """生成传给支持上下文偏置的模型（如SeACo-Paraformer）的热词参数"""
+        return self._bias_string
+
+    def _index_key(self) -> str:
+        """词表及匹配选项的摘要，用于判断磁盘缓存是否有效"""
+        payload = json.dumps(
+            [INDEX_VERSION, self.words, sorted(self.aliases.items()),
+             self.fuzzy_pinyin, self.pinyin_match],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load_or_build_index(self):
+        """优先从磁盘缓存加载索引，词表变化时重建"""
+        key = self._index_key()
+        if self.cache_path and os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "rb") as f:
+                    cached = pickle.load(f)
+                if cached.get("key") == key:
+                    self.char_index = cached["char_index"]
+                    self.pinyin_index = cached["pinyin_index"]
+                    return
+            except Exception as e:
+                print(f"热词索引缓存读取失败: {e}")
+
+        self._build_index()
+
+        if self.cache_path:
+            try:
+                tmp_path = self.cache_path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    pickle.dump({"key": key, "char_index": self.char_index,
+                                 "pinyin_index": self.pinyin_index},
+                                f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.cache_path)
+            except Exception as e:
+                print(f"热词索引缓存写入失败: {e}")
+
+    def _build_index(self):
+        """构建字符索引（误识别别名）和拼音索引（同音/近音词）"""
+        self.char_index = AhoCorasickIndex()
+        for alias, word in self.aliases.items():
+            self.char_index.add(alias, word)
+        self.char_index.build()
+
+        self.pinyin_index = None
+        if self.pinyin_match:
+            self.pinyin_index = AhoCorasickIndex()
+            for word in self.words:
+                tokens = self._to_pinyin_tokens(word)
+                # 单音节热词误触发率过高，不参与拼音匹配
+                if len(tokens) >= 2:
+                    self.pinyin_index.add(tokens, word)
+            self.pinyin_index.build()
+
+    def _char_pinyin(self, char: str) -> str:
+        """单字拼音（带缓存），非汉字返回小写字符本身"""
+        syllable = self._pinyin_cache.get(char)
+        if syllable is None:
+            if "一" <= char <= "鿿":
+                syllable = lazy_pinyin(char)[0]
+                if self.fuzzy_pinyin:
+                    syllable = self._normalize_syllable(syllable)
+            else:
+                syllable = char.lower()
+            self._pinyin_cache[char] = syllable
+        return syllable
+
+    def _to_pinyin_tokens(self, text: str) -> List[str]:
+        return [self._char_pinyin(char) for char in text]
+
+    @staticmethod
+    def _normalize_syllable(syllable: str) -> str:
+        for src, dst in _FUZZY_INITIALS:
+            if syllable.startswith(src):
+                syllable = dst + syllable[len(src):]
+                break
+        for src, dst in _FUZZY_FINALS:
+            if syllable.endswith(src):
+                syllable = syllable[:-len(src)] + dst
+                break
+        return syllable
+
+    def correct(self, text: str) -> str:
+        """对识别文本做热词替换"""
+        return self.correct_with_spans(text)[0]
+
+    def correct_with_spans(self, text: str) -> Tuple[str, List[Tuple[int, int, str]]]:
+        """热词替换，同时返回纠正后文本中每处替换的位置 (起点, 终点, 替换前原文)
+
+        拼音匹配作用于别名替换后的文本，与已有替换重叠时合并为一处，撤销时整体还原。
+        """
+        spans: List[Tuple[int, int, str]] = []
+        if not self.words or not text:
+            return text, spans
+        if self.char_index is not None:
+            text, spans = self._apply_tracked(text, self.char_index.search(text), spans)
+        if self.pinyin_index is not None:
+            text, spans = self._apply_tracked(
+                text, self.pinyin_index.search(self._to_pinyin_tokens(text)), spans)
+        return text, spans
+
+    @staticmethod
+    def _apply_tracked(text: str, matches: List[Tuple[int, int, Any]],
+                       spans: List[Tuple[int, int, str]]) -> Tuple[str, List[Tuple[int, int, str]]]:
+        """_apply并更新替换记录：spans为text中已有的替换，与匹配重叠的并入同一区域"""
+        if not matches:
+            return text, spans
+        # 每个区域 [起点, 终点, 区域内的匹配]，区域扩展到完整覆盖与其重叠的已有替换
+        regions: List[list] = []
+        for start, end, word in matches:
+            region_start, region_end = start, end
+            for span_start, span_end, _ in spans:
+                if span_start < end and span_end > start:
+                    region_start, region_end = min(region_start, span_start), max(region_end, span_end)
+            if regions and region_start < regions[-1][1]:
+                regions[-1][1] = max(regions[-1][1], region_end)
+                regions[-1][2].append((start, end, word))
+            else:
+                regions.append([region_start, region_end, [(start, end, word)]])
+
+        pieces = []
+        new_spans = []
+        last = 0
+        length = 0
+        kept = iter(spans)
+        pending = next(kept, None)
+        for region_start, region_end, region_matches in regions:
+            # 区域之前未受影响的已有替换，按新位置保留
+            while pending is not None and pending[1] <= region_start:
+                offset = length + pending[0] - last
+                new_spans.append((offset, offset + pending[1] - pending[0], pending[2]))
+                pending = next(kept, None)
+            pieces.append(text[last:region_start])
+            length += region_start - last
+
+            # 区域的替换前原文：区域内已有替换先还原
+            original = []
+            cursor = region_start
+            while pending is not None and pending[0] < region_end:
+                original.append(text[cursor:pending[0]])
+                original.append(pending[2])
+                cursor = pending[1]
+                pending = next(kept, None)
+            original.append(text[cursor:region_end])
+            original = "".join(original)
+
+            replaced = []
+            cursor = region_start
+            for start, end, word in region_matches:
+                replaced.append(text[cursor:start])
+                replaced.append(word)
+                cursor = end
+            replaced.append(text[cursor:region_end])
+            replaced = "".join(replaced)
+
+            pieces.append(replaced)
+            if replaced != original:
+                new_spans.append((length, length + len(replaced), original))
+            length += len(replaced)
+            last = region_end
+        while pending is not None:
+            offset = length + pending[0] - last
+            new_spans.append((offset, offset + pending[1] - pending[0], pending[2]))
+            pending = next(kept, None)
+        pieces.append(text[last:])
+        return "".join(pieces), new_spans
@@ -1,19 +1,102 @@
 import time
+import queue
 import threading
-from typing import Callable, Optional
+from typing import Callable, List, Optional, Tuple
 import keyboard
 from config_loader import ConfigLoader
 
+class HotkeyStateMachine:
+    """热键状态机 - 按下/长按/释放，纯逻辑，由调用方提供单调时间戳"""
+    
+    IDLE = "idle"
+    PRESSED = "pressed"
+    HOLDING = "holding"
+    
+    # 输出动作
+    LONG_PRESS_START = "long_press_start"
+    LONG_PRESS_END = "long_press_end"
+    SHORT_PRESS = "short_press"
+    
+    def __init__(self, long_press_duration: float):
+        self.long_press_duration = long_press_duration
+        self.state = self.IDLE
+        self.press_time = 0.0
+    
+    @property
+    def deadline(self) -> Optional[float]:
+        """长按判定时刻，仅在按下未触发时有效"""
+        if self.state == self.PRESSED:
+            return self.press_time + self.long_press_duration
+        return None
+    
+    def press(self, timestamp: float) -> List[str]:
+        """按下事件；按住时的自动重复按下被忽略"""
+        actions = self.tick(timestamp)
+        if self.state == self.IDLE:
+            self.state = self.PRESSED
+            self.press_time = timestamp
+        return actions
+    
+    def release(self, timestamp: float) -> List[str]:
+        """释放事件"""
+        actions = self.tick(timestamp)
+        if self.state == self.HOLDING:
+            actions.append(self.LONG_PRESS_END)
+        elif self.state == self.PRESSED:
+            actions.append(self.SHORT_PRESS)
+        self.state = self.IDLE
+        return actions
+    
+    def tick(self, timestamp: float) -> List[str]:
+        """推进时间，到达判定时刻时触发长按"""
+        deadline = self.deadline
+        if deadline is not None and timestamp >= deadline:
+            self.state = self.HOLDING
+            return [self.LONG_PRESS_START]
+        return []
+    
+    def reset(self):
+        self.state = self.IDLE
+
+
+def replay_timeline(events: List[Tuple[float, str]],
+                    long_press_duration: float) -> List[Tuple[float, str, float]]:
+    """按时间线回放按键事件 [(时间, "press"/"release"), ...]，返回 [(时间, 动作, 按下时刻), ...]
+    
+    按下时刻是状态机实际接受的那次按下（按住时的自动重复不算），用于计算长按触发延迟。
+    与InputController的调度线程使用同一状态机，长按在判定时刻准时触发，便于离线验证触发延迟和正确性。
+    """
+    machine = HotkeyStateMachine(long_press_duration)
+    output = []
+    for timestamp, kind in sorted(events, key=lambda e: e[0]):
+        deadline = machine.deadline
+        if deadline is not None and deadline <= timestamp:
+            output.extend((deadline, action, machine.press_time) for action in machine.tick(deadline))
+        handler = machine.press if kind == "press" else machine.release
+        output.extend((timestamp, action, machine.press_time) for action in handler(timestamp))
+    deadline = machine.deadline
+    if deadline is not None:
+        output.extend((deadline, action, machine.press_time) for action in machine.tick(deadline))
+    return output
+
 class InputController:
-    """输入控制器 - 监测Caps键长按事件和管理麦克风输入启停"""
+    """输入控制器 - 监测热键长按事件和管理麦克风输入启停
+    
+    键盘钩子线程只把带时间戳的事件放入队列，由单一常驻调度线程驱动状态机并执行回调。
+    """
+    
+    # 切换大小写时注入的一次按下和一次释放会回到钩子，在此时间窗内按类型各丢弃一个
+    SYNTHETIC_EVENT_WINDOW = 0.1
     
     def __init__(self, config_loader: ConfigLoader):
         self.config_loader = config_loader
         self.is_monitoring = False
-        self.caps_pressed = False
-        self.caps_press_time = 0
-        self.long_press_triggered = False
-        self.long_press_timer = None
+        self.scheduler_thread = None
+        self._events: "queue.Queue[Optional[Tuple[str, float]]]" = queue.Queue()
+        # 待丢弃的注入事件数（按事件类型），只在调度线程中读写
+        self._suppress = {"press": 0, "release": 0}
+        self._suppress_until = 0.0
+        self._hooks = []
         
         # 回调函数
         self.on_long_press_start: Optional[Callable] = None
@@ -21,8 +104,11 @@ class InputController:
         
         # 配置参数
         input_config = config_loader.get_input_config()
+        self.hotkey = input_config.get("hotkey", "caps lock")
         self.long_press_duration = input_config.get("caps_long_press_duration", 0.5)
         self.enable_caps_toggle = input_config.get("enable_caps_toggle", True)
+        self.state_machine = HotkeyStateMachine(self.long_press_duration)
+        config_loader.subscribe(self._on_config_changed)
     
     def set_callbacks(self, on_start: Callable, on_end: Callable):
         """设置长按开始和结束的回调函数"""
@@ -35,12 +121,20 @@ class InputController:
             if self.is_monitoring:
                 return True
             
-            # 注册Caps键事件监听
-            keyboard.on_press_key('caps lock', self._on_caps_press)
-            keyboard.on_release_key('caps lock', self._on_caps_release)
+            self._events = queue.Queue()
+            self.state_machine.reset()
+            self.state_machine.long_press_duration = self.long_press_duration
+            self.scheduler_thread = threading.Thread(target=self._scheduler_worker, daemon=True)
+            self.scheduler_thread.start()
+            
+            # 注册热键事件监听
+            self._hooks = [
+                keyboard.on_press_key(self.hotkey, self._on_key_press),
+                keyboard.on_release_key(self.hotkey, self._on_key_release),
+            ]
             
             self.is_monitoring = True
-            print("开始监控Caps键")
+            print(f"开始监控热键: {self.hotkey}")
             return True
             
         except Exception as e:
@@ -53,92 +147,131 @@ class InputController:
             if not self.is_monitoring:
                 return
             
-            # 取消事件监听
-            keyboard.unhook_all()
+            # 只取消自己注册的监听，不影响进程内其他钩子
+            for hook in self._hooks:
+                keyboard.unhook(hook)
+            self._hooks = []
             
-            # 取消长按计时器
-            if self.long_press_timer:
-                self.long_press_timer.cancel()
-                self.long_press_timer = None
+            # 停止调度线程
+            self._events.put(None)
+            if self.scheduler_thread and self.scheduler_thread.is_alive():
+                self.scheduler_thread.join(timeout=1.0)
+            self.scheduler_thread = None
             
             self.is_monitoring = False
-            self.caps_pressed = False
-            self.long_press_triggered = False
-            print("停止监控Caps键")
+            self.state_machine.reset()
+            print("停止监控热键")
             
         except Exception as e:
             print(f"停止键盘监控失败: {e}")
     
-    def _on_caps_press(self, event):
-        """Caps键按下事件处理"""
-        if self.caps_pressed:
-            return  # 避免重复触发
-        
-        self.caps_pressed = True
-        self.caps_press_time = time.time()
-        self.long_press_triggered = False
-        
-        # 启动长按检测计时器
-        self.long_press_timer = threading.Timer(
-            self.long_press_duration, 
-            self._trigger_long_press
-        )
-        self.long_press_timer.start()
-    
-    def _on_caps_release(self, event):
-        """Caps键释放事件处理"""
-        if not self.caps_pressed:
-            return
-        
-        # 取消长按计时器
-        if self.long_press_timer:
-            self.long_press_timer.cancel()
-            self.long_press_timer = None
-        
-        press_duration = time.time() - self.caps_press_time
-        
-        if self.long_press_triggered:
-            # 长按结束
-            if self.on_long_press_end:
-                self.on_long_press_end()
-                # 切换大小写锁定
-                # self._toggle_caps_lock()
-        else:
-            # 短按 - 不做任何操作，让系统处理Caps Lock
-            # 移除手动切换逻辑，避免与系统冲突
-            pass
+    def _on_key_press(self, event):
+        """热键按下（钩子线程），只记录时间戳"""
+        self._events.put(("press", time.monotonic()))
+    
+    def _on_key_release(self, event):
+        """热键释放（钩子线程），只记录时间戳"""
+        self._events.put(("release", time.monotonic()))
+    
+    def _scheduler_worker(self):
+        """调度线程：按事件和长按判定时刻驱动状态机"""
+        while True:
+            deadline = self.state_machine.deadline
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._events.get(timeout=timeout)
+            except queue.Empty:
+                self._dispatch(self.state_machine.tick(time.monotonic()))
+                continue
+            
+            if item is None:
+                break
+            
+            kind, timestamp = item
+            if kind == "wake":
+                # 长按时长已变化，在调度线程中更新状态机，按新的判定时刻重新等待
+                self.state_machine.long_press_duration = self.long_press_duration
+                self._dispatch(self.state_machine.tick(time.monotonic()))
+                continue
+            if self._is_synthetic(kind, timestamp):
+                continue
+            
+            handler = self.state_machine.press if kind == "press" else self.state_machine.release
+            self._dispatch(handler(timestamp))
+    
+    def _is_synthetic(self, kind: str, timestamp: float) -> bool:
+        """判断是否为自己注入的大小写切换事件
         
-        self.caps_pressed = False
-        self.long_press_triggered = False
+        按住期间的自动重复只有按下事件，不会占用释放的名额；注入的释放被丢弃后，
+        用户真正松键的释放仍会结束会话。
+        """
+        if timestamp > self._suppress_until:
+            self._suppress = {"press": 0, "release": 0}
+            return False
+        if self._suppress[kind] > 0:
+            self._suppress[kind] -= 1
+            return True
+        return False
+    
+    def _dispatch(self, actions: List[str]):
+        """执行状态机输出的动作"""
+        for action in actions:
+            try:
+                if action == HotkeyStateMachine.LONG_PRESS_START:
+                    self._trigger_long_press()
+                elif action == HotkeyStateMachine.LONG_PRESS_END:
+                    # 长按结束
+                    if self.on_long_press_end:
+                        self.on_long_press_end()
+                # 短按 - 不做任何操作，让系统处理Caps Lock
+            except Exception as e:
+                print(f"热键回调出错: {e}")
     
     def _trigger_long_press(self):
         """触发长按事件"""
-        # 切换大小写锁定
-        self._toggle_caps_lock()
-        if self.caps_pressed and not self.long_press_triggered:
-            self.long_press_triggered = True
-            if self.on_long_press_start:
-                self.on_long_press_start()
+        # 按下时系统已切换大小写，长按时切回
+        if self.enable_caps_toggle and self.hotkey == "caps lock":
+            self._toggle_caps_lock()
+        if self.on_long_press_start:
+            self.on_long_press_start()
     
     def _toggle_caps_lock(self):
         """切换大小写锁定状态"""
         try:
+            self._suppress = {"press": 1, "release": 1}
+            self._suppress_until = time.monotonic() + self.SYNTHETIC_EVENT_WINDOW
             # 使用keyboard库切换Caps Lock状态
             keyboard.press_and_release('caps lock')
         except Exception as e:
+            self._suppress = {"press": 0, "release": 0}
             print(f"切换Caps Lock失败: {e}")
     
     def is_long_press_active(self) -> bool:
         """检查是否正在长按"""
-        return self.long_press_triggered
+        return self.state_machine.state == HotkeyStateMachine.HOLDING
     
     def update_config(self, long_press_duration: float = None, enable_caps_toggle: bool = None):
-        """更新配置参数"""
-        if long_press_duration is not None:
-            self.long_press_duration = long_press_duration
-            self.config_loader.update_config("input.caps_long_press_duration", long_press_duration)
-        
-        if enable_caps_toggle is not None:
-            self.enable_caps_toggle = enable_caps_toggle
-            self.config_loader.update_config("input.enable_caps_toggle", enable_caps_toggle)
-            
\ No newline at end of file
+        """更新配置参数，经配置变化通知生效"""
+        with self.config_loader.transaction():
+            if long_press_duration is not None:
+                self.config_loader.update_config("input.caps_long_press_duration", long_press_duration)
+            if enable_caps_toggle is not None:
+                self.config_loader.update_config("input.enable_caps_toggle", enable_caps_toggle)
+    
+    def _on_config_changed(self, changed):
+        """配置变化时即时生效，无需重启"""
+        input_config = self.config_loader.get_input_config()
+        if "input.caps_long_press_duration" in changed:
+            self.long_press_duration = input_config.get("caps_long_press_duration", 0.5)
+            # 状态机只由调度线程修改，由它取用新时长
+            self._events.put(("wake", time.monotonic()))
+        if "input.enable_caps_toggle" in changed:
+            self.enable_caps_toggle = input_config.get("enable_caps_toggle", True)
+        if "input.hotkey" in changed:
+            hotkey = input_config.get("hotkey", "caps lock")
+            if hotkey != self.hotkey:
+                was_monitoring = self.is_monitoring
+                self.stop_monitoring()
+                self.hotkey = hotkey
+                if was_monitoring:
+                    self.start_monitoring()
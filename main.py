@@ -10,9 +10,10 @@ from PyQt5.QtWidgets import QApplication, QMessageBox, QSystemTrayIcon
 
 # 导入自定义模块
 from config_loader import ConfigLoader
-from voice_recognizer import VoiceRecognizer
+from voice_recognizer import RecognitionResult, VoiceRecognizer
 from input_controller import InputController
 from tray_ui import TrayUI
+from recognition_server import RecognitionServer
 from version_info import VersionInfo
 from logger import app_logger
 class TextOutputManager:
@@ -21,6 +22,8 @@ class TextOutputManager:
     def __init__(self):
         self.user32 = ctypes.windll.user32
         self.kernel32 = ctypes.windll.kernel32
+        # 最近一次输出的目标窗口
+        self.last_hwnd = None
     
     def send_text(self, text: str):
         """发送文本到当前活动窗口"""
@@ -40,17 +43,42 @@ class TextOutputManager:
                     # 发送Unicode字符
                     self.user32.SendMessageW(hwnd, 0x0102, ord(char), 0)  # WM_CHAR
             
+            self.last_hwnd = hwnd
             return True
             
         except Exception as e:
             app_logger.info(f"文本输出失败: {e}")
             return False
+    
+    def foreground_window(self):
+        """当前活动窗口句柄"""
+        return self.user32.GetForegroundWindow()
+    
+    def replace_text(self, count: int, text: str) -> bool:
+        """在上次输出的窗口中删除末尾count个字符后输入text
+        
+        退格和新文本都以同步的WM_CHAR消息发送，保证先删后写；混用异步的模拟按键时，
+        退格可能在新文本之后才被处理。
+        """
+        try:
+            hwnd = self.last_hwnd
+            if not hwnd:
+                return False
+            for _ in range(count):
+                self.user32.SendMessageW(hwnd, 0x0102, 0x08, 0)  # WM_CHAR 退格
+            for char in text:
+                self.user32.SendMessageW(hwnd, 0x0102, ord(char), 0)  # WM_CHAR
+            return True
+        except Exception as e:
+            app_logger.info(f"文本替换失败: {e}")
+            return False
 
 class VoiceInputApp(QObject):
     """主应用程序类 - 整合各模块功能和协调业务流程"""
     
     def __init__(self):
         super().__init__()
+        start = time.perf_counter()
         # 显示启动信息
         VersionInfo.print_startup_info()
         # 初始化组件
@@ -60,17 +88,37 @@ class VoiceInputApp(QObject):
         self.tray_ui = TrayUI(self.config_loader)
         self.text_output = TextOutputManager()
         
+        # 可选的本地流式识别服务，供其他程序调用
+        self.recognition_server = None
+        if self.config_loader.get_server_config().get("enabled", False):
+            self.recognition_server = RecognitionServer.from_config(self.config_loader, self.voice_recognizer)
+        
         # 状态管理
         self.is_running = False
         self.is_recognizing = False
         
+        # 增量模式下实时输出每个分块的结果，整段后处理完成后再替换为处理后的文本；否则只输出处理后的整段文本
+        self.incremental_mode = self.config_loader.get_output_config().get("incremental_mode", True)
+        # 增量模式下是否用后处理结果替换已输出的段落（会发送退格，默认关闭）
+        self.replace_segments = self.config_loader.get_output_config().get("replace_segments", False)
+        # 增量模式下最近输出的文本，后处理完成后用于替换已输出的段落
+        self._typed_tail = ""
+        self._output_lock = threading.Lock()
+        
         self._setup_connections()
         self._initialize_components()
+        
+        model_config = self.config_loader.get_model_config()
+        app_logger.info(f"启动耗时 {(time.perf_counter() - start) * 1000:.0f} ms "
+                        f"(模型加载 {self.voice_recognizer.model_pool.stats()['total_load_ms']:.0f} ms, "
+                        f"模型仓库 {'启用' if model_config.get('use_store', True) else '未启用'})")
     
     def _setup_connections(self):
         """设置组件间的连接"""
         # 语音识别回调
         self.voice_recognizer.set_callback(self._on_recognition_result)
+        self.voice_recognizer.set_segment_callback(self._on_segment_result)
+        self.voice_recognizer.set_model_state_callback(self._on_model_state_changed)
         
         # 输入控制回调
         self.input_controller.set_callbacks(
@@ -82,6 +130,17 @@ class VoiceInputApp(QObject):
         self.tray_ui.start_recognition.connect(self._start_manual_recognition)
         self.tray_ui.stop_recognition.connect(self._stop_manual_recognition)
         self.tray_ui.quit_application.connect(self._quit_application)
+        self.tray_ui.switch_model.connect(self._switch_model)
+        self.tray_ui.toggle_profiling.connect(self._toggle_profiling)
+        self.voice_recognizer.profiler.on_finished = self._on_profile_written
+        
+        # 免按键唤醒
+        if self.voice_recognizer.handsfree:
+            self.voice_recognizer.handsfree.on_wake = self._on_wake_word
+            self.voice_recognizer.handsfree.on_silence = self._on_handsfree_silence
+        
+        # 配置变化（设置对话框或外部编辑）
+        self.config_loader.subscribe(self._on_config_changed)
     
     def _initialize_components(self):
         """初始化各组件"""
@@ -104,6 +163,12 @@ class VoiceInputApp(QObject):
                 app_logger.info("启动输入监控失败")
                 return False
             
+            if self.recognition_server and not self.recognition_server.start():
+                app_logger.warning("本地识别服务启动失败")
+            
+            # 监视配置文件的外部修改
+            self.config_loader.start_watching()
+            
             # 显示托盘图标
             self.tray_ui.show()
             
@@ -111,9 +176,10 @@ class VoiceInputApp(QObject):
             app_logger.info("语音识别工具已启动")
             
             # 显示启动消息
+            hint = "长按Caps键或说出唤醒词" if self.voice_recognizer.handsfree else "长按Caps键"
             self.tray_ui.show_message(
                 "语音识别工具",
-                "已启动，长按Caps键开始语音输入"
+                f"已启动，{hint}开始语音输入"
             )
             
             return True
@@ -130,9 +196,13 @@ class VoiceInputApp(QObject):
         try:
             # 停止识别
             self._stop_recognition()
+            if self.recognition_server:
+                self.recognition_server.stop()
+            self.voice_recognizer.shutdown()
             
             # 停止输入监控
             self.input_controller.stop_monitoring()
+            self.config_loader.stop_watching()
             
             # 隐藏托盘图标
             self.tray_ui.hide()
@@ -153,7 +223,23 @@ class VoiceInputApp(QObject):
         app_logger.info("Caps长按结束，停止语音识别")
         self._stop_recognition()
     
-    def _start_recognition(self):
+    def _on_wake_word(self, preroll_samples: int):
+        """唤醒词事件处理（免按键模式），预录音频从唤醒词之后开始"""
+        if self.is_recognizing:
+            return
+        app_logger.info("检测到唤醒词，开始语音识别")
+        self._start_recognition(preroll_samples, hands_free=True)
+    
+    def _on_handsfree_silence(self, engagement: int):
+        """唤醒词触发的识别在持续静音后结束；过期事件（会话已结束或已换成按键会话）忽略"""
+        handsfree = self.voice_recognizer.handsfree
+        if (not self.is_recognizing or not handsfree.auto_stop
+                or handsfree.engagement != engagement):
+            return
+        app_logger.info("持续静音，停止语音识别")
+        self._stop_recognition()
+    
+    def _start_recognition(self, preroll_samples: Optional[int] = None, hands_free: bool = False):
         """开始语音识别"""
         if self.is_recognizing:
             return
@@ -166,8 +252,11 @@ class VoiceInputApp(QObject):
             )
             return
         
-        if self.voice_recognizer.start_recording():
+        if self.voice_recognizer.start_recording(preroll_samples):
             self.is_recognizing = True
+            if self.voice_recognizer.handsfree:
+                # 按键触发的会话由按键结束，唤醒词触发的会话静音后自动结束
+                self.voice_recognizer.handsfree.engage(auto_stop=hands_free)
             self.tray_ui.update_status("正在识别", True)
             app_logger.info("语音识别已开始")
         else:
@@ -184,6 +273,8 @@ class VoiceInputApp(QObject):
         
         self.voice_recognizer.stop_recording()
         self.is_recognizing = False
+        if self.voice_recognizer.handsfree:
+            self.voice_recognizer.handsfree.disengage()
         self.tray_ui.update_status("就绪", False)
         app_logger.info("语音识别已停止")
     
@@ -195,16 +286,107 @@ class VoiceInputApp(QObject):
         """手动停止识别（通过托盘菜单）"""
         self._stop_recognition()
     
-    def _on_recognition_result(self, text: str):
+    def _on_recognition_result(self, result: RecognitionResult):
         """处理识别结果"""
-        if text and text.strip():
-            app_logger.info(f"识别结果: {text}")
+        if result.text and result.text.strip():
+            confidence = result.confidence
+            confidence_info = f", 置信度 {confidence:.2f}" if confidence is not None else ""
+            app_logger.info(f"识别结果: {result.text} (分块 {result.chunk_index}, "
+                            f"推理 {result.inference_ms:.0f}ms, 延迟 {result.latency_ms:.0f}ms{confidence_info})")
             
-            # 输出文本到当前活动窗口
-            if self.text_output.send_text(text):
-                app_logger.info(f"文本已输出: {text}")
+            if self.incremental_mode:
+                self._output_text(result.text)
+    
+    def _on_segment_result(self, raw_text: str, text: str, costs: dict):
+        """处理后处理完成的整段结果"""
+        cost_info = ", ".join(f"{name}={cost:.1f}ms" for name, cost in costs.items())
+        app_logger.info(f"段落后处理: {raw_text} -> {text} ({cost_info})")
+        
+        if not self.incremental_mode:
+            self._output_text(text)
+        elif self.replace_segments and text != raw_text:
+            self._replace_segment(raw_text, text)
+    
+    def _replace_segment(self, typed: str, text: str):
+        """增量模式下用后处理结果替换已输出的段落
+        
+        只有该段仍是最后输出的内容、且活动窗口未变时才替换，避免删掉之后的识别输出或别处的文字；
+        用户自己在该窗口键入的字符无法察觉，会被退格删掉，因此需在配置中显式开启。
+        """
+        with self._output_lock:
+            if not typed or not self._typed_tail.endswith(typed):
+                app_logger.info("段落之后已有其他输出，保留实时结果")
+                return
+            if self.text_output.foreground_window() != self.text_output.last_hwnd:
+                app_logger.info("活动窗口已变化，保留实时结果")
+                return
+            self._typed_tail = self._typed_tail[:-len(typed)]
+            if self.text_output.replace_text(len(typed), text):
+                self._typed_tail = (self._typed_tail + text)[-2000:]
+                app_logger.info(f"段落已替换: {typed} -> {text}")
             else:
-                app_logger.info(f"文本输出失败: {text}")
+                self._typed_tail = ""
+    
+    def _output_text(self, text: str):
+        """输出文本到当前活动窗口"""
+        with self._output_lock:
+            self._send_locked(text)
+    
+    def _send_locked(self, text: str):
+        if self.text_output.send_text(text):
+            # 只保留最近的输出，足够覆盖一个段落
+            self._typed_tail = (self._typed_tail + text)[-2000:]
+            app_logger.info(f"文本已输出: {text}")
+        else:
+            self._typed_tail = ""
+            app_logger.info(f"文本输出失败: {text}")
+    
+    def _switch_model(self, model_path: str):
+        """切换识别模型（托盘菜单），在后台线程加载避免阻塞界面"""
+        self._stop_recognition()
+        self.tray_ui.update_status("正在切换模型")
+        
+        def worker():
+            if self.voice_recognizer.switch_model(model_path):
+                app_logger.info(f"模型已切换: {model_path}, 模型池统计: "
+                                f"{self.voice_recognizer.model_pool.stats()}")
+            else:
+                app_logger.error(f"模型切换失败: {model_path}")
+                self.tray_ui.update_status("模型加载失败")
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def _on_model_state_changed(self, state: str):
+        """模型卸载/恢复时更新托盘状态"""
+        if self.is_recognizing:
+            return
+        if state == VoiceRecognizer.MODEL_UNLOADED:
+            self.tray_ui.update_status("空闲（模型已释放）")
+        elif state == VoiceRecognizer.MODEL_LOADED:
+            self.tray_ui.update_status("就绪")
+    
+    def _toggle_profiling(self, enabled: bool):
+        """托盘菜单开关性能分析"""
+        profiler = self.voice_recognizer.profiler
+        if enabled:
+            profiler.arm()
+            app_logger.info(f"已开启性能分析，将捕获接下来的 {profiler.sessions} 次识别")
+        else:
+            profiler.disarm()
+    
+    def _on_profile_written(self, base_path: str):
+        """性能分析结果写出后提示路径（在识别线程中调用）"""
+        app_logger.info(f"性能分析结果: {base_path}.folded / .pstats / .json")
+        self.tray_ui.set_profiling_active(False)
+        self.tray_ui.show_message("性能分析", f"结果已保存到 {os.path.dirname(base_path)}")
+    
+    def _on_config_changed(self, changed):
+        """应用与主程序相关的配置变化"""
+        if "output.incremental_mode" in changed:
+            self.incremental_mode = self.config_loader.get_output_config().get("incremental_mode", True)
+            app_logger.info(f"增量输出模式: {self.incremental_mode}")
+        if "output.replace_segments" in changed:
+            self.replace_segments = self.config_loader.get_output_config().get("replace_segments", False)
     
     def _quit_application(self):
         """退出应用程序"""
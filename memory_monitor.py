@@ -0,0 +1,84 @@
+import gc
+import os
+from typing import Any, Dict, Optional
+
+try:
+    import psutil
+except ImportError:  # 进程内存统计为可选功能
+    psutil = None
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+
+def estimate_cache_bytes(obj: Any, _seen: Optional[set] = None) -> int:
+    """递归估算流式缓存中张量和数组占用的字节数"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if torch is not None and isinstance(obj, torch.Tensor):
+        return obj.element_size() * obj.nelement()
+    if hasattr(obj, "nbytes") and hasattr(obj, "dtype"):  # numpy数组
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sum(estimate_cache_bytes(v, _seen) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(estimate_cache_bytes(v, _seen) for v in obj)
+    return 0
+
+
+def process_memory_available() -> bool:
+    """能否测量进程常驻内存（需要psutil）"""
+    return psutil is not None
+
+
+def process_memory_bytes() -> int:
+    """当前进程常驻内存，psutil不可用时返回0"""
+    if psutil is None:
+        return 0
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+def torch_allocated_bytes() -> int:
+    """torch在GPU上已分配的内存，CPU推理时返回0"""
+    if torch is not None and torch.cuda.is_available():
+        return torch.cuda.memory_allocated()
+    return 0
+
+
+def release_memory():
+    """回收Python对象并释放torch缓存的显存"""
+    gc.collect()
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class SessionMemoryStats:
+    """单次识别会话的内存统计"""
+
+    def __init__(self):
+        self.start_rss = process_memory_bytes()
+        self.start_torch = torch_allocated_bytes()
+        self.peak_cache_bytes = 0
+        self.peak_rss = self.start_rss
+        self.cache_resets = 0
+
+    def sample(self, cache_bytes: int):
+        """记录一次采样"""
+        self.peak_cache_bytes = max(self.peak_cache_bytes, cache_bytes)
+        self.peak_rss = max(self.peak_rss, process_memory_bytes())
+
+    def summary(self) -> Dict[str, float]:
+        """汇总统计（单位MB）"""
+        mb = 1024 * 1024
+        return {
+            "peak_cache_mb": self.peak_cache_bytes / mb,
+            "rss_growth_mb": (self.peak_rss - self.start_rss) / mb,
+            "torch_growth_mb": (torch_allocated_bytes() - self.start_torch) / mb,
+            "cache_resets": self.cache_resets,
+        }
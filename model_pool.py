@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """估算模型参数和缓冲区占用的字节数"""
+    module = getattr(model, "model", model)
+    total = 0
+    for getter in ("parameters", "buffers"):
+        if hasattr(module, getter):
+            total += sum(t.numel() * t.element_size() for t in getattr(module, getter)())
+    return total
+
+
+class ModelPool:
+    """模型池 - 按模型路径和加载参数缓存已加载的模型，超出内存预算时按LRU淘汰
+
+    从磁盘加载在锁外进行，加载期间其他查询不受阻塞；同一模型的并发请求等待同一次加载。
+    """
+
+    def __init__(self, budget_mb: float, loader: Callable[..., Any]):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.loader = loader
+        self._models: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 正在加载的模型
+        self._loading: Dict[Hashable, Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_load_seconds = 0.0
+        self.last_load_seconds = 0.0
+
+    @staticmethod
+    def make_key(model_path: str, **options) -> Hashable:
+        return (model_path, tuple(sorted(options.items())))
+
+    def get(self, model_path: str, **options) -> Any:
+        """获取模型，未命中时加载并放入池中"""
+        key = self.make_key(model_path, **options)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = self._loading[key] = Future()
+            else:
+                self.hits += 1
+        if not owner:
+            # 其他线程正在加载同一模型，加载失败时同样抛出
+            return future.result()
+
+        start = time.perf_counter()
+        try:
+            model = self.loader(model=model_path, **options)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self.last_load_seconds = time.perf_counter() - start
+            self.total_load_seconds += self.last_load_seconds
+            del self._loading[key]
+            self._insert(key, model)
+        future.set_result(model)
+        return model
+
+    def put(self, model_path: str, model: Any, **options):
+        """放入外部加载（如快照恢复）的模型"""
+        with self._lock:
+            self._insert(self.make_key(model_path, **options), model)
+
+    def _insert(self, key: Hashable, model: Any):
+        self._models[key] = (model, estimate_model_bytes(model))
+        self._models.move_to_end(key)
+        # 淘汰最久未用的模型，刚放入的模型始终保留
+        while self._resident_bytes() > self.budget_bytes and len(self._models) > 1:
+            evicted_key, _ = self._models.popitem(last=False)
+            self.evictions += 1
+            print(f"模型池淘汰: {evicted_key[0]}")
+
+    def _resident_bytes(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def contains(self, model_path: str, **options) -> bool:
+        with self._lock:
+            return self.make_key(model_path, **options) in self._models
+
+    def evict(self, model_path: str, **options):
+        """移除指定模型"""
+        with self._lock:
+            self._models.pop(self.make_key(model_path, **options), None)
+
+    def clear(self):
+        """清空模型池"""
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率、加载耗时和常驻内存统计"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "last_load_ms": self.last_load_seconds * 1000,
+                "total_load_ms": self.total_load_seconds * 1000,
+                "resident_models": [key[0] for key in self._models],
+                "resident_mb": self._resident_bytes() / 1024 / 1024,
+            }
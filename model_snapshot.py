@@ -0,0 +1,84 @@
+import hashlib
+import os
+import time
+from typing import Any, Optional
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+
+def default_snapshot_dir() -> str:
+    """快照目录，与日志同在用户本地数据目录下"""
+    return os.path.join(os.path.expanduser("~"), "AppData", "Local", "VoiceInput", "snapshots")
+
+
+def _content_signature(model_path: str) -> str:
+    """模型目录中各文件的相对路径、大小和修改时间；替换目录内的文件不会改变目录本身的修改时间"""
+    entries = []
+    for directory, _, names in os.walk(model_path):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append(f"{os.path.relpath(path, model_path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "\n".join(sorted(entries))
+
+
+def snapshot_path(snapshot_dir: str, model_path: str) -> str:
+    """快照文件名 = 模型路径哈希-模型内容签名哈希，模型文件更新后旧快照自然失效"""
+    name_key = hashlib.sha1(os.path.abspath(model_path).encode("utf-8")).hexdigest()[:16]
+    content_key = hashlib.sha1(_content_signature(model_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(snapshot_dir, f"{name_key}-{content_key}.pt")
+
+
+def _remove_superseded(path: str):
+    """删除同一模型路径下的旧快照"""
+    directory, name = os.path.split(path)
+    prefix = name.split("-")[0] + "-"
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for other in names:
+        if other.startswith(prefix) and other != name and other.endswith(".pt"):
+            try:
+                os.remove(os.path.join(directory, other))
+                print(f"已删除过期的模型快照: {other}")
+            except OSError:
+                pass
+
+
+def save_snapshot(model: Any, path: str) -> bool:
+    """将已加载的模型对象整体序列化，已存在时跳过；写入后删除同一模型的旧快照"""
+    if torch is None:
+        return False
+    if os.path.exists(path):
+        return True
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.save(model, tmp_path)
+        os.replace(tmp_path, path)
+        _remove_superseded(path)
+        return True
+    except Exception as e:
+        print(f"模型快照保存失败: {e}")
+        return False
+
+
+def load_snapshot(path: str) -> Optional[Any]:
+    """以内存映射方式加载快照，权重按需调入内存"""
+    if torch is None or not os.path.exists(path):
+        return None
+    try:
+        start = time.perf_counter()
+        model = torch.load(path, mmap=True, weights_only=False)
+        print(f"模型快照加载耗时 {(time.perf_counter() - start) * 1000:.0f} ms")
+        return model
+    except Exception as e:
+        print(f"模型快照加载失败: {e}")
+        return None
@@ -0,0 +1,261 @@
+"""
+内容寻址的本地模型仓库
+
+模型目录中的每个文件按SHA-256存为一份对象（相同内容只存一份），再以硬链接组装成
+models/<模型ID>/ 目录供FunASR加载；模型ID是文件清单的哈希。导入时逐文件校验一次，
+结果记入 index.json，之后的启动只比对源文件的大小和修改时间，不再计算哈希。
+多个进程（批量转写、评测的工作进程）可能同时首次导入：临时文件和目录按进程区分，
+索引在锁文件保护下重新读取、合并后再写回。
+
+用法:
+    python model_store.py import ./iic/paraformer-zh-streaming [--store 目录]
+    python model_store.py list
+    python model_store.py verify
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+_HASH_BLOCK = 1024 * 1024
+# 索引锁文件超过该时长未释放视为持有进程已退出
+_LOCK_STALE_SECONDS = 60.0
+
+
+def default_store_dir() -> str:
+    """仓库目录，与日志同在用户本地数据目录下，不随程序打包"""
+    return os.path.join(os.path.expanduser("~"), "AppData", "Local", "VoiceInput", "models")
+
+
+def _source_signature(source_dir: str) -> Dict[str, list]:
+    """源目录中各文件的 [大小, 修改时间]，用于判断是否需要重新导入"""
+    signature = {}
+    for directory, _, names in os.walk(source_dir):
+        for name in names:
+            path = os.path.join(directory, name)
+            stat = os.stat(path)
+            relative = os.path.relpath(path, source_dir).replace(os.sep, "/")
+            signature[relative] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+class ModelStore:
+    """本地模型仓库 - 导入时校验一次，之后按索引直接解析模型目录"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or default_store_dir()
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.models_dir = os.path.join(self.root, "models")
+        self.index_path = os.path.join(self.root, "index.json")
+        self._lock = threading.Lock()
+        self.index = self._load_index()
+
+    def _load_index(self) -> Dict[str, Any]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("sources", {})
+        index.setdefault("models", {})
+        return index
+
+    def _save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=1, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    @contextmanager
+    def _index_lock(self, timeout: float = 30.0):
+        """跨进程的索引锁：独占创建锁文件，超时或锁文件过旧时接管"""
+        os.makedirs(self.root, exist_ok=True)
+        lock_path = self.index_path + ".lock"
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    stale = time.time() - os.path.getmtime(lock_path) > _LOCK_STALE_SECONDS
+                except OSError:
+                    continue  # 锁刚被释放
+                if stale or time.monotonic() > deadline:
+                    print("模型仓库索引锁等待超时，接管锁文件")
+                    try:
+                        os.remove(lock_path)
+                    except OSError:
+                        pass
+                    continue
+                time.sleep(0.05)
+        try:
+            os.write(fd, str(os.getpid()).encode("ascii"))
+            os.close(fd)
+            yield
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def source_key(path: str) -> str:
+        """按配置中写的路径（而非绝对路径）索引，单文件打包每次解压到不同的临时目录"""
+        return os.path.normpath(path).replace(os.sep, "/")
+
+    def model_dir(self, model_id: str) -> str:
+        return os.path.join(self.models_dir, model_id)
+
+    def resolve(self, path: str) -> Optional[str]:
+        """把配置中的模型路径解析为仓库中的模型目录
+
+        源目录未变化（或已不存在）且已导入时直接返回；源目录是新的或有改动时先导入。
+        源目录不存在且未导入过时返回None。
+        """
+        with self._lock:
+            entry = self.index["sources"].get(self.source_key(path))
+            exists = os.path.isdir(path)
+            if entry is not None and os.path.isdir(self.model_dir(entry["model_id"])):
+                if not exists or _source_signature(path) == entry["signature"]:
+                    return self.model_dir(entry["model_id"])
+            if not exists:
+                return None
+            return self._import(path)
+
+    def import_model(self, path: str) -> str:
+        """导入模型目录，返回仓库中的模型目录"""
+        with self._lock:
+            return self._import(path)
+
+    def _import(self, source_dir: str) -> str:
+        start = time.perf_counter()
+        signature = _source_signature(source_dir)
+        files = {}
+        for relative in sorted(signature):
+            files[relative] = self._store_object(os.path.join(source_dir, relative))
+
+        manifest = json.dumps(files, sort_keys=True).encode("utf-8")
+        model_id = hashlib.sha256(manifest).hexdigest()[:32]
+        target = self.model_dir(model_id)
+        if not os.path.isdir(target):
+            self._materialize(files, target)
+
+        with self._index_lock():
+            # 其他进程可能已更新索引，重新读取后合并本次导入
+            self.index = self._load_index()
+            self.index["models"][model_id] = {"files": files, "imported_at": time.time()}
+            self.index["sources"][self.source_key(source_dir)] = {"model_id": model_id, "signature": signature}
+            self._save_index()
+        print(f"模型已导入仓库: {source_dir} -> {model_id}，"
+              f"校验 {len(files)} 个文件耗时 {(time.perf_counter() - start) * 1000:.0f} ms")
+        return target
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _store_object(self, path: str) -> str:
+        """边计算哈希边写入临时文件，按哈希命名；同样内容的对象已存在时直接复用"""
+        os.makedirs(self.objects_dir, exist_ok=True)
+        tmp_path = os.path.join(self.objects_dir, f"incoming-{os.getpid()}-{threading.get_ident()}")
+        digest = hashlib.sha256()
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            while True:
+                block = src.read(_HASH_BLOCK)
+                if not block:
+                    break
+                digest.update(block)
+                dst.write(block)
+        hexdigest = digest.hexdigest()
+        object_path = self._object_path(hexdigest)
+        if os.path.exists(object_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            try:
+                os.replace(tmp_path, object_path)
+            except OSError:
+                # 其他进程同时写入了同一对象且正在使用（Windows下不能覆盖）
+                os.remove(tmp_path)
+                if not os.path.exists(object_path):
+                    raise
+        return hexdigest
+
+    def _materialize(self, files: Dict[str, str], target: str):
+        """组装模型目录：优先硬链接对象，不支持时复制；在本进程独有的临时目录中组装后整体改名"""
+        os.makedirs(self.models_dir, exist_ok=True)
+        tmp_target = tempfile.mkdtemp(prefix=os.path.basename(target) + ".", suffix=".tmp", dir=self.models_dir)
+        for relative, digest in files.items():
+            destination = os.path.join(tmp_target, *relative.split("/"))
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            try:
+                os.link(self._object_path(digest), destination)
+            except OSError:
+                shutil.copyfile(self._object_path(digest), destination)
+        try:
+            os.replace(tmp_target, target)
+        except OSError:
+            # 其他进程已组装好同一模型（内容相同），丢弃自己的副本
+            shutil.rmtree(tmp_target, ignore_errors=True)
+            if not os.path.isdir(target):
+                raise
+
+    def verify(self, model_id: Optional[str] = None) -> Dict[str, bool]:
+        """重新计算对象哈希，检查仓库是否损坏"""
+        results = {}
+        with self._lock:
+            for current_id, model in self.index["models"].items():
+                if model_id and current_id != model_id:
+                    continue
+                ok = True
+                for digest in model["files"].values():
+                    sha = hashlib.sha256()
+                    try:
+                        with open(self._object_path(digest), "rb") as f:
+                            for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+                                sha.update(block)
+                    except OSError:
+                        ok = False
+                        break
+                    if sha.hexdigest() != digest:
+                        ok = False
+                        break
+                results[current_id] = ok
+        return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="本地模型仓库")
+    parser.add_argument("--store", help="仓库目录，默认在用户本地数据目录下")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="导入模型目录")
+    import_parser.add_argument("paths", nargs="+")
+    subparsers.add_parser("list", help="列出已导入的模型")
+    subparsers.add_parser("verify", help="重新校验所有对象")
+    args = parser.parse_args()
+
+    store = ModelStore(args.store)
+    if args.command == "import":
+        for path in args.paths:
+            print(f"{path} -> {store.import_model(path)}")
+    elif args.command == "list":
+        for key, entry in store.index["sources"].items():
+            print(f"{key} -> {store.model_dir(entry['model_id'])}")
+    else:
+        results = store.verify()
+        for model_id, ok in results.items():
+            print(f"{model_id}: {'正常' if ok else '损坏'}")
+        return 0 if all(results.values()) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
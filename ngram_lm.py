@@ -0,0 +1,205 @@
+"""
+内存映射的n-gram语言模型
+
+把ARPA格式的语言模型转换为紧凑的二进制文件，加载时只做内存映射，不解析文本，
+多个进程共享同一份页缓存。查询时在每阶排好序的n-gram键上二分查找，按回退公式打分。
+按字切分，适用于中文字级语言模型。
+
+用法:
+    python ngram_lm.py build domain.arpa domain.lm
+    python ngram_lm.py score domain.lm "今天的会议纪要"
+"""
+import argparse
+import mmap
+import struct
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+MAGIC = b"NGLM"
+VERSION = 1
+# 魔数, 版本, 阶数, 词表大小, 每个词ID的位数
+_HEADER = struct.Struct("<4sIIII")
+# 词表中没有<unk>时未登录字的对数概率（log10）
+UNK_LOGPROB = -10.0
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _pack_key(ids: Sequence[int], bits: int) -> int:
+    key = 0
+    for token_id in ids:
+        key = (key << bits) | token_id
+    return key
+
+
+def build_binary(arpa_path: str, output_path: str):
+    """把ARPA语言模型转换为二进制格式"""
+    grams: Dict[int, List[Tuple[Tuple[str, ...], float, float]]] = {}
+    order = 0
+    current = 0
+    with open(arpa_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("ngram ") or line == "\\data\\":
+                continue
+            if line == "\\end\\":
+                break
+            if line.startswith("\\") and line.endswith("-grams:"):
+                current = int(line[1:line.index("-")])
+                order = max(order, current)
+                grams[current] = []
+                continue
+            if current == 0:
+                continue
+            fields = line.split()
+            words = tuple(fields[1:1 + current])
+            backoff = float(fields[1 + current]) if len(fields) > 1 + current else 0.0
+            grams[current].append((words, float(fields[0]), backoff))
+
+    vocab = [words[0] for words, _, _ in grams.get(1, [])]
+    token_ids = {token: i for i, token in enumerate(vocab)}
+    bits = max(1, (len(vocab) - 1).bit_length())
+    if bits * order > 64:
+        raise ValueError(f"词表({len(vocab)})和阶数({order})过大，无法用64位键表示")
+
+    sections = []
+    for n in range(1, order + 1):
+        entries = []
+        for words, logprob, backoff in grams.get(n, []):
+            if all(word in token_ids for word in words):
+                entries.append((_pack_key([token_ids[w] for w in words], bits), logprob, backoff))
+        entries.sort(key=lambda entry: entry[0])
+        keys = np.array([e[0] for e in entries], dtype=np.uint64)
+        logprobs = np.array([e[1] for e in entries], dtype=np.float32)
+        backoffs = np.array([e[2] for e in entries], dtype=np.float32)
+        sections.append((keys, logprobs, backoffs))
+
+    vocab_blob = "\n".join(vocab).encode("utf-8")
+    with open(output_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, order, len(vocab), bits))
+        f.write(struct.pack(f"<{order}Q", *(len(keys) for keys, _, _ in sections)))
+        f.write(struct.pack("<Q", len(vocab_blob)))
+        f.write(vocab_blob)
+        for keys, logprobs, backoffs in sections:
+            for array in (keys, logprobs, backoffs):
+                f.write(b"\0" * (_align(f.tell()) - f.tell()))
+                f.write(array.tobytes())
+    print(f"已生成 {output_path}: {order} 阶, 词表 {len(vocab)}, "
+          f"n-gram数 {[len(keys) for keys, _, _ in sections]}")
+
+
+class NgramLM:
+    """内存映射的回退n-gram语言模型，分数为log10概率"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.order, vocab_size, self.bits = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"不是有效的语言模型文件: {path}")
+
+        offset = _HEADER.size
+        counts = struct.unpack_from(f"<{self.order}Q", self._mm, offset)
+        offset += 8 * self.order
+        (vocab_bytes,) = struct.unpack_from("<Q", self._mm, offset)
+        offset += 8
+        vocab = self._mm[offset:offset + vocab_bytes].decode("utf-8").split("\n")
+        offset += vocab_bytes
+        self.vocab = {token: i for i, token in enumerate(vocab)}
+
+        # 每阶的键、概率、回退权重都是映射视图，不复制数据
+        self._keys: List[np.ndarray] = []
+        self._logprobs: List[np.ndarray] = []
+        self._backoffs: List[np.ndarray] = []
+        for count in counts:
+            for target, dtype in ((self._keys, np.uint64), (self._logprobs, np.float32),
+                                  (self._backoffs, np.float32)):
+                offset = _align(offset)
+                target.append(np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset))
+                offset += count * np.dtype(dtype).itemsize
+
+        self.bos = self.vocab.get("<s>")
+        self.eos = self.vocab.get("</s>")
+        self.unk = self.vocab.get("<unk>")
+
+    def _find(self, ids: Sequence[int]) -> int:
+        """查找n-gram，返回下标，不存在时返回-1"""
+        keys = self._keys[len(ids) - 1]
+        key = np.uint64(_pack_key(ids, self.bits))
+        index = int(np.searchsorted(keys, key))
+        if index < len(keys) and keys[index] == key:
+            return index
+        return -1
+
+    def token_ids(self, text: str) -> List[Optional[int]]:
+        """按字切分并转换为词ID，未登录字映射为<unk>（没有时为None）"""
+        return [self.vocab.get(char, self.unk) for char in text if not char.isspace()]
+
+    def score_ids(self, ids: List[Optional[int]], bos: bool = True, eos: bool = True) -> float:
+        """词ID序列的log10概率"""
+        sequence = ([self.bos] if bos and self.bos is not None else []) + ids
+        if eos and self.eos is not None:
+            sequence.append(self.eos)
+        start = 1 if bos and self.bos is not None else 0
+
+        total = 0.0
+        for position in range(start, len(sequence)):
+            word = sequence[position]
+            if word is None:
+                total += UNK_LOGPROB
+                continue
+            history = sequence[max(0, position - self.order + 1):position]
+            total += self._conditional(history, word)
+        return total
+
+    def _conditional(self, history: List[Optional[int]], word: int) -> float:
+        # 历史中出现未登录字时，只保留其后的部分
+        while None in history:
+            history = history[history.index(None) + 1:]
+        backoff = 0.0
+        while True:
+            index = self._find(history + [word])
+            if index >= 0:
+                return backoff + float(self._logprobs[len(history)][index])
+            if not history:
+                return backoff + UNK_LOGPROB
+            context = self._find(history)
+            if context >= 0:
+                backoff += float(self._backoffs[len(history) - 1][context])
+            history = history[1:]
+
+    def score(self, text: str, bos: bool = True, eos: bool = True) -> float:
+        """文本的log10概率"""
+        return self.score_ids(self.token_ids(text), bos, eos)
+
+    def close(self):
+        self._keys = self._logprobs = self._backoffs = []
+        self._mm.close()
+        self._file.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="n-gram语言模型工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="ARPA转二进制")
+    build.add_argument("arpa")
+    build.add_argument("output")
+    score = subparsers.add_parser("score", help="给文本打分")
+    score.add_argument("model")
+    score.add_argument("texts", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_binary(args.arpa, args.output)
+    else:
+        lm = NgramLM(args.model)
+        for text in args.texts:
+            print(f"{lm.score(text):.3f}\t{text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
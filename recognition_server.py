@@ -0,0 +1,183 @@
+"""
+本地流式识别服务
+
+协议（TCP，每个连接一个识别会话）:
+    客户端 -> 服务端: 帧 = 类型(1字节) + 长度(4字节, 大端) + 负载
+        b"A": 16位小端单声道PCM音频，采样率与识别器一致
+        b"E": 音频结束
+    服务端 -> 客户端: 每行一个JSON
+        {"type": "partial", "text": ..., "audio_ms": ..., "latency_ms": ..., "timestamps": [[起始ms, 结束ms], ...]}
+        {"type": "final", "text": ..., "audio_ms": ..., "latency_ms": ..., "timestamps": [...]}
+        {"type": "error", "message": ...}
+    timestamps为每个字相对会话开始的时间，模型未提供时为空列表；音频帧长度必须为偶数。
+"""
+import asyncio
+import json
+import struct
+import threading
+from typing import Optional
+import numpy as np
+from config_loader import ConfigLoader
+from voice_recognizer import RecognitionResult, VoiceRecognizer
+
+FRAME_AUDIO = b"A"
+FRAME_END = b"E"
+FRAME_HEADER = struct.Struct(">cI")
+# 单帧上限，防止异常客户端占用过多内存
+MAX_FRAME_BYTES = 1024 * 1024
+
+
+def encode_frame(kind: bytes, payload: bytes = b"") -> bytes:
+    """编码一个客户端帧"""
+    return FRAME_HEADER.pack(kind, len(payload)) + payload
+
+
+class RecognitionServer:
+    """本地流式识别服务 - 多个客户端并发推送音频，按会话返回中间和最终结果"""
+
+    def __init__(self, recognizer: VoiceRecognizer, host: str = "127.0.0.1", port: int = 10095,
+                 max_sessions: int = 8, max_pending_seconds: float = 5.0):
+        self.recognizer = recognizer
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.max_pending_samples = int(max_pending_seconds * recognizer.sample_rate)
+        self.active_sessions = 0
+        self.total_sessions = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+
+    @classmethod
+    def from_config(cls, config_loader: ConfigLoader, recognizer: VoiceRecognizer) -> "RecognitionServer":
+        server_config = config_loader.get_server_config()
+        return cls(
+            recognizer,
+            host=server_config.get("host", "127.0.0.1"),
+            port=server_config.get("port", 10095),
+            max_sessions=server_config.get("max_sessions", 8),
+            max_pending_seconds=server_config.get("max_pending_seconds", 5.0)
+        )
+
+    def start(self) -> bool:
+        """在独立线程中启动事件循环和服务"""
+        if self._thread and self._thread.is_alive():
+            return True
+        self._started.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._started.wait(timeout=5.0)
+        return self._server is not None
+
+    def stop(self):
+        """停止服务"""
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        self._server = None
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle_client, self.host, self.port)
+            )
+            print(f"识别服务已启动: {self.host}:{self.port}")
+        except Exception as e:
+            print(f"识别服务启动失败: {e}")
+            self._started.set()
+            return
+        self._started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个客户端连接（一个识别会话）"""
+        if self.active_sessions >= self.max_sessions:
+            await self._write_message(writer, {"type": "error", "message": "too many sessions"})
+            writer.close()
+            return
+        
+        self.active_sessions += 1
+        self.total_sessions += 1
+        try:
+            await self._run_session(reader, writer)
+        except Exception as e:
+            print(f"识别服务会话出错: {e}")
+        finally:
+            # 无论会话如何结束都归还名额
+            self.active_sessions -= 1
+            writer.close()
+    
+    async def _run_session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        results: asyncio.Queue = asyncio.Queue()
+        
+        def on_result(result: RecognitionResult):
+            # 在识别线程中调用，转交事件循环
+            loop.call_soon_threadsafe(results.put_nowait, result)
+        
+        # 非流式模型只在累积满一段时解码，积压上限需容纳一整段
+        max_pending = self.max_pending_samples
+        if not self.recognizer.model_streaming:
+            max_pending += int(self.recognizer.max_segment_seconds * self.recognizer.sample_rate)
+        
+        session = self.recognizer.open_session(callback=on_result)
+        sender = asyncio.create_task(self._send_results(writer, results))
+        try:
+            while True:
+                kind, length = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                if length > MAX_FRAME_BYTES or (kind == FRAME_AUDIO and length % 2):
+                    # 超长帧或非整数个采样，协议已错位，结束会话
+                    await self._write_message(writer, {"type": "error", "message": "bad frame length"})
+                    break
+                payload = await reader.readexactly(length) if length else b""
+                if kind == FRAME_END:
+                    break
+                if kind != FRAME_AUDIO or not payload:
+                    continue
+                
+                # 背压：积压超过上限时暂停读取，由TCP流控传导给客户端
+                while session.fed_samples - session.decoded_samples > max_pending:
+                    await asyncio.sleep(0.01)
+                
+                # 客户端发送的16位PCM直接进入识别会话，不转换为浮点
+                audio = np.frombuffer(payload, dtype="<i2").astype(np.int16, copy=False)
+                self.recognizer.feed_audio(session, audio)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.recognizer.close_session(session)
+            # 收尾完成后发送最终结果
+            await sender
+    
+    async def _send_results(self, writer: asyncio.StreamWriter, results: asyncio.Queue):
+        """把识别结果按行写回客户端，直到最终结果"""
+        sample_rate = self.recognizer.sample_rate
+        while True:
+            result = await results.get()
+            message = {
+                "type": "final" if result.is_final else "partial",
+                "text": result.text,
+                "audio_ms": round(result.decoded_samples * 1000 / sample_rate),
+                "latency_ms": round(result.latency_ms, 1),
+                "timestamps": [[begin, end] for begin, end in result.timestamps],
+            }
+            try:
+                await self._write_message(writer, message)
+            except ConnectionError:
+                pass
+            if result.is_final:
+                return
+
+    @staticmethod
+    async def _write_message(writer: asyncio.StreamWriter, message: dict):
+        writer.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+        await writer.drain()
@@ -0,0 +1,162 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+
+def default_profile_dir() -> str:
+    """性能分析输出目录，位于日志目录下"""
+    return os.path.join(os.path.expanduser("~"), "AppData", "Local", "VoiceInput", "profiles")
+
+
+class SessionProfiler:
+    """会话性能分析 - 对接下来的若干次识别会话采样所有线程的调用栈
+
+    采样结果写成火焰图工具可直接读取的折叠栈格式（.folded），识别线程另用cProfile
+    生成pstats文件（.pstats），并附带各会话的阶段耗时（.json）。未启用时只有一次布尔判断的开销。
+    """
+
+    def __init__(self, output_dir: Optional[str] = None, sessions: int = 3, interval_ms: float = 5.0):
+        self.output_dir = output_dir or default_profile_dir()
+        self.sessions = sessions
+        self.interval = interval_ms / 1000.0
+        self.on_finished: Optional[Callable[[str], None]] = None
+
+        self._lock = threading.Lock()
+        self._armed = 0  # 还需捕获的会话数
+        self._capturing = False
+        self._active_sessions = set()
+        self._session_timings: List[Dict[str, Any]] = []
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._started_at = 0.0
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    @classmethod
+    def from_config(cls, profiling_config: Dict[str, Any]) -> "SessionProfiler":
+        profiler = cls(
+            output_dir=profiling_config.get("output_dir") or None,
+            sessions=profiling_config.get("sessions", 3),
+            interval_ms=profiling_config.get("interval_ms", 5.0)
+        )
+        if profiling_config.get("enabled", False):
+            profiler.arm()
+        return profiler
+
+    @property
+    def armed(self) -> bool:
+        return self._armed > 0 or self._capturing
+
+    def arm(self, sessions: Optional[int] = None):
+        """捕获接下来的若干次会话"""
+        with self._lock:
+            self._armed = sessions or self.sessions
+
+    def disarm(self):
+        """取消捕获，已采集的数据立即写出"""
+        with self._lock:
+            self._armed = 0
+            self._active_sessions.clear()
+        self._finish()
+
+    def session_started(self, session_id: int) -> bool:
+        """会话开始时调用，返回该会话是否被捕获"""
+        if not self._armed:
+            return False
+        with self._lock:
+            if self._armed <= 0:
+                return False
+            self._armed -= 1
+            self._active_sessions.add(session_id)
+            if not self._capturing:
+                self._start()
+        return True
+
+    def session_finished(self, session_id: int, timings: Dict[str, Any]):
+        """会话收尾后调用，记录阶段耗时；最后一个被捕获的会话结束时写出结果"""
+        with self._lock:
+            if session_id not in self._active_sessions:
+                return
+            self._active_sessions.discard(session_id)
+            self._session_timings.append(dict(timings, session_id=session_id))
+            done = not self._active_sessions and self._armed <= 0
+        if done:
+            self._finish()
+
+    def thread_profile(self) -> Optional[cProfile.Profile]:
+        """捕获期间返回识别线程使用的cProfile对象"""
+        return self._cprofile if self._capturing else None
+
+    def _start(self):
+        self._stacks = Counter()
+        self._samples = 0
+        self._session_timings = []
+        self._started_at = time.time()
+        self._cprofile = cProfile.Profile()
+        self._stop.clear()
+        self._capturing = True
+        self._sampler = threading.Thread(target=self._sample_worker, name="profiler", daemon=True)
+        self._sampler.start()
+        print("开始性能分析")
+
+    def _sample_worker(self):
+        """定时采样所有线程的调用栈，按折叠栈计数"""
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._stacks[";".join(reversed(stack))] += 1
+            self._samples += 1
+
+    def _finish(self):
+        """停止采样并写出结果"""
+        with self._lock:
+            if not self._capturing:
+                return
+            self._capturing = False
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join(timeout=1.0)
+
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, "profile-" + time.strftime("%Y%m%d-%H%M%S"))
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            if self._cprofile is not None:
+                self._cprofile.dump_stats(base + ".pstats")
+            with open(base + ".json", "w", encoding="utf-8") as f:
+                json.dump({
+                    "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self._started_at)),
+                    "duration_s": round(time.time() - self._started_at, 3),
+                    "interval_ms": self.interval * 1000,
+                    "samples": self._samples,
+                    "sessions": self._session_timings,
+                }, f, indent=2, ensure_ascii=False)
+            print(f"性能分析结果已写入: {base}.*")
+        except Exception as e:
+            print(f"性能分析结果写入失败: {e}")
+            return
+        finally:
+            self._cprofile = None
+
+        if self.on_finished:
+            try:
+                self.on_finished(base)
+            except Exception as e:
+                print(f"性能分析回调出错: {e}")
@@ -0,0 +1,346 @@
+import os
+import queue
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from config_loader import ConfigLoader
+from work_scheduler import WorkScheduler
+
+# 段落中的热词替换 [(起点, 终点, 替换前原文), ...]，由HotwordCorrector.correct_with_spans记录
+Replacements = List[Tuple[int, int, str]]
+
+# 中文数字
+_DIGITS = {"零": 0, "〇": 0, "一": 1, "幺": 1, "二": 2, "两": 2, "三": 3, "四": 4,
+           "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_UNITS = {"十": 10, "百": 100, "千": 1000}
+_SECTION_UNITS = {"万": 10 ** 4, "亿": 10 ** 8}
+
+_NUM_CHARS = "零〇一幺二两三四五六七八九十百千万亿"
+_NUM = f"[{_NUM_CHARS}]"
+_DIGIT = "[零〇一幺二三四五六七八九]"
+
+# 含数字字符的成语和常用词，整体跳过不转换（"十分"后接"钟"时是时长）
+_ITN_IDIOMS = re.compile("|".join([
+    "乱七八糟", "七上八下", "七嘴八舌", "五花八门", "四面八方", "三心二意", "一心一意",
+    "十全十美", "一五一十", "三三两两", "九死一生", "独一无二", "数一数二", "一模一样",
+    "千方百计", "千千万万", "一举两得", "一点一点", "一点点", "百分百", "十分(?!钟)",
+    "万一", "一一", "千万", "一些", "一样", "一直", "一起", "一下", "一定", "统一", "唯一",
+]))
+# 数字后接这些量词/单位时才转换；"分"单独出现多为"十分""万分"等副词，不作为量词
+_MEASURES = ("个", "年", "月", "日", "号", "岁", "元", "块", "次", "秒", "分钟", "小时", "天",
+             "周", "倍", "米", "公里", "千米", "公斤", "千克", "斤", "页", "度", "%")
+# 单独的"一"只在日期中转换，"一个""一次"等保持原样
+_ONE_MEASURES = ("月", "号", "日")
+# 逐位读出的数字串（如电话号码、年份）至少这么长才不需要量词
+_MIN_DIGIT_RUN = 3
+
+
+def chinese_to_int(text: str) -> int:
+    """将中文数字（含十百千万亿单位）转换为整数"""
+    total = 0
+    section = 0
+    number = 0
+    for char in text:
+        if char in _DIGITS:
+            number = _DIGITS[char]
+        elif char in _UNITS:
+            # "十二"开头省略的"一"
+            section += (number or 1) * _UNITS[char]
+            number = 0
+        elif char == "亿":
+            total = (total + section + number) * _SECTION_UNITS[char]
+            section = number = 0
+        elif char == "万":
+            total += (section + number) * _SECTION_UNITS[char]
+            section = number = 0
+    return total + section + number
+
+
+def _digits_to_str(text: str) -> str:
+    """逐位读出的数字串，如"二零二五" -> "2025" """
+    return "".join(str(_DIGITS[char]) for char in text)
+
+
+def _number_to_str(text: str) -> str:
+    if any(char in _UNITS or char in _SECTION_UNITS for char in text):
+        return str(chinese_to_int(text))
+    return _digits_to_str(text)
+
+
+class PostProcessStage:
+    """后处理阶段基类 - 子类实现process_batch"""
+
+    name = "stage"
+
+    def process_batch(self, texts: List[str], replacements: Optional[List[Replacements]] = None) -> List[str]:
+        """处理一批段落；replacements为各段落中热词替换的位置和原文，不需要的阶段忽略即可"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放阶段持有的资源"""
+        pass
+
+
+class InverseTextNormalizer(PostProcessStage):
+    """基于规则的逆文本正则化 - 将中文数字读法转换为阿拉伯数字"""
+
+    name = "itn"
+
+    # 所有规则在类加载时预编译
+    _PERCENT = re.compile(f"百分之({_NUM}+)(?:点({_DIGIT}+))?")
+    _DECIMAL = re.compile(f"({_NUM}+)点({_DIGIT}+)")
+    _INTEGER = re.compile(f"{_NUM}+")
+
+    def process_batch(self, texts: List[str], replacements: Optional[List[Replacements]] = None) -> List[str]:
+        return [self.process(text) for text in texts]
+
+    def process(self, text: str) -> str:
+        # 成语和常用词原样保留，只转换其间的片段
+        pieces = []
+        last = 0
+        for match in _ITN_IDIOMS.finditer(text):
+            # 紧挨其他数字时是数字的一部分，如"三千万""一万一千"
+            before = text[match.start() - 1] if match.start() else ""
+            after = text[match.end()] if match.end() < len(text) else ""
+            if (before and before in _NUM_CHARS) or (after and after in _NUM_CHARS):
+                continue
+            pieces.append(self._convert(text[last:match.start()]))
+            pieces.append(match.group(0))
+            last = match.end()
+        pieces.append(self._convert(text[last:]))
+        return "".join(pieces)
+
+    def _convert(self, text: str) -> str:
+        if not text:
+            return text
+        text = self._PERCENT.sub(self._replace_percent, text)
+        text = self._DECIMAL.sub(self._replace_decimal, text)
+        text = self._INTEGER.sub(self._replace_integer, text)
+        return text
+
+    def _replace_percent(self, match: re.Match) -> str:
+        value = _number_to_str(match.group(1))
+        if match.group(2):
+            value += "." + _digits_to_str(match.group(2))
+        return value + "%"
+
+    def _replace_decimal(self, match: re.Match) -> str:
+        # "三点一刻""一点一点"之类不是小数
+        if match.string[match.end():match.end() + 1] in ("刻", "点"):
+            return match.group(0)
+        return _number_to_str(match.group(1)) + "." + _digits_to_str(match.group(2))
+
+    def _replace_integer(self, match: re.Match) -> str:
+        span = match.group(0)
+        following = match.string[match.end():]
+        if span == "一":
+            return _number_to_str(span) if following.startswith(_ONE_MEASURES) else span
+        if following.startswith(_MEASURES):
+            return _number_to_str(span)
+        if len(span) >= _MIN_DIGIT_RUN and all(char in _DIGITS for char in span):
+            return _digits_to_str(span)
+        return span
+
+
+class PunctuationRestorer(PostProcessStage):
+    """标点恢复 - 使用FunASR CT-Transformer标点模型"""
+
+    name = "punc"
+
+    def __init__(self, model_path: str):
+        # 延迟导入，未启用标点时不依赖funasr
+        from funasr import AutoModel
+        self.model = AutoModel(model=model_path)
+
+    def process_batch(self, texts: List[str], replacements: Optional[List[Replacements]] = None) -> List[str]:
+        # 非空段落一次送入模型
+        indices = [i for i, text in enumerate(texts) if text]
+        if not indices:
+            return texts
+        result = self.model.generate(input=[texts[i] for i in indices])
+        results = list(texts)
+        if isinstance(result, list) and len(result) == len(indices):
+            for i, item in zip(indices, result):
+                if isinstance(item, dict):
+                    results[i] = item.get("text", texts[i])
+        return results
+
+    def close(self):
+        self.model = None
+
+
+class LanguageModelRescorer(PostProcessStage):
+    """n-gram语言模型重打分 - 对段落中实时输出时做过的每处热词替换，按语言模型分数决定是否撤销
+
+    实时输出仍使用热词纠正的结果，重打分只作用于完成的段落，候选就是产生该段落文本的那些替换。
+    撤销某处替换需要语言模型分数高出hotword_bonus（log10）；全部保留时原样返回。
+    """
+
+    name = "lm"
+
+    def __init__(self, model_path: str, hotword_bonus: float = 1.0):
+        # 延迟导入，未配置语言模型时不加载
+        from ngram_lm import NgramLM
+        self.lm = NgramLM(model_path)
+        self.hotword_bonus = hotword_bonus
+
+    def process_batch(self, texts: List[str], replacements: Optional[List[Replacements]] = None) -> List[str]:
+        if replacements is None:
+            return texts
+        return [self.rescore(text, spans) for text, spans in zip(texts, replacements)]
+
+    def rescore(self, text: str, replacements: Replacements) -> str:
+        if not text or not replacements:
+            return text
+
+        # 从全部保留出发，从左到右逐个尝试撤销，分数提高才保留撤销
+        chosen = [True] * len(replacements)
+        best = self._score(text, replacements, chosen)
+        for i in range(len(replacements)):
+            chosen[i] = False
+            score = self._score(text, replacements, chosen)
+            if score > best:
+                best = score
+            else:
+                chosen[i] = True
+        if all(chosen):
+            return text
+        return self._build(text, replacements, chosen)
+
+    @staticmethod
+    def _build(text: str, replacements: Replacements, chosen: List[bool]) -> str:
+        pieces = []
+        last = 0
+        for (start, end, original), keep in zip(replacements, chosen):
+            pieces.append(text[last:start])
+            pieces.append(text[start:end] if keep else original)
+            last = end
+        pieces.append(text[last:])
+        return "".join(pieces)
+
+    def _score(self, text: str, replacements: Replacements, chosen: List[bool]) -> float:
+        return self.lm.score(self._build(text, replacements, chosen)) + self.hotword_bonus * sum(chosen)
+
+    def close(self):
+        self.lm.close()
+
+
+class TextPostProcessor:
+    """文本后处理流水线 - 在后台线程中批量处理已完成的识别段落，不阻塞实时输出
+
+    指定调度器时每批作为后台任务执行，识别会话进行中暂停，阶段之间也会检查。
+    """
+
+    def __init__(self, stages: List[PostProcessStage], batch_size: int = 8,
+                 scheduler: Optional[WorkScheduler] = None):
+        self.stages = stages
+        self.batch_size = batch_size
+        self.scheduler = scheduler
+        self.segment_callback: Optional[Callable[[str, str, Dict[str, float]], None]] = None
+        self._queue: "queue.Queue[Optional[Tuple[str, Replacements]]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+        if self.stages:
+            self._worker = threading.Thread(target=self._process_worker, daemon=True)
+            self._worker.start()
+
+    @classmethod
+    def from_config(cls, config_loader: ConfigLoader,
+                    scheduler: Optional[WorkScheduler] = None) -> "TextPostProcessor":
+        """根据配置组装流水线：语言模型重打分最先（替换位置对应未经其他阶段修改的文本），
+        标点其次（模型基于原始文本训练），ITN最后"""
+        postprocess_config = config_loader.get_postprocess_config()
+        stages: List[PostProcessStage] = []
+        if postprocess_config.get("enabled", False):
+            lm_path = postprocess_config.get("lm_path")
+            if lm_path:
+                if os.path.exists(lm_path):
+                    try:
+                        stages.append(LanguageModelRescorer(
+                            lm_path, postprocess_config.get("lm_hotword_bonus", 1.0)))
+                        print(f"语言模型加载成功: {lm_path}")
+                    except Exception as e:
+                        print(f"语言模型加载失败: {e}")
+                else:
+                    print(f"语言模型文件不存在: {lm_path}")
+            punc_path = postprocess_config.get("punc_model_path")
+            if punc_path and os.path.exists(punc_path):
+                try:
+                    stages.append(PunctuationRestorer(punc_path))
+                    print(f"标点模型加载成功: {punc_path}")
+                except Exception as e:
+                    print(f"标点模型加载失败: {e}")
+            if postprocess_config.get("itn", True):
+                stages.append(InverseTextNormalizer())
+        return cls(stages, batch_size=postprocess_config.get("batch_size", 8), scheduler=scheduler)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.stages)
+
+    def set_callback(self, callback: Callable[[str, str, Dict[str, float]], None]):
+        """设置段落处理完成回调: (原始文本, 处理后文本, 各阶段耗时ms)"""
+        self.segment_callback = callback
+
+    def submit(self, segment_text: str, replacements: Optional[Replacements] = None):
+        """提交一个已完成的段落，立即返回；replacements为段落中的热词替换，供重打分使用"""
+        if not self.stages:
+            if self.segment_callback:
+                self.segment_callback(segment_text, segment_text, {})
+            return
+        self._queue.put((segment_text, replacements or []))
+
+    def _process_worker(self):
+        """后处理工作线程：聚合排队的段落成批处理"""
+        while True:
+            segment = self._queue.get()
+            if segment is None:
+                break
+            batch = [segment]
+            while len(batch) < self.batch_size:
+                try:
+                    segment = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if segment is None:
+                    self._queue.put(None)
+                    break
+                batch.append(segment)
+
+            if self.scheduler is not None:
+                with self.scheduler.background():
+                    texts, costs = self._run_stages(batch)
+            else:
+                texts, costs = self._run_stages(batch)
+
+            if self.segment_callback:
+                for (raw, _), processed in zip(batch, texts):
+                    try:
+                        self.segment_callback(raw, processed, dict(costs))
+                    except Exception as e:
+                        print(f"后处理回调出错: {e}")
+
+    def _run_stages(self, batch: List[Tuple[str, Replacements]]) -> Tuple[List[str], Dict[str, float]]:
+        texts = [text for text, _ in batch]
+        replacements = [spans for _, spans in batch]
+        costs: Dict[str, float] = {}
+        for stage in self.stages:
+            if self.scheduler is not None:
+                self.scheduler.checkpoint()
+            start = time.perf_counter()
+            try:
+                texts = stage.process_batch(texts, replacements)
+            except Exception as e:
+                print(f"后处理阶段{stage.name}出错: {e}")
+            # 按段落均摊批处理耗时
+            costs[stage.name] = (time.perf_counter() - start) * 1000 / len(batch)
+        return texts, costs
+
+    def stop(self):
+        """停止工作线程并释放模型"""
+        if self._worker and self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join(timeout=2.0)
+        for stage in self.stages:
+            stage.close()
@@ -1,8 +1,11 @@
 import sys
 import os
+import threading
+import time
+from collections import deque
 from typing import Callable, Optional
 from PyQt5.QtWidgets import (
-    QApplication, QSystemTrayIcon, QMenu, QAction, 
+    QApplication, QSystemTrayIcon, QMenu, QAction, QActionGroup,
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
     QLineEdit, QPushButton, QCheckBox, QSpinBox,
     QTextEdit, QGroupBox, QFormLayout
@@ -62,6 +65,13 @@ class TrayUI(QObject):
     stop_recognition = pyqtSignal()
     show_settings = pyqtSignal()
     quit_application = pyqtSignal()
+    switch_model = pyqtSignal(str)
+    toggle_profiling = pyqtSignal(bool)
+    
+    # 内部信号：其他线程的界面更新经排队连接转交GUI线程
+    _status_requested = pyqtSignal()
+    _message_requested = pyqtSignal(str, str, object)
+    _profiling_state_requested = pyqtSignal(bool)
     
     def __init__(self, config_loader: ConfigLoader):
         super().__init__()
@@ -76,15 +86,27 @@ class TrayUI(QObject):
         self.is_recording = False
         self.recognition_status = "就绪"
         
+        # 待应用的最新状态；已有排队中的刷新时不再重复投递
+        self._status_lock = threading.Lock()
+        self._pending_status: Optional[tuple] = None
+        self._status_posted = False
+        self._icon_color: Optional[str] = None
+        # 状态更新统计：请求次数、实际刷新次数、最近若干次从请求到刷新的耗时（秒）
+        self.status_requests = 0
+        self.status_applied = 0
+        self.status_latencies = deque(maxlen=1000)
+        
+        # 三种状态图标只绘制一次
+        self._icons = {color: self._create_icon(color) for color in ("blue", "green", "red")}
+        
         self._create_tray_icon()
         self._create_menu()
         self._setup_signals()
     
     def _create_tray_icon(self):
         """创建托盘图标"""
-        # 创建简单的图标
-        icon = self._create_icon()
-        self.tray_icon = QSystemTrayIcon(icon)
+        self.tray_icon = QSystemTrayIcon(self._icons["blue"])
+        self._icon_color = "blue"
         self.tray_icon.setToolTip("Windows语音识别工具")
     
     def _create_icon(self, color: str = "blue") -> QIcon:
@@ -133,6 +155,16 @@ class TrayUI(QObject):
         
         self.tray_menu.addSeparator()
         
+        # 模型切换
+        self._create_model_menu()
+        
+        # 性能分析：勾选后捕获接下来的若干次会话
+        self.profiling_action = QAction("性能分析（接下来几次识别）")
+        self.profiling_action.setCheckable(True)
+        self.profiling_action.setChecked(self.config_loader.get_profiling_config().get("enabled", False))
+        self.profiling_action.triggered.connect(self.toggle_profiling.emit)
+        self.tray_menu.addAction(self.profiling_action)
+        
         # 设置
         settings_action = QAction("设置")
         settings_action.triggered.connect(self._show_settings)
@@ -149,9 +181,33 @@ class TrayUI(QObject):
         self.tray_icon.setContextMenu(self.tray_menu)
         
     
+    def _create_model_menu(self):
+        """创建模型切换子菜单"""
+        model_config = self.config_loader.get_model_config()
+        choices = model_config.get("choices", [])
+        if not choices:
+            return
+        
+        self.model_menu = self.tray_menu.addMenu("切换模型")
+        self.model_action_group = QActionGroup(self.model_menu)
+        self.model_action_group.setExclusive(True)
+        current_path = os.path.normpath(model_config.get("local_path", ""))
+        
+        for choice in choices:
+            path = choice.get("path", "")
+            action = QAction(choice.get("name", path), self.model_menu)
+            action.setCheckable(True)
+            action.setChecked(os.path.normpath(path) == current_path)
+            action.triggered.connect(lambda checked, p=path: self.switch_model.emit(p))
+            self.model_action_group.addAction(action)
+            self.model_menu.addAction(action)
+    
     def _setup_signals(self):
         """设置信号连接"""
         self.tray_icon.activated.connect(self._on_tray_activated)
+        self._status_requested.connect(self._apply_status, Qt.QueuedConnection)
+        self._message_requested.connect(self._show_message, Qt.QueuedConnection)
+        self._profiling_state_requested.connect(self.profiling_action.setChecked, Qt.QueuedConnection)
     
     def _on_tray_activated(self, reason):
         """托盘图标激活事件"""
@@ -194,7 +250,23 @@ class TrayUI(QObject):
             self.tray_icon.hide()
     
     def update_status(self, status: str, is_recording: bool = False):
-        """更新状态显示"""
+        """更新状态显示，可在任意线程调用；短时间内的多次更新合并为一次刷新"""
+        with self._status_lock:
+            self.status_requests += 1
+            self._pending_status = (status, is_recording, time.perf_counter())
+            if self._status_posted:
+                return
+            self._status_posted = True
+        self._status_requested.emit()
+    
+    def _apply_status(self):
+        """在GUI线程中应用最新的状态"""
+        with self._status_lock:
+            pending, self._pending_status = self._pending_status, None
+            self._status_posted = False
+        if pending is None:
+            return
+        status, is_recording, requested_at = pending
         self.recognition_status = status
         self.is_recording = is_recording
         
@@ -207,17 +279,28 @@ class TrayUI(QObject):
         
         # 更新图标颜色
         if is_recording:
-            icon = self._create_icon("red")
+            color = "red"
         elif status == "就绪":
-            icon = self._create_icon("green")
+            color = "green"
         else:
-            icon = self._create_icon("blue")
+            color = "blue"
         
-        if self.tray_icon:
-            self.tray_icon.setIcon(icon)
+        if self.tray_icon and color != self._icon_color:
+            self.tray_icon.setIcon(self._icons[color])
+            self._icon_color = color
+        
+        self.status_applied += 1
+        self.status_latencies.append(time.perf_counter() - requested_at)
     
     def show_message(self, title: str, message: str, icon=QSystemTrayIcon.Information):
-        """显示托盘消息"""
+        """显示托盘消息，可在任意线程调用"""
+        self._message_requested.emit(title, message, icon)
+    
+    def set_profiling_active(self, active: bool):
+        """更新性能分析菜单的勾选状态，可在任意线程调用"""
+        self._profiling_state_requested.emit(active)
+    
+    def _show_message(self, title: str, message: str, icon):
         if self.tray_icon:
             self.tray_icon.showMessage(title, message, icon, 3000)
 
@@ -316,15 +399,16 @@ class SettingsDialog(QDialog):
     def _save_settings(self):
         """保存设置"""
         try:
-            # 更新配置
-            self.config_loader.update_config("model.local_path", self.model_path_edit.text())
-            self.config_loader.update_config("model.vad_model_path", self.vad_path_edit.text())
-            
-            duration_sec = self.long_press_spin.value() / 1000.0
-            self.config_loader.update_config("input.caps_long_press_duration", duration_sec)
-            self.config_loader.update_config("input.enable_caps_toggle", self.caps_toggle_check.isChecked())
-            
-            self.config_loader.update_config("audio.sample_rate", self.sample_rate_spin.value())
+            # 更新配置：一次事务只写一次文件，各组件按变化项即时生效
+            with self.config_loader.transaction():
+                self.config_loader.update_config("model.local_path", self.model_path_edit.text())
+                self.config_loader.update_config("model.vad_model_path", self.vad_path_edit.text())
+                
+                duration_sec = self.long_press_spin.value() / 1000.0
+                self.config_loader.update_config("input.caps_long_press_duration", duration_sec)
+                self.config_loader.update_config("input.enable_caps_toggle", self.caps_toggle_check.isChecked())
+                
+                self.config_loader.update_config("audio.sample_rate", self.sample_rate_spin.value())
             
             self.accept()
             
@@ -1,16 +1,140 @@
 import numpy as np
-import sounddevice as sd
 import threading
 import queue
 import time
 import os
-from typing import Callable, Optional, Dict, Any
+import re
+from collections import deque
+from typing import Callable, Optional, Dict, Any, List, Tuple
 from funasr import AutoModel
 from config_loader import ConfigLoader
+from hotword_corrector import HotwordCorrector
+from text_postprocessor import TextPostProcessor
+from audio_capture import AudioCapture
+from adaptive_chunk import AdaptiveChunkController
+from audio_dsp import AudioFrontEnd, pcm16_to_float, to_pcm16
+from memory_monitor import SessionMemoryStats, estimate_cache_bytes, process_memory_bytes, release_memory
+from model_pool import ModelPool
+from model_snapshot import default_snapshot_dir, load_snapshot, save_snapshot, snapshot_path
+from session_profiler import SessionProfiler
+from wake_word import HandsFreeListener
+from work_scheduler import WorkScheduler
+
+# SenseVoice等富文本模型输出中的语种/情感/事件标签
+_RICH_TAG_PATTERN = re.compile(r"<\|[^|]*\|>")
+
+class RecognitionResult:
+    """识别结果 - 一个分块（或整个会话的最终结果）的文本及附带信息
+    
+    timestamps为每个字相对会话开始的 (起始ms, 结束ms)，confidences为每个字的置信度；
+    模型未提供时为空列表。
+    """
+    
+    __slots__ = ("text", "raw_text", "is_final", "session_id", "chunk_index", "decoded_samples",
+                 "timestamps", "confidences", "inference_ms", "latency_ms")
+    
+    def __init__(self, text: str, raw_text: str = "", is_final: bool = False, session_id: int = 0,
+                 chunk_index: int = 0, decoded_samples: int = 0,
+                 timestamps: Optional[List[Tuple[int, int]]] = None,
+                 confidences: Optional[List[float]] = None,
+                 inference_ms: float = 0.0, latency_ms: float = 0.0):
+        self.text = text
+        self.raw_text = raw_text or text  # 热词纠正前的文本
+        self.is_final = is_final
+        self.session_id = session_id
+        self.chunk_index = chunk_index
+        self.decoded_samples = decoded_samples
+        self.timestamps = timestamps if timestamps is not None else []
+        self.confidences = confidences if confidences is not None else []
+        self.inference_ms = inference_ms  # 本分块模型推理耗时
+        self.latency_ms = latency_ms  # 从音频送入（最终结果为松键）到结果产生的耗时
+    
+    @property
+    def confidence(self) -> Optional[float]:
+        """平均置信度，模型未提供时为None"""
+        return sum(self.confidences) / len(self.confidences) if self.confidences else None
+    
+    def __repr__(self) -> str:
+        return (f"RecognitionResult(text={self.text!r}, is_final={self.is_final}, "
+                f"chunk={self.chunk_index}, latency_ms={self.latency_ms:.1f})")
+
+class RecognitionSession:
+    """识别会话 - 一次长按对应的流式状态"""
+    
+    def __init__(self, session_id: int, chunk_size,
+                 callback: Optional[Callable[[RecognitionResult], None]] = None,
+                 interactive: bool = False):
+        self.session_id = session_id
+        self.chunk_size = chunk_size
+        # 会话专属结果回调；为空时走全局回调和后处理
+        self.callback = callback
+        # 交互听写会话，进行中暂停后台任务
+        self.interactive = interactive
+        # 音频前端（降噪、增益），未启用时为空
+        self.frontend: Optional[AudioFrontEnd] = None
+        self.cache: Dict[str, Any] = {}
+        self.buffer = np.array([], dtype=np.int16)
+        # 尚未拼入buffer的音频块，凑够一个分块时一次性拼接，避免每来一块都复制整个缓冲
+        self.pending: List[np.ndarray] = []
+        self.pending_samples = 0
+        self.segment_texts = []
+        # 段落各块中的热词替换（位置相对所在块），供语言模型重打分
+        self.segment_replacements = []
+        self.transcript = []
+        self.timestamps: List[Tuple[int, int]] = []
+        self.confidences: List[float] = []
+        self.chunk_index = 0
+        self.fed_samples = 0
+        self.decoded_samples = 0
+        # (累计送入采样数, 送入时刻)，用于计算结果延迟
+        self.feed_times = deque()
+        # 各阶段累计耗时（ms），随性能分析结果一起输出
+        self.stage_ms = {"dsp": 0.0, "generate": 0.0, "hotword": 0.0, "callback": 0.0}
+        self.profiled = False
+        self.memory_stats = SessionMemoryStats()
+        self.closed = False
+        self.stop_time = 0.0
+    
+    def append_audio(self, audio: np.ndarray):
+        self.pending.append(audio)
+        self.pending_samples += len(audio)
+    
+    def buffered_samples(self) -> int:
+        return len(self.buffer) + self.pending_samples
+    
+    def merge_pending(self):
+        """把待拼接的音频块并入buffer"""
+        if self.pending:
+            self.buffer = np.concatenate([self.buffer] + self.pending)
+            self.pending = []
+            self.pending_samples = 0
+    
+    def pop_feed_time(self) -> Optional[float]:
+        """丢弃已解码部分的送入记录，返回最后一个已解码采样的送入时刻；每次解码后调用，
+        静音（无文本输出）时记录也不会堆积"""
+        fed_at = None
+        while self.feed_times and self.feed_times[0][0] < self.decoded_samples:
+            fed_at = self.feed_times.popleft()[1]
+        if self.feed_times:
+            fed_at = self.feed_times[0][1]
+        return fed_at
+    
+    def release(self):
+        """释放流式缓存和音频缓冲"""
+        self.cache.clear()
+        self.buffer = np.array([], dtype=np.int16)
+        self.pending = []
+        self.pending_samples = 0
+        self.feed_times.clear()
 
 class VoiceRecognizer:
     """语音识别器 - 封装语音识别模型调用和音频流处理逻辑"""
     
+    # 模型状态
+    MODEL_LOADED = "loaded"
+    MODEL_UNLOADED = "unloaded"
+    MODEL_FAILED = "failed"
+    
     def __init__(self, config_loader: ConfigLoader):
         self.config_loader = config_loader
         self.model = None
@@ -18,7 +142,18 @@ class VoiceRecognizer:
         self.is_recording = False
         self.audio_queue = queue.Queue()
         self.recognition_thread = None
-        self.callback_func: Optional[Callable[[str], None]] = None
+        self.current_session: Optional[RecognitionSession] = None
+        self._session_counter = 0
+        # 已打开、尚未收尾的会话数，空闲卸载据此判断是否在用
+        self.open_sessions = 0
+        self._sessions_lock = threading.Lock()
+        # 配置中的模型已预加载、等待会话结束后切换
+        self._pending_model_path: Optional[str] = None
+        self._model_lock = threading.Lock()
+        # 最近若干次松键到最终文本的耗时（秒）
+        self.finalize_latencies = deque(maxlen=100)
+        self.callback_func: Optional[Callable[[RecognitionResult], None]] = None
+        self.segment_callback: Optional[Callable[[str, str, Dict[str, float]], None]] = None
         
         # 音频参数
         audio_config = config_loader.get_audio_config()
@@ -27,192 +162,735 @@ class VoiceRecognizer:
         self.encoder_chunk_look_back = audio_config.get("encoder_chunk_look_back", 4)
         self.decoder_chunk_look_back = audio_config.get("decoder_chunk_look_back", 1)
         
+        # 按实测实时率在分块配置间自适应切换
+        self.chunk_controller = AdaptiveChunkController(
+            audio_config.get("chunk_profiles", [[0, 8, 4], [0, 10, 5]]),
+            self.chunk_size,
+            enabled=audio_config.get("adaptive_chunk", True)
+        )
+        
+        # 常开采集流：预录时长覆盖长按判定时间，找回长按触发前说出的字
+        # 免按键唤醒需要输入流常开
+        handsfree_enabled = config_loader.get_handsfree_config().get("enabled", False)
+        keep_stream_open = audio_config.get("keep_stream_open", True) or handsfree_enabled
+        self.capture = AudioCapture(self.sample_rate, self._preroll_seconds(), keep_open=keep_stream_open,
+                                    device=audio_config.get("device"),
+                                    stall_seconds=audio_config.get("device_stall_seconds", 1.0))
+        
+        # 音频前端处理，噪声谱估计跨会话保留
+        self.dsp_config = config_loader.get_dsp_config()
+        self._noise_profile: Optional[np.ndarray] = None
+        
+        # 流式缓存内存上限
+        memory_config = config_loader.get_memory_config()
+        self.max_cache_bytes = int(memory_config.get("max_cache_mb", 64) * 1024 * 1024)
+        self.last_memory_stats: Optional[Dict[str, float]] = None
+        # 模型输入的float32缓冲区，按需扩大后复用
+        self._model_input = np.zeros(0, dtype=np.float32)
+        # 最近一次模型调用本身的耗时（秒），供自适应分块使用
+        self.last_model_seconds = 0.0
+        
+        # 热词
+        self.hotword_corrector = HotwordCorrector.from_config(config_loader)
+        self.hotword_biasing = (self.hotword_corrector.enabled and
+                                config_loader.get_hotword_config().get("model_biasing", False))
+        
+        # 后台任务调度：识别会话进行中暂停后处理、模型预加载等后台工作
+        self.scheduler = WorkScheduler.from_config(config_loader.get_scheduler_config())
+        
+        # 段落后处理（标点、ITN），在后台线程执行
+        self.postprocessor = TextPostProcessor.from_config(config_loader, self.scheduler)
+        
+        # 空闲卸载：长时间未使用时释放模型内存，下次长按时从快照恢复
+        model_config = config_loader.get_model_config()
+        self.idle_unload_seconds = model_config.get("idle_unload_minutes", 30) * 60
+        self.snapshot_dir = model_config.get("snapshot_dir") or default_snapshot_dir()
+        self.model_state = self.MODEL_FAILED
+        self.on_model_state_changed: Optional[Callable[[str], None]] = None
+        self.last_activity = time.monotonic()
+        self.last_restore_seconds: Optional[float] = None
+        self._snapshot_files: Dict[str, Optional[str]] = {}
+        self._shutdown_event = threading.Event()
+        
+        # 模型池：切换模型时优先复用已加载的模型
+        self.model_pool = ModelPool(model_config.get("pool_budget_mb", 2048), AutoModel)
+        self.model_path: Optional[str] = None
+        self.model_streaming = True
+        # 非流式模型（如SenseVoice）累积到该时长即整段识别
+        self.max_segment_seconds = model_config.get("max_segment_seconds", 30)
+        
         # 初始化模型
         self._load_models()
+        
+        self._idle_thread: Optional[threading.Thread] = None
+        self._ensure_idle_monitor()
+        
+        # 按需对接下来的若干次会话做性能分析
+        self.profiler = SessionProfiler.from_config(config_loader.get_profiling_config())
+        
+        # 配置变化即时生效，不重新加载已加载的模型
+        config_loader.subscribe(self._on_config_changed)
+        
+        # 免按键唤醒：旁路监听常开输入流，检测到唤醒词时由上层开始识别
+        self.handsfree: Optional[HandsFreeListener] = None
+        if handsfree_enabled and self.model:
+            self.handsfree = HandsFreeListener.from_config(config_loader, self.sample_rate)
+            if self.handsfree:
+                self.handsfree.start()
+                self.capture.listener = self.handsfree.feed
+        
+        if keep_stream_open and self.model:
+            try:
+                self.capture.open()
+            except Exception as e:
+                print(f"打开常开音频流失败: {e}")
     
-    def _load_models(self) -> bool:
-        """加载语音识别模型"""
+    def _load_models(self, model_path: Optional[str] = None) -> bool:
+        """加载语音识别模型（经由模型池，已加载的模型直接复用）"""
         try:
-            model_path = self.config_loader.get_model_path(prefer_local=True)
+            if model_path is None:
+                model_path = self.config_loader.get_model_path(prefer_local=True)
             print(f"正在加载语音识别模型: {model_path}")
             
-            # 加载主识别模型
-            self.model = AutoModel(model=model_path)
+            # 加载主识别模型（本地路径经模型仓库解析），工作线程可能正在用旧模型收尾
+            model = self.model_pool.get(self._pool_key(model_path))
+            with self._model_lock:
+                self.model = model
+                self.model_path = model_path
+                self.model_streaming = self._is_streaming_model(model_path)
             
             # 尝试加载VAD模型
             model_config = self.config_loader.get_model_config()
-            vad_path = model_config.get("vad_model_path")
-            if vad_path and os.path.exists(vad_path):
+            vad_path = self.config_loader.resolve_model_path(model_config.get("vad_model_path"))
+            if vad_path:
                 try:
-                    self.vad_model = AutoModel(model=vad_path)
+                    self.vad_model = self.model_pool.get(vad_path)
                     print(f"VAD模型加载成功: {vad_path}")
                 except Exception as e:
                     print(f"VAD模型加载失败: {e}")
             
             print("语音识别模型加载完成")
+            self._snapshot_files = {}
+            self._set_model_state(self.MODEL_LOADED)
             return True
             
         except Exception as e:
             print(f"模型加载失败: {e}")
+            self._set_model_state(self.MODEL_FAILED)
             return False
     
-    def set_callback(self, callback: Callable[[str], None]):
-        """设置识别结果回调函数"""
-        self.callback_func = callback
+    def _preroll_seconds(self) -> float:
+        """预录时长：长按判定时间加上按键前的余量；免按键模式下还需覆盖唤醒词语音段中的指令部分"""
+        margin = self.config_loader.get_audio_config().get("preroll_ms", 300) / 1000.0
+        seconds = self.config_loader.get_input_config().get("caps_long_press_duration", 0.5) + margin
+        handsfree_config = self.config_loader.get_handsfree_config()
+        if handsfree_config.get("enabled", False):
+            seconds = max(seconds, handsfree_config.get("max_keyword_seconds", 2.0) + margin)
+        return seconds
+    
+    def _pool_key(self, model_path: Optional[str]) -> Optional[str]:
+        """模型池的键：配置中的路径经模型仓库解析后的实际目录，不可解析时为原路径"""
+        return self.config_loader.resolve_model_path(model_path) or model_path
+    
+    def _is_streaming_model(self, model_path: str) -> bool:
+        """根据配置中的可选模型列表判断是否为流式模型"""
+        for choice in self.config_loader.get_model_config().get("choices", []):
+            if os.path.normpath(choice.get("path", "")) == os.path.normpath(model_path):
+                return choice.get("streaming", True)
+        return True
     
-    def start_recording(self) -> bool:
-        """开始录音和识别"""
-        if self.is_recording or not self.model:
+    def _model_source_paths(self) -> Dict[str, Optional[str]]:
+        """各模型属性对应的磁盘路径"""
+        return {
+            "model": self._pool_key(self.model_path),
+            "vad_model": self.config_loader.resolve_model_path(
+                self.config_loader.get_model_config().get("vad_model_path")),
+        }
+    
+    def switch_model(self, model_path: str) -> bool:
+        """切换识别模型，模型已在池中时几乎即时完成；刚松键的会话收尾完成后才真正切换"""
+        if model_path == self.model_path and self.model is not None:
+            return True
+        
+        self.stop_recording()
+        start = time.perf_counter()
+        if not self._switch_when_idle(model_path):
             return False
         
+        self.config_loader.update_config("model.local_path", model_path)
+        state = "完成" if self._pending_model_path is None else "已就绪，等待会话收尾后生效"
+        print(f"模型切换{state}，耗时 {(time.perf_counter() - start) * 1000:.0f} ms，"
+              f"模型池统计: {self.model_pool.stats()}")
+        return True
+    
+    def _switch_when_idle(self, model_path: str) -> bool:
+        """预加载模型和VAD，等没有打开的会话时再切换，正在收尾的会话继续使用原模型和缓存"""
         try:
-            self.is_recording = True
-            self.audio_queue = queue.Queue()
+            self.model_pool.get(self._pool_key(model_path))
+        except Exception as e:
+            print(f"模型加载失败: {e}")
+            return False
+        vad_path = self.config_loader.resolve_model_path(self.config_loader.get_model_config().get("vad_model_path"))
+        if vad_path:
+            try:
+                self.model_pool.get(vad_path)
+            except Exception as e:
+                print(f"VAD模型加载失败: {e}")
+        self._pending_model_path = model_path
+        self._apply_pending_model()
+        return True
+    
+    def _set_model_state(self, state: str):
+        self.model_state = state
+        if self.on_model_state_changed:
+            try:
+                self.on_model_state_changed(state)
+            except Exception as e:
+                print(f"模型状态回调出错: {e}")
+    
+    def set_model_state_callback(self, callback: Callable[[str], None]):
+        """设置模型状态变化回调（loaded/unloaded/failed）"""
+        self.on_model_state_changed = callback
+    
+    def _busy(self) -> bool:
+        """有录音或未收尾的会话（含识别服务、评测等程序化会话）"""
+        return self.is_recording or self.open_sessions > 0
+    
+    def unload_models(self) -> bool:
+        """释放模型内存；首次卸载时写入快照，之后可快速恢复"""
+        if self.model is None or self._busy():
+            return False
+        
+        # 写快照耗时较长，不持有模型锁，期间识别照常进行
+        activity = self.last_activity
+        snapshot_files = {}
+        models = {}
+        for attr, source in self._model_source_paths().items():
+            model = getattr(self, attr)
+            if model is None or not source:
+                continue
+            path = snapshot_path(self.snapshot_dir, source)
+            snapshot_files[attr] = path if save_snapshot(model, path) else None
+            models[attr] = model
+        
+        with self._model_lock:
+            # 写快照期间模型被使用或已切换时放弃本次卸载
+            if self._busy() or self.last_activity != activity or \
+                    any(getattr(self, attr) is not model for attr, model in models.items()):
+                return False
             
-            # 启动音频录制线程
-            self.audio_stream = sd.InputStream(
-                samplerate=self.sample_rate,
-                channels=1,
-                dtype=np.float32,
-                callback=self._audio_callback
-            )
-            self.audio_stream.start()
+            rss_before = process_memory_bytes()
+            for attr in models:
+                setattr(self, attr, None)
+            self._snapshot_files = snapshot_files
             
-            # 启动识别处理线程
-            self.recognition_thread = threading.Thread(
-                target=self._recognition_worker,
-                daemon=True
+            # 模型池也持有引用，需一并清空才能真正释放
+            self.model_pool.clear()
+            self._model_input = np.zeros(0, dtype=np.float32)
+            release_memory()
+            saved_mb = (rss_before - process_memory_bytes()) / 1024 / 1024
+            print(f"模型已卸载，释放常驻内存约 {saved_mb:.0f} MB")
+            self._set_model_state(self.MODEL_UNLOADED)
+            return True
+    
+    def restore_models(self):
+        """恢复已卸载的模型"""
+        with self._model_lock:
+            self._restore_models()
+    
+    def _restore_models(self):
+        """从快照恢复模型，快照不可用时从磁盘重新加载（调用方持有模型锁）"""
+        if self.model_state != self.MODEL_UNLOADED:
+            return
+        
+        start = time.perf_counter()
+        try:
+            for attr, path in self._snapshot_files.items():
+                model = load_snapshot(path) if path else None
+                source = self._model_source_paths()[attr]
+                if model is None:
+                    model = AutoModel(model=source)
+                self.model_pool.put(source, model)
+                setattr(self, attr, model)
+        except Exception as e:
+            print(f"模型恢复失败: {e}")
+            self._set_model_state(self.MODEL_FAILED)
+            return
+        
+        self.last_restore_seconds = time.perf_counter() - start
+        self.last_activity = time.monotonic()
+        print(f"模型恢复完成，耗时 {self.last_restore_seconds * 1000:.0f} ms")
+        self._set_model_state(self.MODEL_LOADED)
+    
+    def _ensure_idle_monitor(self):
+        """启用空闲卸载时确保监控线程在运行"""
+        if self.idle_unload_seconds <= 0:
+            return
+        if self._idle_thread and self._idle_thread.is_alive():
+            return
+        self._idle_thread = threading.Thread(target=self._idle_monitor_worker, daemon=True)
+        self._idle_thread.start()
+    
+    def _idle_monitor_worker(self):
+        """空闲监控线程：超过空闲时长且没有待处理音频时卸载模型；空闲卸载被关闭时退出"""
+        while self.idle_unload_seconds > 0:
+            if self._shutdown_event.wait(min(30.0, self.idle_unload_seconds / 2)):
+                return
+            idle = time.monotonic() - self.last_activity
+            if (self.model is not None and not self._busy() and self.idle_unload_seconds > 0 and
+                    self.audio_queue.empty() and idle > self.idle_unload_seconds):
+                self.unload_models()
+    
+    def _on_config_changed(self, changed):
+        """应用变化的配置项：分块、缓存上限、前端处理、热词等对之后的会话生效，模型路径变化时后台加载"""
+        audio_config = self.config_loader.get_audio_config()
+        model_config = self.config_loader.get_model_config()
+        
+        if changed & {"audio.chunk_size", "audio.chunk_profiles", "audio.adaptive_chunk"}:
+            self.chunk_size = audio_config.get("chunk_size", [0, 10, 5])
+            self.chunk_controller = AdaptiveChunkController(
+                audio_config.get("chunk_profiles", [[0, 8, 4], [0, 10, 5]]),
+                self.chunk_size,
+                enabled=audio_config.get("adaptive_chunk", True)
             )
-            self.recognition_thread.start()
+        if "audio.encoder_chunk_look_back" in changed:
+            self.encoder_chunk_look_back = audio_config.get("encoder_chunk_look_back", 4)
+        if "audio.decoder_chunk_look_back" in changed:
+            self.decoder_chunk_look_back = audio_config.get("decoder_chunk_look_back", 1)
+        if changed & {"audio.device", "audio.device_stall_seconds"}:
+            self.capture.stall_seconds = audio_config.get("device_stall_seconds", 1.0)
+            self.capture.set_device(audio_config.get("device"))
+        if changed & {"input.caps_long_press_duration", "audio.preroll_ms"}:
+            # 长按判定时间变长时，长按期间说的字仍需留在预录缓冲区中
+            self.capture.set_preroll_seconds(self._preroll_seconds())
+        if "audio.sample_rate" in changed:
+            print("采样率修改将在重启后生效")
+        if any(key.startswith("handsfree.") for key in changed):
+            print("免按键唤醒配置修改将在重启后生效")
+        
+        if "memory.max_cache_mb" in changed:
+            self.max_cache_bytes = int(self.config_loader.get_memory_config().get("max_cache_mb", 64) * 1024 * 1024)
+        if any(key.startswith("dsp.") for key in changed):
+            self.dsp_config = self.config_loader.get_dsp_config()
+        if any(key.startswith("hotword.") for key in changed):
+            self.hotword_corrector = HotwordCorrector.from_config(self.config_loader)
+            self.hotword_biasing = (self.hotword_corrector.enabled and
+                                    self.config_loader.get_hotword_config().get("model_biasing", False))
+        
+        if any(key.startswith("scheduler.") for key in changed):
+            self.scheduler.update_config(self.config_loader.get_scheduler_config())
+        
+        if any(key.startswith("profiling.") for key in changed):
+            profiling_config = self.config_loader.get_profiling_config()
+            self.profiler.sessions = profiling_config.get("sessions", 3)
+            self.profiler.interval = profiling_config.get("interval_ms", 5.0) / 1000.0
+            if "profiling.enabled" in changed:
+                if profiling_config.get("enabled", False):
+                    self.profiler.arm()
+                else:
+                    self.profiler.disarm()
+        
+        if "model.idle_unload_minutes" in changed:
+            self.idle_unload_seconds = model_config.get("idle_unload_minutes", 30) * 60
+            self._ensure_idle_monitor()
+        if "model.max_segment_seconds" in changed:
+            self.max_segment_seconds = model_config.get("max_segment_seconds", 30)
+        if changed & {"model.local_path", "model.name"}:
+            model_path = self.config_loader.get_model_path(prefer_local=True)
+            if model_path not in (self.model_path, self._pending_model_path):
+                # 后台加载新模型，加载完成前当前模型照常可用，等没有会话时再切换
+                self.scheduler.submit(lambda: self._switch_when_idle(model_path), name="preload")
+    
+    def _apply_pending_model(self):
+        """没有打开的会话（含已松键、仍在排队收尾的会话）时切换到预加载好的新模型"""
+        with self._sessions_lock:
+            model_path = self._pending_model_path
+            if model_path is None or self.open_sessions > 0:
+                return
+            self._pending_model_path = None
+            # 持有会话锁，切换期间不会有新会话打开
+            self._load_models(model_path)
+    
+    def set_callback(self, callback: Callable[[RecognitionResult], None]):
+        """设置识别结果回调函数"""
+        self.callback_func = callback
+    
+    def set_segment_callback(self, callback: Callable[[str, str, Dict[str, float]], None]):
+        """设置段落完成回调: (原始文本, 后处理文本, 各阶段耗时ms)，在后处理线程中调用"""
+        self.segment_callback = callback
+        self.postprocessor.set_callback(callback)
+    
+    def start_recording(self, preroll_samples: Optional[int] = None) -> bool:
+        """开始录音和识别；preroll_samples限制送入的预录音频长度（唤醒词触发时跳过唤醒词本身）"""
+        if self.is_recording or not self.is_model_loaded():
+            return False
+        
+        self.last_activity = time.monotonic()
+        if self.model_state == self.MODEL_UNLOADED:
+            # 后台恢复模型，期间音频在队列中等待
+            threading.Thread(target=self.restore_models, daemon=True).start()
+        
+        session = None
+        try:
+            # 上一次会话可能仍在后台收尾，新会话可以立即开始
+            session = self.open_session(interactive=True)
             
-            print("开始语音识别")
+            # 开始转发音频，常开模式下先送入按键触发前的预录音频
+            self.capture.begin(lambda audio: self.feed_audio(session, audio), preroll_samples)
+            
+            self.current_session = session
+            self.is_recording = True
+            print(f"开始语音识别 (会话 {session.session_id})")
             return True
             
         except Exception as e:
             print(f"启动录音失败: {e}")
+            if session is not None:
+                self.close_session(session)
             self.is_recording = False
             return False
     
     def stop_recording(self):
-        """停止录音和识别"""
+        """停止录音，立即返回；剩余音频的最终识别在工作线程中异步完成"""
         if not self.is_recording:
             return
         
+        session = self.current_session
+        self.current_session = None
         self.is_recording = False
         
         try:
-            if hasattr(self, 'audio_stream'):
-                self.audio_stream.stop()
-                self.audio_stream.close()
-            
-            # 等待识别线程结束
-            if self.recognition_thread and self.recognition_thread.is_alive():
-                self.recognition_thread.join(timeout=2.0)
-            
-            print("语音识别已停止")
-            
+            self.capture.end()
         except Exception as e:
             print(f"停止录音时出错: {e}")
-    
-    def _audio_callback(self, indata, frames, time, status):
-        """音频数据回调函数"""
-        if status:
-            print(f"音频录制状态: {status}")
         
-        if self.is_recording:
-            # 将音频数据放入队列
-            audio_data = indata.copy().flatten()
-            self.audio_queue.put(audio_data)
+        if session is not None:
+            self.close_session(session)
+        print("语音识别已停止")
+    
+    def open_session(self, callback: Optional[Callable[[RecognitionResult], None]] = None,
+                     interactive: bool = False) -> RecognitionSession:
+        """创建识别会话，音频通过feed_audio送入；指定callback时结果只发给该回调
+
+        interactive为True（长按或唤醒词听写）时会话期间暂停后台任务；服务端、评测等会话不影响后台任务。
+        """
+        self._ensure_worker()
+        self._session_counter += 1
+        # 新会话缓存为空，是切换分块配置的安全时机
+        session = RecognitionSession(self._session_counter, self.chunk_controller.select(), callback,
+                                     interactive)
+        with self._sessions_lock:
+            self.open_sessions += 1
+        if interactive:
+            self.scheduler.live_started()
+        if self.dsp_config.get("enabled", False):
+            session.frontend = AudioFrontEnd.from_config(self.dsp_config, self.sample_rate,
+                                                         self._noise_profile)
+        session.profiled = self.profiler.session_started(session.session_id)
+        return session
+    
+    def feed_audio(self, session: RecognitionSession, audio: np.ndarray):
+        """向会话送入一段音频（int16；浮点音频在此转换一次）"""
+        if not session.closed:
+            audio = to_pcm16(audio)
+            session.fed_samples += len(audio)
+            session.feed_times.append((session.fed_samples, time.perf_counter()))
+            self.audio_queue.put((session, audio))
+    
+    def close_session(self, session: RecognitionSession):
+        """结束会话输入，排队等待异步收尾"""
+        if session.closed:
+            return
+        session.closed = True
+        session.stop_time = time.perf_counter()
+        self.audio_queue.put((session, None))
+    
+    def _ensure_worker(self):
+        """确保常驻识别线程在运行"""
+        if self.recognition_thread and self.recognition_thread.is_alive():
+            return
+        self.recognition_thread = threading.Thread(
+            target=self._recognition_worker,
+            name="recognition",
+            daemon=True
+        )
+        self.recognition_thread.start()
     
     def _recognition_worker(self):
-        """识别工作线程"""
-        cache = {}
-        chunk_stride = self.chunk_size[1] * 960  # 计算步长
-        audio_buffer = np.array([], dtype=np.float32)
-        
-        while self.is_recording:
+        """识别工作线程：按到达顺序处理所有会话的音频，保证前一会话的尾部先于后一会话输出"""
+        while True:
+            item = self.audio_queue.get()
+            if item is None:
+                break
+            
+            session, audio_chunk = item
+            profile = self.profiler.thread_profile() if self.profiler.armed else None
+            if profile is not None:
+                try:
+                    profile.enable()
+                except ValueError:
+                    # 已有其他分析工具在运行
+                    profile = None
             try:
-                # 获取音频数据
+                if audio_chunk is None:
+                    try:
+                        self._finalize_session(session)
+                    finally:
+                        with self._sessions_lock:
+                            self.open_sessions -= 1
+                        if session.interactive:
+                            self.scheduler.live_finished()
+                        self._apply_pending_model()
+                else:
+                    self._process_audio(session, audio_chunk)
+            except Exception as e:
+                print(f"识别工作线程出错: {e}")
+            finally:
+                if profile is not None:
+                    profile.disable()
+    
+    def _process_audio(self, session: RecognitionSession, audio_chunk: np.ndarray):
+        """累积音频，缓冲区足够时进行流式识别"""
+        if session.frontend is not None:
+            start = time.perf_counter()
+            audio_chunk = session.frontend.process(audio_chunk)
+            session.stage_ms["dsp"] += (time.perf_counter() - start) * 1000
+        session.append_audio(audio_chunk)
+        
+        if not self.model_streaming:
+            # 非流式模型：累积到上限时整段识别
+            if session.buffered_samples() >= self.max_segment_seconds * self.sample_rate:
+                session.merge_pending()
                 try:
-                    audio_chunk = self.audio_queue.get(timeout=0.1)
-                    audio_buffer = np.concatenate([audio_buffer, audio_chunk])
-                except queue.Empty:
-                    continue
+                    start = time.perf_counter()
+                    result = self._generate(session.buffer, session.cache, session.chunk_size,
+                                            is_final=True)
+                    session.decoded_samples += len(session.buffer)
+                    self._handle_result(session, result, len(session.buffer), time.perf_counter() - start)
+                except Exception as e:
+                    print(f"识别过程出错: {e}")
+                session.buffer = np.array([], dtype=np.int16)
+                self._submit_segment(session)
+            return
+        
+        while True:
+            # 计算步长（分块配置可能在段落边界变化）
+            chunk_stride = session.chunk_size[1] * 960
+            if session.buffered_samples() < chunk_stride:
+                break
+            session.merge_pending()
+            
+            # 提取一个chunk进行识别
+            speech_chunk = session.buffer[:chunk_stride]
+            session.buffer = session.buffer[chunk_stride:]
+            
+            # 执行识别
+            try:
+                # 缓存超出上限时以当前分块结束本段，随后重置缓存
+                cache_bytes = estimate_cache_bytes(session.cache)
+                session.memory_stats.sample(cache_bytes)
+                cache_full = 0 < self.max_cache_bytes < cache_bytes
                 
-                # 当缓冲区有足够数据时进行识别
-                while len(audio_buffer) >= chunk_stride:
-                    # 提取一个chunk进行识别
-                    speech_chunk = audio_buffer[:chunk_stride]
-                    audio_buffer = audio_buffer[chunk_stride:]
-                    
-                    # 执行识别
-                    try:
-                        result = self.model.generate(
-                            input=speech_chunk,
-                            cache=cache,
-                            is_final=False,
-                            chunk_size=self.chunk_size,
-                            encoder_chunk_look_back=self.encoder_chunk_look_back,
-                            decoder_chunk_look_back=self.decoder_chunk_look_back
-                        )
-                        
-                        # 处理识别结果
-                        if result and len(result) > 0:
-                            text = self._extract_text_from_result(result)
-                            if text and text.strip():
-                                if self.callback_func:
-                                    self.callback_func(text.strip())
-                    
-                    except Exception as e:
-                        print(f"识别过程出错: {e}")
-                        continue
+                start = time.perf_counter()
+                result = self._generate(speech_chunk, session.cache, session.chunk_size,
+                                        is_final=cache_full)
+                inference_seconds = time.perf_counter() - start
+                self.chunk_controller.record(self.last_model_seconds, session.chunk_size)
+                session.decoded_samples += chunk_stride
+                self._handle_result(session, result, chunk_stride, inference_seconds)
                 
+                if cache_full:
+                    session.cache.clear()
+                    session.memory_stats.cache_resets += 1
+                    self._submit_segment(session)
+                    session.chunk_size = self.chunk_controller.select()
+            
             except Exception as e:
-                print(f"识别工作线程出错: {e}")
-                time.sleep(0.1)
+                print(f"识别过程出错: {e}")
+                continue
+    
+    def _finalize_session(self, session: RecognitionSession):
+        """处理剩余的音频数据并释放会话资源"""
+        if session.frontend is not None:
+            session.append_audio(session.frontend.flush())
+            self._noise_profile = session.frontend.noise_profile
+        session.merge_pending()
+        if len(session.buffer) > 0:
+            try:
+                start = time.perf_counter()
+                result = self._generate(session.buffer, session.cache, session.chunk_size,
+                                        is_final=True)
+                session.decoded_samples += len(session.buffer)
+                self._handle_result(session, result, len(session.buffer), time.perf_counter() - start)
+            except Exception as e:
+                print(f"最终识别处理出错: {e}")
+        
+        latency = time.perf_counter() - session.stop_time
+        self.finalize_latencies.append(latency)
+        print(f"会话 {session.session_id} 收尾完成，松键到最终文本 {latency * 1000:.0f} ms")
         
-        # 处理剩余的音频数据
-        if len(audio_buffer) > 0:
+        self._submit_segment(session)
+        if session.callback:
             try:
-                result = self.model.generate(
-                    input=audio_buffer,
+                session.callback(RecognitionResult(
+                    "".join(session.transcript), is_final=True, session_id=session.session_id,
+                    chunk_index=session.chunk_index, decoded_samples=session.decoded_samples,
+                    timestamps=session.timestamps, confidences=session.confidences,
+                    latency_ms=latency * 1000
+                ))
+            except Exception as e:
+                print(f"会话回调出错: {e}")
+        
+        # 及时释放本次会话的缓存张量
+        session.memory_stats.sample(estimate_cache_bytes(session.cache))
+        session.release()
+        release_memory()
+        self.last_memory_stats = session.memory_stats.summary()
+        print(f"会话内存统计: {self.last_memory_stats}")
+        
+        if session.profiled:
+            self.profiler.session_finished(session.session_id, {
+                "audio_s": round(session.decoded_samples / self.sample_rate, 3),
+                "chunks": session.chunk_index,
+                "finalize_ms": round(latency * 1000, 1),
+                "stage_ms": {name: round(cost, 1) for name, cost in session.stage_ms.items()},
+            })
+    
+    def _submit_segment(self, session: RecognitionSession):
+        """整段交给后处理流水线，不阻塞实时输出"""
+        if session.segment_texts and session.callback is None:
+            # 替换位置换算为相对整段
+            replacements = []
+            offset = 0
+            for text, spans in zip(session.segment_texts, session.segment_replacements):
+                replacements.extend((start + offset, end + offset, original) for start, end, original in spans)
+                offset += len(text)
+            self.postprocessor.submit("".join(session.segment_texts), replacements)
+        session.segment_texts = []
+        session.segment_replacements = []
+    
+    def _to_model_input(self, speech: np.ndarray) -> np.ndarray:
+        """int16音频转换为模型需要的float32，写入复用的缓冲区（调用方持有模型锁）"""
+        if len(self._model_input) < len(speech):
+            self._model_input = np.empty(len(speech), dtype=np.float32)
+        return pcm16_to_float(speech, self._model_input[:len(speech)])
+    
+    def _generate(self, speech: np.ndarray, cache: Dict[str, Any], chunk_size, is_final: bool):
+        """执行一次流式识别"""
+        kwargs = {}
+        if self.hotword_biasing:
+            # 仅对支持上下文偏置的模型生效
+            kwargs["hotword"] = self.hotword_corrector.bias_string()
+        with self._model_lock:
+            if self.model is None:
+                self._restore_models()
+            self.last_activity = time.monotonic()
+            speech = self._to_model_input(speech)
+            # 只计模型计算本身，等锁和恢复模型的耗时不影响分块选择
+            start = time.perf_counter()
+            try:
+                if not self.model_streaming:
+                    return self.model.generate(input=speech, language="auto", use_itn=False, **kwargs)
+                return self.model.generate(
+                    input=speech,
                     cache=cache,
-                    is_final=True,
-                    chunk_size=self.chunk_size,
+                    is_final=is_final,
+                    chunk_size=chunk_size,
                     encoder_chunk_look_back=self.encoder_chunk_look_back,
-                    decoder_chunk_look_back=self.decoder_chunk_look_back
+                    decoder_chunk_look_back=self.decoder_chunk_look_back,
+                    **kwargs
                 )
-                
-                if result and len(result) > 0:
-                    text = self._extract_text_from_result(result)
-                    if text and text.strip():
-                        if self.callback_func:
-                            self.callback_func(text.strip())
-            except Exception as e:
-                print(f"最终识别处理出错: {e}")
+            finally:
+                self.last_model_seconds = time.perf_counter() - start
     
-    def _extract_text_from_result(self, result) -> str:
-        """从识别结果中提取文本"""
+    def _handle_result(self, session: RecognitionSession, result, chunk_samples: int,
+                       inference_seconds: float = 0.0):
+        """处理识别结果：热词纠正后回调，并计入会话文本"""
+        session.chunk_index += 1
+        session.stage_ms["generate"] += inference_seconds * 1000
+        fed_at = session.pop_feed_time()
+        if not result or len(result) == 0:
+            return
+        raw_text, timestamps, confidences = self._extract_result_fields(result)
+        raw_text = _RICH_TAG_PATTERN.sub('', raw_text).strip()
+        if not raw_text:
+            return
+        
+        start = time.perf_counter()
+        text, replacements = self.hotword_corrector.correct_with_spans(raw_text)
+        session.stage_ms["hotword"] += (time.perf_counter() - start) * 1000
+        # 模型给出的时间戳相对本次输入，换算为相对会话开始
+        if timestamps:
+            offset_ms = (session.decoded_samples - chunk_samples) * 1000 // self.sample_rate
+            timestamps = [(begin + offset_ms, end + offset_ms) for begin, end in timestamps]
+            session.timestamps.extend(timestamps)
+        session.confidences.extend(confidences)
+        
+        now = time.perf_counter()
+        
+        result_obj = RecognitionResult(
+            text, raw_text, session_id=session.session_id, chunk_index=session.chunk_index,
+            decoded_samples=session.decoded_samples, timestamps=timestamps, confidences=confidences,
+            inference_ms=inference_seconds * 1000,
+            latency_ms=(now - fed_at) * 1000 if fed_at is not None else 0.0
+        )
+        session.segment_texts.append(text)
+        session.segment_replacements.append(replacements)
+        session.transcript.append(text)
+        # 回调中包含文本输出（如逐字发送到前台窗口）
+        start = time.perf_counter()
+        if session.callback:
+            session.callback(result_obj)
+        elif self.callback_func:
+            self.callback_func(result_obj)
+        session.stage_ms["callback"] += (time.perf_counter() - start) * 1000
+    
+    def _extract_result_fields(self, result) -> Tuple[str, List[Tuple[int, int]], List[float]]:
+        """从识别结果中提取文本、逐字时间戳和置信度"""
         try:
             if isinstance(result, list) and len(result) > 0:
-                if isinstance(result[0], dict):
-                    return result[0].get('text', '')
-                elif isinstance(result[0], str):
-                    return result[0]
-            elif isinstance(result, dict):
-                return result.get('text', '')
-            elif isinstance(result, str):
-                return result
-            return ''
+                result = result[0]
+            if isinstance(result, str):
+                return result, [], []
+            if not isinstance(result, dict):
+                return '', [], []
+            
+            timestamps = [(int(item[0]), int(item[1])) for item in result.get('timestamp') or []
+                          if len(item) >= 2]
+            confidences = result.get('confidence', result.get('score'))
+            if confidences is None:
+                confidences = []
+            elif isinstance(confidences, (int, float)):
+                confidences = [float(confidences)]
+            else:
+                confidences = [float(c) for c in confidences]
+            return result.get('text', ''), timestamps, confidences
         except Exception as e:
-            print(f"提取文本时出错: {e}")
-            return ''
+            print(f"解析识别结果时出错: {e}")
+            return '', [], []
     
     def is_model_loaded(self) -> bool:
-        """检查模型是否已加载"""
-        return self.model is not None
+        """检查模型是否可用（已加载或已卸载但可恢复）"""
+        return self.model is not None or self.model_state == self.MODEL_UNLOADED
+    
+    def shutdown(self):
+        """停止识别，等待排队的会话收尾后释放后台资源"""
+        self.stop_recording()
+        self._shutdown_event.set()
+        self.capture.close()
+        if self.handsfree:
+            self.handsfree.stop()
+        if self.recognition_thread and self.recognition_thread.is_alive():
+            self.audio_queue.put(None)
+            self.recognition_thread.join(timeout=10.0)
+        self.postprocessor.stop()
     
     def reload_models(self) -> bool:
-        """重新加载模型"""
+        """重新从磁盘加载模型；正在收尾的会话仍用旧模型对象，收尾完成后才切换"""
         self.stop_recording()
-        return self._load_models()
\ No newline at end of file
+        if self.model_path:
+            self.model_pool.evict(self._pool_key(self.model_path))
+        vad_path = self.config_loader.resolve_model_path(self.config_loader.get_model_config().get("vad_model_path"))
+        if vad_path:
+            self.model_pool.evict(vad_path)
+        return self._switch_when_idle(self.config_loader.get_model_path(prefer_local=True))
\ No newline at end of file
@@ -0,0 +1,244 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from audio_dsp import PCM16_SCALE
+from config_loader import ConfigLoader
+
+
+class EnergyVAD:
+    """能量VAD - 按帧计算能量，高于自适应噪声底一定分贝即判为语音，带拖尾
+
+    启动窗口内噪声底只取已见帧能量的最小值、不向上跟踪，输入流从说话或突发噪声中开始时，
+    噪声底不会被语音本身抬高而漏检。
+    """
+
+    def __init__(self, sample_rate: int, frame_ms: float = 20.0, threshold_db: float = 10.0,
+                 hangover_ms: float = 300.0, min_dbfs: float = -55.0, floor_adapt: float = 0.05,
+                 init_ms: float = 1000.0):
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.init_frames = max(1, int(init_ms / frame_ms))
+        self._frames_seen = 0
+        self.ratio = 10 ** (threshold_db / 10)
+        self.hangover_frames = max(1, int(hangover_ms / frame_ms))
+        self.min_energy = 10 ** (min_dbfs / 10)
+        self.floor_adapt = floor_adapt
+        self.floor: Optional[float] = None
+        self._remainder = np.zeros(0, dtype=np.int16)
+        self._hangover = 0
+
+    @property
+    def active(self) -> bool:
+        return self._hangover > 0
+
+    def process(self, audio: np.ndarray) -> bool:
+        """送入一块int16音频，返回处理后是否处于语音段"""
+        if len(self._remainder):
+            audio = np.concatenate([self._remainder, audio])
+        count = len(audio) // self.frame
+        self._remainder = audio[count * self.frame:].copy()
+        if count == 0:
+            return self.active
+
+        frames = audio[:count * self.frame].reshape(count, self.frame)
+        energies = np.einsum("ij,ij->i", frames, frames, dtype=np.float64) / (self.frame * PCM16_SCALE ** 2)
+        for energy in energies.tolist():
+            if self._frames_seen < self.init_frames:
+                self._frames_seen += 1
+                floor = max(energy, self.min_energy / self.ratio)
+                self.floor = floor if self.floor is None else min(self.floor, floor)
+            if energy > self.floor * self.ratio and energy > self.min_energy:
+                self._hangover = self.hangover_frames
+            else:
+                if self._hangover:
+                    self._hangover -= 1
+                # 只在非语音帧上跟踪噪声底，下降时立即跟随，启动窗口内不上升
+                if energy < self.floor:
+                    self.floor = energy
+                elif self._frames_seen >= self.init_frames:
+                    self.floor += self.floor_adapt * (energy - self.floor)
+        return self.active
+
+    def reset(self):
+        self._remainder = np.zeros(0, dtype=np.int16)
+        self._hangover = 0
+
+
+class KeywordSpotter:
+    """唤醒词检测 - 使用FunASR的小型KWS模型，只在VAD截出的短语音段上运行"""
+
+    def __init__(self, model_path: str, keywords: str):
+        # 延迟导入，未启用免按键模式时不加载
+        from funasr import AutoModel
+        self.keywords = keywords
+        self.model = AutoModel(model=model_path, keywords=keywords)
+
+    def detect(self, audio: np.ndarray) -> bool:
+        result = self.model.generate(input=audio)
+        if isinstance(result, list) and result and isinstance(result[0], dict):
+            # 输出形如 "detected 小云小云 0.95" 或 "rejected"
+            return str(result[0].get("text", "")).startswith("detected")
+        return False
+
+
+class HandsFreeListener:
+    """免按键唤醒 - 常开采集流的音频先经能量VAD，只有语音段才交给KWS模型
+
+    空闲时在采集回调线程中只做帧能量计算；检测到唤醒词后通过on_wake通知开始识别，
+    识别期间持续静音超过silence_seconds（或达到最长时长）时通过on_silence通知结束。
+    两个回调都在后台线程中调用，不会阻塞采集回调。
+    """
+
+    IDLE = "idle"
+    ENGAGED = "engaged"
+
+    def __init__(self, sample_rate: int, spotter: KeywordSpotter, vad: EnergyVAD,
+                 max_keyword_seconds: float = 2.0, silence_seconds: float = 1.5,
+                 max_session_seconds: float = 60.0, min_keyword_seconds: float = 0.3,
+                 keyword_seconds: float = 1.0):
+        self.sample_rate = sample_rate
+        self.spotter = spotter
+        self.vad = vad
+        self.max_keyword_samples = int(max_keyword_seconds * sample_rate)
+        self.min_keyword_samples = int(min_keyword_seconds * sample_rate)
+        # 唤醒词本身的大致时长：KWS不给出时间戳，语音段中超出这部分的视为紧接着说的指令
+        self.keyword_samples = int(keyword_seconds * sample_rate)
+        self.silence_samples = int(silence_seconds * sample_rate)
+        self.max_session_samples = int(max_session_seconds * sample_rate)
+        # on_wake参数：唤醒词之后已采集的采样数（含语音段中唤醒词后的部分），作为会话的预录音频
+        self.on_wake: Optional[Callable[[int], None]] = None
+        # on_silence参数：发出该事件的会话编号，与engagement比较以忽略过期事件
+        self.on_silence: Optional[Callable[[int], None]] = None
+
+        self.state = self.IDLE
+        self.auto_stop = False
+        # 每次engage递增的会话编号
+        self.engagement = 0
+        self.stats: Dict[str, int] = {"segments": 0, "detections": 0, "dropped": 0}
+        self._segment: List[np.ndarray] = []
+        self._segment_samples = 0
+        self._since_segment = 0
+        self._silent_samples = 0
+        self._session_samples = 0
+        self._stop_posted = False
+        # 同时最多排队两个待检测片段，KWS跟不上时丢弃
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=2)
+        self._worker: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config_loader: ConfigLoader, sample_rate: int) -> Optional["HandsFreeListener"]:
+        """按配置创建，未启用或KWS模型不可用时返回None"""
+        handsfree_config = config_loader.get_handsfree_config()
+        if not handsfree_config.get("enabled", False):
+            return None
+        model_path = config_loader.resolve_model_path(handsfree_config.get("kws_model_path"))
+        if not model_path:
+            print(f"唤醒词模型不存在: {handsfree_config.get('kws_model_path')}")
+            return None
+        try:
+            spotter = KeywordSpotter(model_path, handsfree_config.get("keywords", "小云小云"))
+        except Exception as e:
+            print(f"唤醒词模型加载失败: {e}")
+            return None
+        vad = EnergyVAD(sample_rate, threshold_db=handsfree_config.get("vad_threshold_db", 10))
+        return cls(
+            sample_rate, spotter, vad,
+            max_keyword_seconds=handsfree_config.get("max_keyword_seconds", 2.0),
+            silence_seconds=handsfree_config.get("silence_seconds", 1.5),
+            max_session_seconds=handsfree_config.get("max_session_seconds", 60),
+            keyword_seconds=handsfree_config.get("keyword_seconds", 1.0)
+        )
+
+    def start(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._detect_worker, name="handsfree", daemon=True)
+            self._worker.start()
+
+    def stop(self):
+        if self._worker and self._worker.is_alive():
+            self._post(None, block=True)
+            self._worker.join(timeout=2.0)
+
+    def engage(self, auto_stop: bool):
+        """识别会话开始；auto_stop为True时（唤醒词触发的会话）静音后自动结束"""
+        self.engagement += 1
+        self.state = self.ENGAGED
+        self.auto_stop = auto_stop
+        self._silent_samples = 0
+        self._session_samples = 0
+        self._stop_posted = False
+        self._reset_segment()
+
+    def disengage(self):
+        """识别会话结束，回到唤醒词监听"""
+        self.state = self.IDLE
+        self.auto_stop = False
+        self.vad.reset()
+        self._reset_segment()
+
+    def _reset_segment(self):
+        self._segment = []
+        self._segment_samples = 0
+
+    def feed(self, audio: np.ndarray):
+        """采集回调线程中调用，每块音频一次"""
+        if self.state == self.ENGAGED:
+            if self.auto_stop and not self._stop_posted:
+                self._track_silence(audio)
+            return
+
+        self._since_segment += len(audio)
+        speech = self.vad.process(audio)
+        if speech:
+            self._segment.append(audio)
+            self._segment_samples += len(audio)
+            if self._segment_samples < self.max_keyword_samples:
+                return
+        elif not self._segment:
+            return
+
+        # 语音段结束或达到最长时长，交给KWS
+        if self._segment_samples >= self.min_keyword_samples:
+            self.stats["segments"] += 1
+            self._since_segment = 0
+            if not self._post(np.concatenate(self._segment)):
+                self.stats["dropped"] += 1
+        self._reset_segment()
+
+    def _track_silence(self, audio: np.ndarray):
+        self._session_samples += len(audio)
+        if self.vad.process(audio):
+            self._silent_samples = 0
+        else:
+            self._silent_samples += len(audio)
+        if self._silent_samples >= self.silence_samples or self._session_samples >= self.max_session_samples:
+            # 队列已满时下一块音频再试
+            self._stop_posted = self._post(("silence", self.engagement))
+
+    def _post(self, item: Any, block: bool = False) -> bool:
+        try:
+            self._queue.put(item, block=block)
+            return True
+        except queue.Full:
+            return False
+
+    def _detect_worker(self):
+        """检测线程：运行KWS模型，并在此线程中调用回调"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                if isinstance(item, tuple):
+                    if self.on_silence:
+                        self.on_silence(item[1])
+                    continue
+                if self.state != self.IDLE or not self.spotter.detect(item):
+                    continue
+                self.stats["detections"] += 1
+                print("检测到唤醒词")
+                if self.on_wake:
+                    # 唤醒词后紧接着说的话在语音段内，一并作为预录音频送入识别
+                    self.on_wake(self._since_segment + max(0, len(item) - self.keyword_samples))
+            except Exception as e:
+                print(f"唤醒词检测出错: {e}")
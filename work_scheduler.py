@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+
+class WorkScheduler:
+    """识别层的优先级调度 - 实时识别会话优先，后台任务（标点、重打分、模型预加载等）让路
+
+    交互听写会话（长按或唤醒词输入）从开始到收尾完成期间视为活跃，服务端和评测的会话不计入。
+    后台任务在开始前、以及在任务内部调用checkpoint()的位置，遇到活跃会话即暂停，直到所有
+    会话收尾或暂停超过max_pause_seconds（避免连续长按时上一段的后处理结果迟迟不出）；
+    Python线程无法被强行中断，长任务需在工作单元之间调用checkpoint()。同时运行的后台任务数不超过上限。
+    """
+
+    def __init__(self, max_background_threads: int = 1, pause_during_sessions: bool = True,
+                 max_pause_seconds: float = 2.0):
+        self.max_background_threads = max(1, max_background_threads)
+        self.pause_during_sessions = pause_during_sessions
+        self.max_pause_seconds = max_pause_seconds
+        self._condition = threading.Condition()
+        self._live = 0
+        self._running = 0
+        self._queued = 0
+        self._local = threading.local()
+        self._stats = {"completed": 0, "failed": 0, "pauses": 0, "pause_timeouts": 0,
+                       "paused_ms": 0.0, "max_wait_ms": 0.0}
+        self._recent_waits = deque(maxlen=100)
+
+    @classmethod
+    def from_config(cls, scheduler_config: Dict[str, Any]) -> "WorkScheduler":
+        scheduler = cls()
+        scheduler.update_config(scheduler_config)
+        return scheduler
+
+    def update_config(self, scheduler_config: Dict[str, Any]):
+        """应用配置，唤醒等待中的任务按新的上限重新检查"""
+        with self._condition:
+            self.max_background_threads = max(1, scheduler_config.get("max_background_threads", 1))
+            self.pause_during_sessions = scheduler_config.get("pause_background_during_sessions", True)
+            self.max_pause_seconds = scheduler_config.get("max_pause_seconds", 2.0)
+            self._condition.notify_all()
+
+    @property
+    def live_active(self) -> bool:
+        return self._live > 0
+
+    def live_started(self):
+        """实时会话开始"""
+        with self._condition:
+            self._live += 1
+
+    def live_finished(self):
+        """实时会话收尾完成，恢复被暂停的后台任务"""
+        with self._condition:
+            self._live = max(0, self._live - 1)
+            self._condition.notify_all()
+
+    def _must_wait(self) -> bool:
+        return self.pause_during_sessions and self._live > 0
+
+    def _wait_for_live(self, deadline: Optional[float]) -> bool:
+        """持有条件锁时调用，等待实时会话结束；超过期限返回False"""
+        while self._must_wait():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                self._stats["pause_timeouts"] += 1
+                return False
+            self._condition.wait(remaining)
+        return True
+
+    def _deadline(self) -> Optional[float]:
+        return time.monotonic() + self.max_pause_seconds if self.max_pause_seconds > 0 else None
+
+    def checkpoint(self):
+        """后台任务的暂停点：有活跃的实时会话时阻塞到会话结束"""
+        if not self._must_wait():
+            return
+        start = time.perf_counter()
+        with self._condition:
+            if not self._must_wait():
+                return
+            self._stats["pauses"] += 1
+            self._wait_for_live(self._deadline())
+            self._stats["paused_ms"] += (time.perf_counter() - start) * 1000
+
+    @contextmanager
+    def background(self):
+        """在当前线程中以后台优先级执行一段工作：等待空闲的后台名额且没有实时会话"""
+        if getattr(self._local, "depth", 0):
+            # 已在后台任务内，不重复占用名额
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        start = time.perf_counter()
+        deadline = self._deadline()
+        with self._condition:
+            self._queued += 1
+            timed_out = False
+            while True:
+                while self._running >= self.max_background_threads:
+                    self._condition.wait()
+                if timed_out or not self._must_wait():
+                    break
+                # 等待会话结束期间名额可能被其他任务占用，回到循环开头重新检查
+                timed_out = not self._wait_for_live(deadline)
+            self._queued -= 1
+            self._running += 1
+        wait_ms = (time.perf_counter() - start) * 1000
+        self._local.depth = 1
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._local.depth = 0
+            with self._condition:
+                self._running -= 1
+                self._stats["failed" if failed else "completed"] += 1
+                self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+                self._recent_waits.append(wait_ms)
+                self._condition.notify_all()
+
+    def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """在当前线程中以后台优先级执行函数"""
+        with self.background():
+            return func(*args, **kwargs)
+
+    def submit(self, func: Callable[..., Any], *args, name: str = "background", **kwargs) -> Future:
+        """在新的后台线程中执行函数，立即返回Future"""
+        future: Future = Future()
+
+        def worker():
+            try:
+                future.set_result(self.run(func, *args, **kwargs))
+            except Exception as e:
+                print(f"后台任务{name}出错: {e}")
+                future.set_exception(e)
+
+        threading.Thread(target=worker, name=name, daemon=True).start()
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        """调度统计：实时会话数、排队/运行中的后台任务数、暂停次数与时长"""
+        with self._condition:
+            waits = sorted(self._recent_waits)
+            return dict(
+                self._stats,
+                live_sessions=self._live,
+                queued=self._queued,
+                running=self._running,
+                max_background_threads=self.max_background_threads,
+                wait_p50_ms=round(waits[len(waits) // 2], 1) if waits else 0.0,
+                paused_ms=round(self._stats["paused_ms"], 1),
+                max_wait_ms=round(self._stats["max_wait_ms"], 1),
+            )